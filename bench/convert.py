@@ -0,0 +1,69 @@
+"""
+Benchmark for converting parsed EDDN events into database rows and preparing them for writing.
+
+Times convert_* per event, then hashing the content and staging the rows of a bulk batch, and measures
+the memory a batch of converted DatabaseModels holds and its pickled size, which is what the parse
+workers send back to the ingest process. Run from the repository root: python -m bench.convert
+"""
+import pickle
+import time
+import tracemalloc
+from typing import Any, Callable
+
+from src.ingest.Market import convert_market
+from src.ingest.Scan import convert_scan
+from src.models.db.ingestion import DatabaseModels, stage_all
+from src.models.eddn.Market import MarketEnvelope
+from src.models.eddn.Scan import ScanEnvelope
+
+from .samples import market_line, scan_line
+
+# Events per batch, about what a bulk batch of Journal.Scan holds
+BATCH = 1000
+
+
+def per_second(func: Callable[[], Any], count: int, seconds: float = 2.0) -> float:
+    done = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        func()
+        done += count
+    return done / (time.perf_counter() - start)
+
+
+def batch_memory(convert: Callable[[], list[DatabaseModels]]) -> int:
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    batch = convert()
+    size = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del batch
+    return size
+
+
+def main() -> None:
+    samples: dict[str, tuple[list[Any], Callable[..., DatabaseModels]]] = {
+        "Scan": ([ScanEnvelope.model_validate_json(scan_line(i)) for i in range(BATCH)], convert_scan),
+        "Market": ([MarketEnvelope.model_validate_json(market_line(i)) for i in range(BATCH // 10)], convert_market),
+    }
+    for name, (envelopes, convert) in samples.items():
+        def convert_batch() -> list[DatabaseModels]:
+            return [convert(envelope.message, envelope) for envelope in envelopes]
+
+        batch = convert_batch()
+
+        def stage_batch() -> None:
+            stage_all(batch)
+
+        converted = per_second(convert_batch, len(envelopes))
+        staged = per_second(stage_batch, len(envelopes))
+        memory = batch_memory(convert_batch)
+        pickled = len(pickle.dumps(batch))
+        print(
+            f"{name:8} convert {converted:9.0f} events/s   hash+stage {staged:9.0f} events/s   "
+            f"batch of {len(envelopes)}: {memory / 1024:8.0f} KiB in memory, {pickled / 1024:7.0f} KiB pickled"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Benchmark for loading the staging tables of a bulk batch.
+
+Compares text COPY with write_row for every row, as copy_staging_rows did, with encoding each staging
+table column-wise into binary COPY. Needs a database; the staging tables are temporary and everything
+runs in one transaction that is rolled back. Run from the repository root:
+
+    DATABASE_URL="dbname=edsearch user=postgres password=password host=localhost" python -m bench.copy
+"""
+import time
+from typing import Callable
+
+import psycopg
+from psycopg.rows import DictRow, dict_row
+
+from src.Database import conninfo
+from src.ingest.Market import convert_market
+from src.ingest.Scan import convert_scan
+from src.models.db.bulk import StagingRows, columnar_staging_rows, copy_staging_rows, create_staging_tables
+from src.models.db.ingestion import BULK_STAGING, stage_all
+from src.models.eddn.Market import MarketEnvelope
+from src.models.eddn.Scan import ScanEnvelope
+
+from .samples import market_line, scan_line
+
+# Times each batch is copied
+REPEAT = 5
+
+
+def write_rows(cur: psycopg.Cursor[DictRow], rows: StagingRows) -> None:
+    for table, table_rows in rows.items():
+        if not table_rows:
+            continue
+        columns = ", ".join(["seq"] + [name for name, _ in BULK_STAGING[table]])
+        with cur.copy(f"COPY {table} ({columns}) FROM STDIN") as copy:
+            for row in table_rows:
+                copy.write_row(row)
+
+
+def binary_columns(cur: psycopg.Cursor[DictRow], rows: StagingRows) -> None:
+    copy_staging_rows(cur, BULK_STAGING, rows)
+
+
+def run(name: str, copy: Callable[[psycopg.Cursor[DictRow], StagingRows], None], cur: psycopg.Cursor[DictRow], rows: StagingRows) -> None:
+    count = sum(map(len, rows.values()))
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        copy(cur, rows)
+        # ON COMMIT DELETE ROWS only empties the staging tables at the end of the transaction
+        for table in rows:
+            cur.execute(f"TRUNCATE {table}")  # pyright: ignore[reportArgumentType]
+    seconds = (time.perf_counter() - start) / REPEAT
+    print(f"  {name:22} {count:7} rows  {seconds * 1000:8.1f} ms  {count / seconds:10.0f} rows/s", flush=True)
+
+
+def main() -> None:
+    batches = {
+        "Scan": [convert_scan(e.message, e) for e in (ScanEnvelope.model_validate_json(scan_line(i)) for i in range(5000))],
+        "Market": [convert_market(e.message, e) for e in (MarketEnvelope.model_validate_json(market_line(i)) for i in range(500))],
+    }
+    with psycopg.connect(conninfo) as conn, conn.cursor(row_factory=dict_row) as cur:
+        cur.execute(create_staging_tables(BULK_STAGING))  # pyright: ignore[reportArgumentType]
+        for name, batch in batches.items():
+            rows, _ = stage_all(batch)
+            print(name, flush=True)
+            run("text COPY, write_row", write_rows, cur, rows)
+            run("binary COPY, columns", binary_columns, cur, rows)
+            start = time.perf_counter()
+            for _ in range(REPEAT):
+                for table in columnar_staging_rows(BULK_STAGING, rows).values():
+                    table.copy_data()
+            seconds = (time.perf_counter() - start) / REPEAT
+            print(f"  {'of which columns+encode':22} {'':7}       {seconds * 1000:8.1f} ms", flush=True)
+        conn.rollback()
+
+
+if __name__ == "__main__":
+    main()
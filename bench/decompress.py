@@ -0,0 +1,72 @@
+"""
+Benchmark for decompressing an EDDN archive sequentially and block-parallel.
+
+Compares the BZ2Decompressor loop of the download path with decompress_file on a process pool.
+Run from the repository root on a downloaded archive, e.g. a full day of Journal.Scan:
+
+    python -m bench.decompress Journal.Scan-2025-01-15.jsonl.bz2 [workers]
+
+Without an archive a synthetic one of Scan and Commodity lines is generated in a temporary directory.
+"""
+import bz2
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator
+
+from src.ingest.decompress import decompress_chunks, decompress_file, find_blocks
+
+from .samples import market_line, scan_line
+
+# Size of the compressed chunks fed to the sequential decompressor, about what httpx yields per read
+CHUNK_BYTES = 64 * 1024
+
+
+def file_chunks(path: str) -> Iterator[bytes]:
+    with open(path, "rb") as file:
+        while chunk := file.read(CHUNK_BYTES):
+            yield chunk
+
+
+def synthetic_archive(directory: str, megabytes: int = 200) -> str:
+    path = os.path.join(directory, "synthetic.jsonl.bz2")
+    # Vary the lines so the archive compresses like real data rather than one repeated block
+    with bz2.open(path, "wb") as file:
+        written = 0
+        i = 0
+        while written < megabytes * 1024 * 1024:
+            line = (scan_line(i) if i % 10 else market_line(i)).encode() + b"\n"
+            file.write(line)
+            written += len(line)
+            i += 1
+    return path
+
+
+def run(name: str, chunks: Iterator[bytes]) -> None:
+    start = time.perf_counter()
+    size = sum(len(chunk) for chunk in chunks)
+    seconds = time.perf_counter() - start
+    print(f"{name:28} {size / 1024 / 1024:10.1f} MiB  {seconds:8.2f}s  {size / seconds / 1024 / 1024:8.1f} MiB/s", flush=True)
+
+
+def main() -> None:
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else os.cpu_count() or 1
+    with tempfile.TemporaryDirectory() as directory:
+        path = sys.argv[1] if len(sys.argv) > 1 else synthetic_archive(directory)
+        with open(path, "rb") as file:
+            start = time.perf_counter()
+            blocks = find_blocks(file.read())
+        print(f"{path}: {os.path.getsize(path) / 1024 / 1024:.1f} MiB, {len(blocks)} blocks found in {time.perf_counter() - start:.2f}s", flush=True)
+
+        run("BZ2Decompressor", decompress_chunks(file_chunks(path)))
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            # Start the workers before timing
+            list(pool.map(abs, range(workers)))
+            run(f"decompress_file ({workers} workers)", decompress_file(path, pool, window=2 * workers))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Microbenchmark for parsing EDDN lines into typed event models.
+
+Compares the old validate -> dump -> validate path with the single-pass typed envelope.
+Run from the repository root: python -m bench.envelope
+"""
+import time
+from typing import Any, Callable
+
+from pydantic import BaseModel
+
+from src.models.eddn.EDDNEnvelope import EDDNEnvelope
+from src.models.eddn.Scan import Scan, ScanEnvelope
+from src.models.eddn.Market import Market, MarketEnvelope
+
+from .samples import market_line, scan_line
+
+
+def two_pass(model: type[BaseModel]) -> Callable[[bytes], Any]:
+    def parse(line: bytes) -> Any:
+        envelope = EDDNEnvelope.model_validate_json(line)
+        return model.model_validate(envelope.message.model_dump())
+    return parse
+
+
+def single_pass(envelope: type[BaseModel]) -> Callable[[bytes], Any]:
+    def parse(line: bytes) -> Any:
+        return envelope.model_validate_json(line).message  # pyright: ignore[reportAttributeAccessIssue]
+    return parse
+
+
+def lines_per_second(parse: Callable[[bytes], Any], lines: list[bytes], seconds: float = 2.0) -> float:
+    count = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        for line in lines:
+            parse(line)
+        count += len(lines)
+    return count / (time.perf_counter() - start)
+
+
+def main() -> None:
+    samples = {
+        "Scan": ([scan_line(i).encode() for i in range(100)], Scan, ScanEnvelope),
+        "Market": ([market_line(i).encode() for i in range(20)], Market, MarketEnvelope),
+    }
+    for name, (lines, model, envelope) in samples.items():
+        old = lines_per_second(two_pass(model), lines)
+        new = lines_per_second(single_pass(envelope), lines)
+        print(f"{name:8} validate->dump->validate {old:10.0f} lines/s   typed envelope {new:10.0f} lines/s   {new / old:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
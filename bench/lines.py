@@ -0,0 +1,97 @@
+"""
+Benchmark for splitting a decompressed EDDN archive into lines.
+
+Compares the old `buffer += chunk; buffer.split(b'\\n'); decode().strip()` loop with LineSplitter.
+Run from the repository root on a downloaded archive, e.g. a full day of Journal.Scan:
+
+    python -m bench.lines Journal.Scan-2025-01-15.jsonl.bz2
+
+The archive is decompressed to a temporary file first, so only the splitting is timed. Without an
+argument a synthetic file of Scan and Commodity lines is generated instead.
+"""
+import bz2
+import os
+import sys
+import tempfile
+import time
+from typing import Callable, Iterator
+
+from src.ingest.lines import LineSplitter
+
+from .samples import market_line, scan_line
+
+# Size of the decompressed chunks fed to the splitter, about what BZ2Decompressor returns per httpx read
+CHUNK_BYTES = 256 * 1024
+
+
+def decompress_to(archive: str, path: str) -> None:
+    decompressor = bz2.BZ2Decompressor()
+    with open(archive, "rb") as source, open(path, "wb") as target:
+        while chunk := source.read(CHUNK_BYTES):
+            target.write(decompressor.decompress(chunk))
+
+
+def decompressed_chunks(path: str) -> Iterator[bytes]:
+    with open(path, "rb") as file:
+        while chunk := file.read(CHUNK_BYTES):
+            yield chunk
+
+
+def split_old(chunks: Iterator[bytes]) -> Iterator[str]:
+    buffer = b""
+    for decompressed_chunk in chunks:
+        buffer += decompressed_chunk
+        lines = buffer.split(b'\n')
+        buffer = lines.pop()
+        for line_bytes in lines:
+            if line_bytes:
+                line = line_bytes.decode('utf-8').strip()
+                if line and line.startswith('{"'):
+                    yield line
+    if buffer:
+        line = buffer.decode('utf-8').strip()
+        if line and line.startswith('{"'):
+            yield line
+
+
+def split_new(chunks: Iterator[bytes]) -> Iterator[bytes]:
+    splitter = LineSplitter()
+    for decompressed_chunk in chunks:
+        yield from splitter.feed(decompressed_chunk)
+    yield from splitter.flush()
+
+
+def synthetic_file(path: str, megabytes: int = 500) -> None:
+    lines = [scan_line(i) for i in range(50)] + [market_line(i) for i in range(5)]
+    block = ("\n".join(lines) + "\n").encode()
+    with open(path, "wb") as file:
+        for _ in range(megabytes * 1024 * 1024 // len(block)):
+            file.write(block)
+
+
+def run(name: str, split: Callable[[Iterator[bytes]], Iterator[bytes | str]], path: str, size: int) -> None:
+    start = time.perf_counter()
+    count = sum(1 for _ in split(decompressed_chunks(path)))
+    seconds = time.perf_counter() - start
+    print(f"{name:12} {count:10} lines  {seconds:8.2f}s  {count / seconds:12.0f} lines/s  {size / seconds / 1024 / 1024:8.1f} MiB/s", flush=True)
+
+
+def main() -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "lines.jsonl")
+        if len(sys.argv) > 1:
+            print(f"Decompressing {sys.argv[1]}", flush=True)
+            decompress_to(sys.argv[1], path)
+        else:
+            synthetic_file(path)
+        size = os.path.getsize(path)
+        print(f"{size / 1024 / 1024:.1f} MiB decompressed", flush=True)
+
+        # Warm the page cache so both runs read from memory
+        sum(1 for _ in decompressed_chunks(path))
+        run("old", split_old, path, size)
+        run("LineSplitter", split_new, path, size)
+
+
+if __name__ == "__main__":
+    main()
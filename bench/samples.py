@@ -0,0 +1,100 @@
+"""Representative EDDN lines for the ingest benchmarks, shaped like the edgalaxydata.space archives."""
+import json
+
+
+def _envelope(message: dict, schema: str, uploader: str = "bench") -> str:
+    return json.dumps({
+        "$schemaRef": schema,
+        "header": {
+            "uploaderID": uploader,
+            "gameversion": "4.0.0.1904",
+            "gamebuild": "r308767/r0 ",
+            "softwareName": "E:D Market Connector [Windows]",
+            "softwareVersion": "5.12.1",
+            "gatewayTimestamp": "2025-01-15T12:00:01.123456Z",
+        },
+        "message": message,
+    })
+
+
+def scan_line(i: int = 0) -> str:
+    """A detailed Journal.Scan of a landable planet with materials, atmosphere and rings."""
+    return _envelope({
+        "event": "Scan",
+        "timestamp": f"2025-01-15T12:{i // 60 % 60:02d}:{i % 60:02d}Z",
+        "ScanType": "Detailed",
+        "SystemAddress": 2870514583017 + i,
+        "StarSystem": "Pru Aescs NC-M d7-192",
+        "StarPos": [-5681.21875, -59.53125, 9960.28125],
+        "BodyID": 14,
+        "BodyName": "Pru Aescs NC-M d7-192 A 5",
+        "Parents": [{"Star": 1}, {"Null": 0}],
+        "DistanceFromArrivalLS": 2184.345673,
+        "TidalLock": False,
+        "TerraformState": "",
+        "PlanetClass": "Icy body",
+        "Atmosphere": "thin neon rich atmosphere",
+        "AtmosphereType": "NeonRich",
+        "AtmosphereComposition": [{"Name": "Neon", "Percent": 100.0}],
+        "Volcanism": "",
+        "MassEM": 0.013946,
+        "Radius": 1573478.5,
+        "SurfaceGravity": 2.245174,
+        "SurfaceTemperature": 24.519062,
+        "SurfacePressure": 137.216202,
+        "Landable": True,
+        "Materials": [
+            {"Name": "sulphur", "Percent": 26.6829},
+            {"Name": "carbon", "Percent": 22.437796},
+            {"Name": "phosphorus", "Percent": 14.365059},
+            {"Name": "iron", "Percent": 12.097285},
+            {"Name": "nickel", "Percent": 9.149808},
+            {"Name": "chromium", "Percent": 5.440429},
+            {"Name": "manganese", "Percent": 4.995912},
+            {"Name": "vanadium", "Percent": 2.970564},
+            {"Name": "niobium", "Percent": 0.826798},
+            {"Name": "polonium", "Percent": 0.333437},
+        ],
+        "Composition": {"Ice": 0.672316, "Rock": 0.218418, "Metal": 0.109266},
+        "SemiMajorAxis": 656289994716.64453,
+        "Eccentricity": 0.001218,
+        "OrbitalInclination": -0.006289,
+        "Periapsis": 74.591006,
+        "OrbitalPeriod": 315487521.8219757,
+        "AscendingNode": -126.389011,
+        "MeanAnomaly": 216.797613,
+        "RotationPeriod": 142906.66508,
+        "AxialTilt": 0.371347,
+        "Rings": [{"Name": "Pru Aescs NC-M d7-192 A 5 A Ring", "RingClass": "eRingClass_Icy", "MassMT": 1.6574e+10, "InnerRad": 2.5866e+06, "OuterRad": 5.7138e+06}],
+        "WasDiscovered": True,
+        "WasMapped": False,
+        "horizons": True,
+        "odyssey": True,
+    }, "https://eddn.edcd.io/schemas/journal/1")
+
+
+def market_line(i: int = 0, commodities: int = 120) -> str:
+    """A Commodity market with a typical station-sized commodity list."""
+    return _envelope({
+        "timestamp": f"2025-01-15T12:{i // 60 % 60:02d}:{i % 60:02d}Z",
+        "systemName": "Shinrarta Dezhra",
+        "stationName": "Jameson Memorial",
+        "marketId": 128666762 + i,
+        "horizons": True,
+        "odyssey": True,
+        "commodities": [
+            {
+                "name": f"commodity{k}",
+                "meanPrice": 1200 + k,
+                "buyPrice": 1100 + k if k % 3 else 0,
+                "stock": 5000 - k if k % 3 else 0,
+                "stockBracket": 2 if k % 3 else 0,
+                "sellPrice": 1000 + k,
+                "demand": 12000 + 7 * k,
+                "demandBracket": 2,
+            }
+            for k in range(commodities)
+        ],
+        "economies": [{"name": "HighTech", "proportion": 0.8}, {"name": "Refinery", "proportion": 0.2}],
+        "prohibited": ["BasicNarcotics", "BattleWeapons"],
+    }, "https://eddn.edcd.io/schemas/commodity/3")
@@ -0,0 +1,76 @@
+"""
+Benchmark for the per-row upsert of a parent table.
+
+Compares composing the INSERT ... ON CONFLICT with psycopg.sql for every row, as upsert_body did, with
+the cached, prepared UpsertStatement. Needs a database with the body table, e.g. one the ingest service
+has created; everything runs in one transaction that is rolled back. Run from the repository root:
+
+    DATABASE_URL="dbname=edsearch user=postgres password=password host=localhost" python -m bench.upsert
+"""
+import time
+from typing import Callable
+
+import psycopg
+from psycopg import sql
+from psycopg.rows import DictRow, dict_row
+
+from src.Database import conninfo
+from src.ingest.Scan import convert_scan
+from src.models.db.body import BODY_COLUMNS, UPSERT_BODY, Body, create_body_tables
+from src.models.db.content import hash_content
+from src.models.db.statements import WriteStats
+from src.models.db.system import create_system_tables
+from src.models.eddn.Scan import ScanEnvelope
+
+from .samples import scan_line
+
+
+def compose_per_row(cur: psycopg.Cursor[DictRow], body: Body) -> None:
+    body_dict = {c: getattr(body, c) for c in BODY_COLUMNS}
+    columns = sql.SQL(', ').join(map(sql.SQL, body_dict.keys()))
+    placeholders = sql.SQL(', ').join([sql.Placeholder()] * len(body_dict))
+    update_columns = sql.SQL(', ').join(
+        sql.SQL("{} = EXCLUDED.{}").format(sql.SQL(k), sql.SQL(k)) for (k, v) in body_dict.items() if k not in ['SystemAddress', 'BodyID'] and v is not None
+    )
+    query = sql.SQL("""
+        INSERT INTO body ({columns}) VALUES ({placeholders})
+        ON CONFLICT (SystemAddress, BodyID) DO UPDATE SET {update_columns}
+    """).format(columns=columns, placeholders=placeholders, update_columns=update_columns)
+    cur.execute(query, tuple(body_dict.values()))
+
+
+stats = WriteStats()
+
+
+def cached_statement(cur: psycopg.Cursor[DictRow], body: Body) -> None:
+    UPSERT_BODY.execute(cur, body, hash_content(body), stats)
+
+
+def run(name: str, upsert: Callable[[psycopg.Cursor[DictRow], Body], None], cur: psycopg.Cursor[DictRow], bodies: list[Body]) -> None:
+    # One pass to insert the rows (and prepare the statements), then time the updates
+    for body in bodies:
+        upsert(cur, body)
+    start = time.perf_counter()
+    for body in bodies:
+        upsert(cur, body)
+    seconds = time.perf_counter() - start
+    print(f"{name:18} {len(bodies):6} rows  {seconds:8.2f}s  {seconds / len(bodies) * 1e6:8.1f} us/row", flush=True)
+
+
+def main() -> None:
+    bodies: list[Body] = []
+    for i in range(5000):
+        envelope = ScanEnvelope.model_validate_json(scan_line(i))
+        bodies.extend(convert_scan(envelope.message, envelope).bodies)
+
+    with psycopg.connect(conninfo) as conn, conn.cursor(row_factory=dict_row) as cur:
+        cur.execute(create_system_tables())
+        cur.execute(create_body_tables())
+        run("compose per row", compose_per_row, cur, bodies)
+        run("UpsertStatement", cached_statement, cur, bodies)
+        print(f"Statement shapes: {stats.statement_shapes()}", flush=True)
+        conn.rollback()
+
+
+if __name__ == "__main__":
+    main()
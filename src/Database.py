@@ -1,29 +1,94 @@
-from contextlib import contextmanager
+from contextlib import asynccontextmanager, contextmanager
 import os
 import time
 
 import psycopg
-from pgvector.psycopg import register_vector
+from pgvector.psycopg import register_vector, register_vector_async
 from psycopg.rows import dict_row
-from psycopg_pool import ConnectionPool
+from psycopg_pool import AsyncConnectionPool, ConnectionPool
+
+from .models.db.migrations import Migration
+
+
+# Whether pooled connections commit without waiting for the WAL flush; turned on by initial loads,
+# before the pools are opened, as a crash may lose the last commits but cannot corrupt anything
+relaxed_durability = False
+
+
+def set_relaxed_durability(relaxed: bool) -> None:
+    global relaxed_durability
+    relaxed_durability = relaxed
 
 
 def configure_pool_connection(conn: psycopg.Connection) -> None:
     register_vector(conn)
+    if relaxed_durability:
+        conn.execute("SET synchronous_commit = off")
+        conn.commit()
+
+
+async def configure_async_pool_connection(conn: psycopg.AsyncConnection) -> None:
+    await register_vector_async(conn)
+    if relaxed_durability:
+        await conn.execute("SET synchronous_commit = off")
+        await conn.commit()
 
 conninfo = os.getenv(
     "DATABASE_URL",
     "dbname=edsearch user=postgres password=password host=localhost",
 )
+# Connections kept open, and the most the pool grows to under load. Every ingest writer holds one while it
+# writes a batch, so the max has to cover the batches written at once: INGEST_SCHEDULER_WRITERS for a
+# whole day (which defaults to it), INGEST_WRITERS per dataset ingested on its own, and INGEST_JOB_WORKERS
+# times INGEST_WRITERS in a job worker. Checkpoints and jobs are written through bookkeeping_pool instead
+POOL_MIN_SIZE = int(os.getenv("DATABASE_POOL_MIN_SIZE", "4"))
+POOL_MAX_SIZE = int(os.getenv("DATABASE_POOL_MAX_SIZE", str(POOL_MIN_SIZE)))
+
+# Opened on first use, so processes that only import this module (like the parse workers) never connect
 pool = ConnectionPool(
     conninfo=conninfo,
-    open=True,
+    open=False,
+    configure=configure_pool_connection,
+    min_size=POOL_MIN_SIZE,
+    max_size=POOL_MAX_SIZE,
+)
+
+
+# Connections for what ingests record besides their rows (checkpoints, archive states, job claims and
+# heartbeats), so it never waits for a connection behind the writers, nor takes one a writer needs
+BOOKKEEPING_POOL_SIZE = int(os.getenv("DATABASE_BOOKKEEPING_POOL_SIZE", "2"))
+
+bookkeeping_pool = ConnectionPool(
+    conninfo=conninfo,
+    open=False,
     configure=configure_pool_connection,
+    min_size=1,
+    max_size=BOOKKEEPING_POOL_SIZE,
 )
 
 
+# The async ingest engine's pool, opened on first use from within the event loop
+async_pool = AsyncConnectionPool(
+    conninfo=conninfo,
+    open=False,
+    configure=configure_async_pool_connection,
+    min_size=POOL_MIN_SIZE,
+    max_size=POOL_MAX_SIZE,
+)
+
+
+def get_pool() -> ConnectionPool:
+    pool.open()
+    return pool
+
+
+async def get_async_pool() -> AsyncConnectionPool:
+    await async_pool.open()
+    return async_pool
+
+
 def get_pg_connection():
-    conn = pool.getconn()
+    conn = get_pool().getconn()
     register_vector(conn)
     cur = conn.cursor(row_factory=dict_row)
     cur.execute("SET hnsw.ef_search = 1000;")
@@ -32,7 +97,7 @@ def get_pg_connection():
 
 @contextmanager
 def pg_connection():
-    with pool.connection() as conn:
+    with get_pool().connection() as conn:
         with conn.cursor(row_factory=dict_row) as cur:
             cur.execute("SET hnsw.ef_search = 1000;")
             try:
@@ -41,7 +106,30 @@ def pg_connection():
                 conn.commit()
 
 
-def create_tables(table_statements: list[str], drop: bool) -> None:
+@contextmanager
+def bookkeeping_connection():
+    """pg_connection on bookkeeping_pool."""
+    bookkeeping_pool.open()
+    with bookkeeping_pool.connection() as conn:
+        with conn.cursor(row_factory=dict_row) as cur:
+            try:
+                yield conn, cur
+            finally:
+                conn.commit()
+
+
+@asynccontextmanager
+async def async_pg_connection():
+    pool = await get_async_pool()
+    async with pool.connection() as conn:
+        async with conn.cursor(row_factory=dict_row) as cur:
+            try:
+                yield conn, cur
+            finally:
+                await conn.commit()
+
+
+def wait_for_database() -> None:
     while True:
         try:
             conn = psycopg.connect(conninfo)
@@ -51,20 +139,61 @@ def create_tables(table_statements: list[str], drop: bool) -> None:
             print("Waiting for database to be available...")
             time.sleep(1)
             continue
-        
-    conn = psycopg.connect(conninfo)
-    cur = conn.cursor()
-    
-    if drop:
-        cur.execute("DROP SCHEMA public CASCADE;")
-        cur.execute("CREATE SCHEMA public;")
-    
-    cur.execute("CREATE EXTENSION IF NOT EXISTS vector;")
-    cur.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm;")
-    cur.execute("CREATE EXTENSION IF NOT EXISTS fuzzystrmatch;")
-    register_vector(conn)
-    for statement in table_statements:
-        cur.execute(statement)  # pyright: ignore[reportArgumentType]
-    conn.commit()
-    cur.close()
-    conn.close()
+
+
+# Advisory lock held while migrating, so services starting at the same time apply each migration once
+MIGRATION_LOCK_KEY = 7_209_331_114
+
+
+def build_index_concurrently(conn: psycopg.Connection, name: str, definition: str) -> None:
+    """
+    Build an index without blocking writes to its table. A concurrent build that failed leaves an
+    invalid index behind, which IF NOT EXISTS would take as done, so that is dropped and rebuilt.
+    """
+    row = conn.execute(
+        "SELECT i.indisvalid FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid WHERE c.relname = %s",
+        (name,),
+    ).fetchone()
+    if row is not None and not row[0]:
+        conn.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")  # pyright: ignore[reportArgumentType]
+    conn.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} {definition}")  # pyright: ignore[reportArgumentType]
+
+
+def migrate(migrations: list[Migration]) -> None:
+    """
+    Bring the schema up to date by applying the migrations that schema_version does not list yet, in
+    version order, and recording each one. Nothing is dropped, so restarting a service keeps the data
+    and, with the schema up to date, takes no time at all.
+    """
+    wait_for_database()
+    with psycopg.connect(conninfo, autocommit=True) as conn:
+        # Polled rather than waited for: a session blocked in pg_advisory_lock is an open transaction,
+        # which CREATE INDEX CONCURRENTLY in the session holding the lock would wait for in turn
+        while not conn.execute("SELECT pg_try_advisory_lock(%s)", (MIGRATION_LOCK_KEY,)).fetchone()[0]:  # pyright: ignore[reportOptionalSubscript]
+            print("Waiting for another service to finish migrating...", flush=True)
+            time.sleep(1)
+        try:
+            conn.execute("CREATE EXTENSION IF NOT EXISTS vector;")
+            conn.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm;")
+            conn.execute("CREATE EXTENSION IF NOT EXISTS fuzzystrmatch;")
+            register_vector(conn)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS schema_version (
+                    version INT PRIMARY KEY,
+                    name TEXT NOT NULL,
+                    applied_at TIMESTAMPTZ NOT NULL DEFAULT now()
+                )
+            """)
+            applied = {row[0] for row in conn.execute("SELECT version FROM schema_version")}
+            for migration in sorted(migrations, key=lambda migration: migration.version):
+                if migration.version in applied:
+                    continue
+                print(f"Applying migration {migration.version}: {migration.name}", flush=True)
+                with conn.transaction():
+                    for statement in migration.statements:
+                        conn.execute(statement)  # pyright: ignore[reportArgumentType]
+                for name, definition in migration.indexes:
+                    build_index_concurrently(conn, name, definition)
+                conn.execute("INSERT INTO schema_version (version, name) VALUES (%s, %s)", (migration.version, migration.name))
+        finally:
+            conn.execute("SELECT pg_advisory_unlock(%s)", (MIGRATION_LOCK_KEY,))
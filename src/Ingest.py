@@ -1,55 +1,68 @@
-import bz2
-from datetime import date
-import json
+import asyncio
+from collections import deque
+from contextlib import nullcontext
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timedelta
+from functools import partial
+import multiprocessing
+import os
+import threading
 import time
 import traceback
-from typing import Any, Callable
+from typing import Any, AsyncIterator, Callable, Iterator, Literal, NamedTuple
 
 import httpx
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.responses import PlainTextResponse
-from pydantic import BaseModel
+from psycopg.errors import DeadlockDetected, LockNotAvailable, SerializationFailure
+from psycopg_pool import PoolTimeout
 
 
-from .Database import create_tables, pg_connection
+from .Database import POOL_MAX_SIZE, async_pg_connection, async_pool, bookkeeping_connection, migrate, pg_connection
 
-from .ingest.ScanBaryCentre import convert_scanbarycentre
-from .ingest.Scan import convert_scan
-from .ingest.FSDJump import convert_fsd_jump
-from .ingest.Docked import convert_docked
-from .ingest.ApproachSettlement import convert_approach_settlement
-from .ingest.CarrierJump import convert_carrier_jump
-from .ingest.Market import convert_market
-from .ingest.Outfitting import convert_outfitting
-from .ingest.Shipyard import convert_shipyard
+from .ingest.ScanBaryCentre import SCAN_BARYCENTRE_FRESHNESS_KEY, convert_scanbarycentre
+from .ingest.Scan import SCAN_FRESHNESS_KEY, convert_scan
+from .ingest.FSDJump import FSD_JUMP_FRESHNESS_KEY, convert_fsd_jump
+from .ingest.Docked import DOCKED_FRESHNESS_KEY, convert_docked
+from .ingest.ApproachSettlement import APPROACH_SETTLEMENT_FRESHNESS_KEY, convert_approach_settlement
+from .ingest.CarrierJump import CARRIER_JUMP_FRESHNESS_KEY, convert_carrier_jump
+from .ingest.Market import MARKET_FRESHNESS_KEY, convert_market
+from .ingest.Outfitting import OUTFITTING_FRESHNESS_KEY, convert_outfitting
+from .ingest.Shipyard import SHIPYARD_FRESHNESS_KEY, convert_shipyard
 from .ingest.SAASignals import convert_saa_signals_found
 from .ingest.FSSSignalDiscovered import convert_fss_signal_discovered
 from .ingest.FSSBodySignals import convert_fss_body_signals
+from .ingest.archive import archive_bytes_from, archive_size, archive_url, archive_version, download_chunks, local_archive
+from .ingest.decompress import ArchiveTail, ResumePoint, StreamDecompressor, decompress_chunks, decompress_file, decompress_from
+from .ingest.checkpoint import Watermark
+from .ingest.dedup import message_fingerprint, new_duplicate_filter
+from .ingest.lines import LineSplitter, split_lines
+from .ingest.parse import ParsedChunk, PendingWrite, parse_chunk
+from .ingest.pipeline import Pipeline, ordered_map
+from .ingest.schedule import ScheduledDataset, run_scheduled, schedule_order
+from .ingest.writers import ShardedWriters, shard_lock
+from .ingest.prefilter import FreshnessKey, is_prefiltered
 
 
-from .models.eddn.ScanBaryCentre import ScanBaryCentre
-from .models.eddn.Scan import Scan
-from .models.eddn.EDDNEnvelope import EDDNEnvelope
-from .models.eddn.FSDJump import FSDJump
-from .models.eddn.Docked import Docked
-from .models.eddn.ApproachSettlement import ApproachSettlement
-from .models.eddn.CarrierJump import CarrierJump
-from .models.eddn.Market import Market
-from .models.eddn.Outfitting import Outfitting
-from .models.eddn.Shipyard import Shipyard
-from .models.eddn.FSSSignalDiscovered import FSSSignalDiscovered
-from .models.eddn.FSSBodySignals import FSSBodySignals
-from .models.eddn.SAASignalsFound import SAASignalsFound
-
-from .models.db.landmark import create_landmark_tables
-from .models.db.system import create_system_tables
-from .models.db.body import create_body_tables
-from .models.db.station import create_station_tables
-from .models.db.market import create_market_tables
-from .models.db.outfitting import create_outfitting_tables
-from .models.db.shipyard import create_shipyard_tables
-from .models.db.signals import create_signal_tables
-from .models.db.ingestion import create_ingestion_table, lock_latest_ingestion_timestamp
+from .models.eddn.EDDNEnvelope import EDDNEventEnvelope
+from .models.eddn.ScanBaryCentre import ScanBaryCentreEnvelope
+from .models.eddn.Scan import ScanEnvelope
+from .models.eddn.FSDJump import FSDJumpEnvelope
+from .models.eddn.Docked import DockedEnvelope
+from .models.eddn.ApproachSettlement import ApproachSettlementEnvelope
+from .models.eddn.CarrierJump import CarrierJumpEnvelope
+from .models.eddn.Market import MarketEnvelope
+from .models.eddn.Outfitting import OutfittingEnvelope
+from .models.eddn.Shipyard import ShipyardEnvelope
+from .models.eddn.FSSSignalDiscovered import FSSSignalDiscoveredEnvelope
+from .models.eddn.FSSBodySignals import FSSBodySignalsEnvelope
+from .models.eddn.SAASignalsFound import SAASignalsFoundEnvelope
+
+from .models.db.checkpoint import ArchiveState, load_archive_state, load_checkpoint, store_archive_state, store_checkpoint
+from .models.db.jobs import enqueue_jobs, get_job, list_jobs
+from .models.db.migrations import MIGRATIONS
+from .models.db.statements import WriteStats
+from .models.db.ingestion import IngestionTimestamps, bulk_upsert_all, bulk_upsert_all_async, get_content_hash_cache, get_timestamp_cache, lock_ingestion_keys, lock_ingestion_keys_async, parse_timestamp
 
 app = FastAPI()
 
@@ -63,234 +76,912 @@ async def debug_exception_handler(request: Request, exc: Exception):
     )
     
 
-def load_file_sync(filename: str, date_obj: date):
-    year_month = date_obj.strftime("%Y-%m")
-    full_date = date_obj.strftime("%Y-%m-%d")
-    url = f"https://edgalaxydata.space/EDDN/{year_month}/{filename}-{full_date}.jsonl.bz2"
-    print(f"Downloading data from {url}", flush=True)
+def read_archive(pipeline: Pipeline, filename: str, date_obj: date, source_dir: str | None = None, offline: bool = False, tail: ArchiveTail | None = None) -> Iterator[bytes]:
+    """
+    Start the stages yielding the decompressed bytes of a day's archive. Archives on disk (a source
+    directory or the mirror) are decompressed block-parallel on the parse pool; downloads are fetched
+    in one stage and decompressed as they stream in by the next. When given, tail keeps the last
+    compressed bytes of the archive.
+    """
+    path = local_archive(filename, date_obj, source_dir, offline)
+    if path:
+        if tail is not None:
+            tail.read_file(path)
+        return pipeline.source("decompress", decompress_file(path, get_parse_pool(), window=2 * max(PARSE_WORKERS, 1)))
+    chunks = download_chunks(filename, date_obj)
+    compressed = pipeline.source("fetch", chunks if tail is None else tail.watch(chunks))
+    return pipeline.stage("decompress", decompress_chunks, compressed)
 
-    with httpx.stream("GET", url, timeout=None) as response:
-        response.raise_for_status()
-
-        decompressor = bz2.BZ2Decompressor()
-        buffer = b""
-        for chunk in response.iter_bytes():
-            decompressed_chunk = decompressor.decompress(chunk)
-            if not decompressed_chunk:
-                continue
-            
-            buffer += decompressed_chunk
-            lines = buffer.split(b'\n')
-            buffer = lines.pop()  # Keep the last, possibly incomplete line
-
-            for line_bytes in lines:
-                if line_bytes:
-                    line = line_bytes.decode('utf-8').strip()
-                    if line and line.startswith('{"'):
-                        yield line
-
-        # Process any remaining data in the buffer
-        if buffer:
-            line = buffer.decode('utf-8').strip()
-            if line and line.startswith('{"'):
-                yield line
-
-
-async def load_file(filename: str, date: date):
-    year_month = date.strftime("%Y-%m")
-    full_date = date.strftime("%Y-%m-%d")
-    url = f"https://edgalaxydata.space/EDDN/{year_month}/{filename}-{full_date}.jsonl.bz2"
-    print(f"Downloading data from {url}", flush=True)
 
+def read_archive_from(pipeline: Pipeline, filename: str, date_obj: date, resume: ResumePoint, tail: ArchiveTail, source_dir: str | None = None, offline: bool = False) -> Iterator[bytes] | None:
+    """
+    Start a stage yielding the decompressed bytes of a day's archive from a resume point on, fetching
+    only the compressed bytes from there. Returns None when the archive has to be read from the start
+    instead (see decompress_from).
+    """
+    data = archive_bytes_from(filename, date_obj, resume.bit // 8, source_dir, offline)
+    chunks = decompress_from(data, resume) if data is not None else None
+    if chunks is None:
+        return None
+    tail.offset = resume.bit // 8
+    tail.add(data)  # pyright: ignore[reportArgumentType]
+    return pipeline.source("decompress", chunks)
+
+
+async def archive_chunks(filename: str, date: date, source_dir: str | None = None, offline: bool = False) -> AsyncIterator[bytes]:
+    """
+    Yield the decompressed bytes of a day's archive without blocking the event loop: local archives are
+    decompressed block-parallel in a thread, downloads are streamed with httpx and every chunk is
+    decompressed in a thread (bz2 releases the GIL while decompressing).
+    """
+    path = await asyncio.to_thread(local_archive, filename, date, source_dir, offline)
+    if path:
+        chunks = decompress_file(path, get_parse_pool(), window=2 * max(PARSE_WORKERS, 1))
+        while (decompressed_chunk := await asyncio.to_thread(next, chunks, None)) is not None:
+            yield decompressed_chunk
+        return
+
+    url = archive_url(filename, date)
+    print(f"Downloading data from {url}", flush=True)
+    decompressor = StreamDecompressor()
     async with httpx.AsyncClient(timeout=None) as client:
         async with client.stream("GET", url) as response:
             response.raise_for_status()
-
-            decompressor = bz2.BZ2Decompressor()
-            buffer = b""
             async for chunk in response.aiter_bytes():
-                decompressed_chunk = decompressor.decompress(chunk)
-                if not decompressed_chunk:
-                    continue
-                
-                buffer += decompressed_chunk
-                lines = buffer.split(b'\n')
-                buffer = lines.pop()  # Keep the last, possibly incomplete line
-
-                for line_bytes in lines:
-                    if line_bytes:
-                        line = line_bytes.decode('utf-8').strip()
-                        #print(f"Ingesting line: {line}", flush=True)
-                        if line and line.startswith('{"'):
-                            yield line
-
-            # Process any remaining data in the buffer
-            if buffer:
-                line = buffer.decode('utf-8').strip()
-                #print(f"Ingesting line: {line}", flush=True)
-                if line and line.startswith('{"'):
-                    yield line
-
-def ingest(day: date, file: str, model: type[BaseModel], convert_func: Callable[[Any, Any], Any]):
-    total = 0
+                decompressed_chunk = await asyncio.to_thread(decompressor.decompress, chunk)
+                if decompressed_chunk:
+                    yield decompressed_chunk
+
+
+async def load_file(filename: str, date: date, source_dir: str | None = None, offline: bool = False) -> AsyncIterator[list[bytes]]:
+    """Yield the lines of a day's archive in chunks of up to PARSE_CHUNK_LINES, for the async engine."""
+    splitter = LineSplitter()
+    lines: list[bytes] = []
+    async for decompressed_chunk in archive_chunks(filename, date, source_dir, offline):
+        lines.extend(splitter.feed(decompressed_chunk))
+        while len(lines) >= PARSE_CHUNK_LINES:
+            yield lines[:PARSE_CHUNK_LINES]
+            del lines[:PARSE_CHUNK_LINES]
+
+    # Process any remaining data in the buffer
+    lines.extend(splitter.flush())
+    if lines:
+        yield lines
+
+
+class BatchResult(NamedTuple):
+    success: int
+    skipped: int
+    failure: int
+    # Accepted events whose entities were all stored with the same content already
+    unchanged: int = 0
+
+
+# Number of processes parsing and converting lines; 0 parses inline in the ingesting thread
+PARSE_WORKERS = int(os.getenv("INGEST_PARSE_WORKERS", str(os.cpu_count() or 1)))
+# Lines handed to a parse worker at once
+PARSE_CHUNK_LINES = 500
+# Items each pipeline stage may queue for the next (byte chunks, chunks of lines or batches)
+PIPELINE_QUEUE_DEPTH = int(os.getenv("INGEST_PIPELINE_QUEUE_DEPTH", "8"))
+
+_parse_pool: ProcessPoolExecutor | None = None
+_parse_pool_lock = threading.Lock()
+
+# Days of ingestion_lock loaded into the timestamp cache at startup; 0 disables the warm-up
+TIMESTAMP_CACHE_WARM_DAYS = float(os.getenv("INGEST_TIMESTAMP_CACHE_WARM_DAYS", "7"))
+
+# Writer threads per dataset file, each writing the events of its share of the keys; every writer holds a
+# pooled connection while writing, so DATABASE_POOL_MAX_SIZE has to cover them
+WRITERS = int(os.getenv("INGEST_WRITERS", "1"))
+# Write lanes per dataset in the async engine, one per shard of its keys. How many batches are written at
+# once across all datasets is bounded by the async pool's size instead (see ingest_async)
+ASYNC_WRITE_LANES = int(os.getenv("INGEST_ASYNC_WRITE_LANES", "8"))
+# Default flush interval for a partially filled batch
+DEFAULT_BATCH_MS = 1000
+# How often a batch is retried after a lock timeout before falling back to per-event writes
+BATCH_RETRIES = 2
+# Errors caused by concurrent writers, after which writing the same batch again may succeed
+RETRYABLE_ERRORS = (LockNotAvailable, SerializationFailure, DeadlockDetected)
+# How often a running ingest records how many lines of its file are done, for resumed and tail runs
+CHECKPOINT_SECONDS = float(os.getenv("INGEST_CHECKPOINT_SECONDS", "5"))
+# Datasets ingest_for_day runs at once
+SCHEDULER_WORKERS = int(os.getenv("INGEST_SCHEDULER_WORKERS", "4"))
+# Batches ingest_for_day writes at once across all datasets, each on a pooled connection, which bounds the
+# load on the database (see run_scheduled). Defaults to the pool size, which it must not exceed
+SCHEDULER_WRITERS = int(os.getenv("INGEST_SCHEDULER_WRITERS", str(POOL_MAX_SIZE)))
+
+
+def write_batch(batch: list[PendingWrite], bulk: bool = False, stats: WriteStats | None = None) -> BatchResult:
+    """
+    Write a batch of converted events in one transaction: the in-memory cache drops events known to be
+    stale, then all keys are locked and their stored timestamps read with one statement each, every
+    event is checked and upserted in batch order (under a savepoint, so one failing event does not
+    abort the batch), and the claimed timestamps are written back with one statement before the commit.
+    Entities whose content is already stored are not rewritten; events made only of such entities still
+    claim their timestamps but are counted as unchanged instead of successful.
+
+    In bulk mode the accepted events are written together through COPY into staging tables and one
+    set-based merge per table instead.
+    """
     success = 0
     skipped = 0
     failure = 0
-    start_time = time.time()
-    for line in load_file_sync(file, day):
-        total += 1
-        if total % 1000 == 0:
-            print(f"{file}: Ingested {total} lines so far, {success} successful, {skipped} skipped, {failure} failed\n{time.time() - start_time:.2f} seconds elapsed, {total / (time.time() - start_time):.2f} lines/second", flush=True)
+    unchanged = 0
+    accepted: list[PendingWrite] = []
+    content_hashes: list[tuple[int, int]] = []
+
+    # The cache only holds committed timestamps, so an event it rejects would be rejected by the database too
+    timestamp_cache = get_timestamp_cache()
+    content_cache = get_content_hash_cache()
+    candidates: list[PendingWrite] = []
+    for pending in batch:
+        if all(timestamp_cache.is_newer(model_name, primary_key, pending.event, pending.timestamp) for model_name, primary_key in pending.locks):
+            candidates.append(pending)
+        else:
+            skipped += 1
+    if not candidates:
+        return BatchResult(success, skipped, failure)
+
+    with pg_connection() as (conn, cur):
+        # Start a transaction and set a modest lock timeout
+        cur.execute("BEGIN; SET LOCAL lock_timeout = '3s';")
         try:
-            envelope = EDDNEnvelope.model_validate_json(line)
-            if not envelope.message.odyssey or not envelope.message.horizons:
-                skipped += 1
-                continue
-            
-            event: Any = model.model_validate(envelope.message.model_dump())
-
-            # Convert first to know which DB models and primary keys will be affected
-            models = convert_func(event, envelope)
-
-            # Build list of (model_name, primary_key_json) for all resulting models
-            model_map = {
-                'systems': 'system',
-                'stations': 'station',
-                'bodies': 'body',
-                'landmarks': 'landmark',
-                'markets': 'market',
-                'shipyards': 'shipyard',
-                'outfittings': 'outfitting',
-                'signals': 'signal'
-            }
-            locks: set[tuple[str, str]] = set()
-            for attr, model_name in model_map.items():
-                items = getattr(models, attr, [])
-                if not items:
+            lock_ingestion_keys(cur, (lock for pending in candidates for lock in pending.locks))
+            timestamps = IngestionTimestamps.fetch(cur, (
+                (model_name, primary_key, pending.event) for pending in candidates for model_name, primary_key in pending.locks
+            ))
+
+            for pending in candidates:
+                # Claim every key of the event; all must be fresh
+                claims = [(model_name, primary_key, pending.event) for model_name, primary_key in pending.locks]
+                timestamp = parse_timestamp(pending.timestamp)
+                if not timestamps.is_fresh(claims, timestamp):
+                    skipped += 1
                     continue
-                for m in items:
-                    pk = json.dumps({k: getattr(m, k) for k in m.primary_keys}, sort_keys=True)
-                    locks.add((model_name, pk))
-
-            if not locks:
-                # Nothing to write
-                skipped += 1
-                continue
-
-            # Acquire locks in a stable order to avoid deadlocks
-            ordered_locks = sorted(locks)
-
-            with pg_connection() as (conn, cur):
-                # Start a transaction and set a modest lock timeout
-                cur.execute("BEGIN; SET LOCAL lock_timeout = '3s';")
-
-                # Acquire per-model locks; all must succeed
-                all_locked = True
-                for model_name, primary_key in ordered_locks:
-                    if not lock_latest_ingestion_timestamp(cur, model_name, primary_key, getattr(event, 'event'), getattr(event, 'timestamp')):
-                        all_locked = False
-                        break
-
-                if not all_locked:
-                    cur.execute("ROLLBACK;")
+
+                if not bulk:
+                    # Perform the upserts under the same transaction
+                    cur.execute("SAVEPOINT pending_write;")
+                    try:
+                        result = pending.models.upsert_all(cur, content_cache, stats)
+                        cur.execute("RELEASE SAVEPOINT pending_write;")
+                    except RETRYABLE_ERRORS:
+                        raise
+                    except Exception as e:
+                        cur.execute("ROLLBACK TO SAVEPOINT pending_write;")
+                        failure += 1
+                        print(f"Error ingesting line {pending.line_number}", flush=True)
+                        print(f"Exception: {e}", flush=True)
+                        traceback.print_exc()
+                        continue
+                    content_hashes.extend(result.content_hashes)
+                    if result.is_unchanged:
+                        unchanged += 1
+
+                timestamps.claim(claims, timestamp)
+                accepted.append(pending)
+
+            if bulk and accepted:
+                for result in bulk_upsert_all(cur, [pending.models for pending in accepted], content_cache, stats):
+                    content_hashes.extend(result.content_hashes)
+                    if result.is_unchanged:
+                        unchanged += 1
+            timestamps.store(cur)
+
+            cur.execute("COMMIT;")
+        except BaseException:
+            cur.execute("ROLLBACK;")
+            raise
+
+    # Only remember timestamps that actually made it into the database
+    for pending in accepted:
+        for model_name, primary_key in pending.locks:
+            timestamp_cache.update(model_name, primary_key, pending.event, pending.timestamp)
+    if content_cache is not None:
+        for key, content_hash in content_hashes:
+            content_cache.update(key, content_hash)
+    success += len(accepted) - unchanged
+    return BatchResult(success, skipped, failure, unchanged)
+
+
+def flush_batch(batch: list[PendingWrite], bulk: bool = False, stats: WriteStats | None = None) -> BatchResult:
+    """
+    Write a batch, retrying on RETRYABLE_ERRORS, then falling back to one transaction per event with
+    per-row upserts. Any other error, like a failing bulk merge, goes straight to the fallback, so one
+    bad event only fails itself; an event that cannot be written alone counts as a failure.
+    """
+    if not batch:
+        return BatchResult(0, 0, 0)
+    error: Exception | None = None
+    for attempt in range(BATCH_RETRIES + 1):
+        try:
+            return write_batch(batch, bulk, stats)
+        except RETRYABLE_ERRORS as e:
+            error = e
+            print(f"{type(e).__name__} writing batch of {len(batch)} events (attempt {attempt + 1})", flush=True)
+            time.sleep(0.1 * (attempt + 1))
+        except PoolTimeout:
+            # No connection to write with; writing event by event would only fail the same way
+            raise
+        except Exception as e:
+            error = e
+            print(f"{'Bulk write' if bulk else 'Write'} of {len(batch)} events failed: {e}", flush=True)
+            traceback.print_exc()
+            break
+
+    if len(batch) == 1 and not bulk:
+        pending = batch[0]
+        print(f"Error ingesting line {pending.line_number}", flush=True)
+        print(f"Exception: {error}", flush=True)
+        return BatchResult(0, 0, 1)
+
+    print(f"Falling back to per-event writes for batch of {len(batch)} events", flush=True)
+    success = 0
+    skipped = 0
+    failure = 0
+    unchanged = 0
+    for pending in batch:
+        result = flush_batch([pending], stats=stats)
+        success += result.success
+        skipped += result.skipped
+        failure += result.failure
+        unchanged += result.unchanged
+    return BatchResult(success, skipped, failure, unchanged)
+
+
+async def write_batch_async(batch: list[PendingWrite], stats: WriteStats | None = None) -> BatchResult:
+    """
+    write_batch for the async engine, on a connection of the async pool. Accepted events are always
+    written through the staging tables and set-based merges of the bulk mode, since the per-row upserts
+    are synchronous.
+    """
+    skipped = 0
+    unchanged = 0
+    accepted: list[PendingWrite] = []
+    content_hashes: list[tuple[int, int]] = []
+
+    timestamp_cache = get_timestamp_cache()
+    content_cache = get_content_hash_cache()
+    candidates: list[PendingWrite] = []
+    for pending in batch:
+        if all(timestamp_cache.is_newer(model_name, primary_key, pending.event, pending.timestamp) for model_name, primary_key in pending.locks):
+            candidates.append(pending)
+        else:
+            skipped += 1
+    if not candidates:
+        return BatchResult(0, skipped, 0)
+
+    async with async_pg_connection() as (conn, cur):
+        await cur.execute("BEGIN; SET LOCAL lock_timeout = '3s';")
+        try:
+            await lock_ingestion_keys_async(cur, (lock for pending in candidates for lock in pending.locks))
+            timestamps = await IngestionTimestamps.fetch_async(cur, (
+                (model_name, primary_key, pending.event) for pending in candidates for model_name, primary_key in pending.locks
+            ))
+            for pending in candidates:
+                claims = [(model_name, primary_key, pending.event) for model_name, primary_key in pending.locks]
+                timestamp = parse_timestamp(pending.timestamp)
+                if not timestamps.is_fresh(claims, timestamp):
                     skipped += 1
                     continue
-            
-                # Perform the upserts under the same transaction
-                models.upsert_all(cur)
-                cur.execute("COMMIT;")
-                
-            success += 1
+                timestamps.claim(claims, timestamp)
+                accepted.append(pending)
+
+            if accepted:
+                for result in await bulk_upsert_all_async(cur, [pending.models for pending in accepted], content_cache, stats):
+                    content_hashes.extend(result.content_hashes)
+                    if result.is_unchanged:
+                        unchanged += 1
+            await timestamps.store_async(cur)
+            await cur.execute("COMMIT;")
+        except BaseException:
+            await cur.execute("ROLLBACK;")
+            raise
+
+    for pending in accepted:
+        for model_name, primary_key in pending.locks:
+            timestamp_cache.update(model_name, primary_key, pending.event, pending.timestamp)
+    if content_cache is not None:
+        for key, content_hash in content_hashes:
+            content_cache.update(key, content_hash)
+    return BatchResult(len(accepted) - unchanged, skipped, 0, unchanged)
+
+
+async def flush_batch_async(batch: list[PendingWrite], stats: WriteStats | None = None) -> BatchResult:
+    """flush_batch for the async engine: retries on RETRYABLE_ERRORS, then falls back to one transaction per event."""
+    if not batch:
+        return BatchResult(0, 0, 0)
+    error: Exception | None = None
+    for attempt in range(BATCH_RETRIES + 1):
+        try:
+            return await write_batch_async(batch, stats)
+        except RETRYABLE_ERRORS as e:
+            error = e
+            print(f"{type(e).__name__} writing batch of {len(batch)} events (attempt {attempt + 1})", flush=True)
+            await asyncio.sleep(0.1 * (attempt + 1))
+        except PoolTimeout:
+            # No connection to write with; writing event by event would only fail the same way
+            raise
         except Exception as e:
-            failure += 1
-            print(f"Error ingesting line: {line}", flush=True)
-            print(f"Exception: {e}", flush=True)
+            error = e
+            print(f"Bulk write of {len(batch)} events failed: {e}", flush=True)
             traceback.print_exc()
-    report: dict[str, str | int] = {"status": "success", "input": file, "total": total, "success": success, "skipped": skipped, "failure": failure}
-    print(f'{file}: Finished ingesting {total} lines, {success} successful, {skipped} skipped, {failure} failed\n{time.time() - start_time:.2f} seconds elapsed, {total / (time.time() - start_time):.2f} lines/second', flush=True)
+            break
+
+    if len(batch) == 1:
+        pending = batch[0]
+        print(f"Error ingesting line {pending.line_number}", flush=True)
+        print(f"Exception: {error}", flush=True)
+        return BatchResult(0, 0, 1)
+
+    print(f"Falling back to per-event writes for batch of {len(batch)} events", flush=True)
+    success = 0
+    skipped = 0
+    failure = 0
+    unchanged = 0
+    for pending in batch:
+        result = await flush_batch_async([pending], stats)
+        success += result.success
+        skipped += result.skipped
+        failure += result.failure
+        unchanged += result.unchanged
+    return BatchResult(success, skipped, failure, unchanged)
+
+
+def get_parse_pool() -> ProcessPoolExecutor | None:
+    """Return the process pool shared by all datasets for parsing and converting, or None to parse inline."""
+    global _parse_pool
+    if PARSE_WORKERS <= 0:
+        return None
+    with _parse_pool_lock:
+        if _parse_pool is None:
+            # spawn rather than fork: the parent runs threads and a connection pool
+            _parse_pool = ProcessPoolExecutor(max_workers=PARSE_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _parse_pool
+
+
+def stage_report(seconds: float, items: int) -> dict[str, float]:
+    return {"seconds": round(seconds, 2), "per_second": round(items / seconds, 2) if seconds else 0.0}
+
+
+def ingest(day: date, file: str, envelope: type[EDDNEventEnvelope[Any]], convert_func: Callable[[Any, Any], Any], batch_size: int = 1, batch_ms: int = DEFAULT_BATCH_MS, bulk: bool = False, freshness_key: FreshnessKey | None = None, source_dir: str | None = None, offline: bool = False, writers: int | None = None, progress: Callable[[dict[str, Any]], None] | None = None, resume: bool = False, write_slots: threading.Semaphore | None = None):
+    """
+    Ingest one dataset file for a day. Repeats of a message already seen in the file (the same event
+    relayed by another uploader) are dropped, the remaining lines are pre-filtered on their raw bytes,
+    parsed and converted in chunks (in the parse pool when enabled), and written in batches. With more
+    than one writer, events are sharded by key across writer threads (see ShardedWriters). When given,
+    every batch is written holding one of write_slots, which datasets ingested at once share.
+
+    Every step runs as a stage of a Pipeline: fetch, decompress, split, filter, parse, batch and write,
+    connected by bounded queues, so the download keeps going while the database is busy and a slow
+    database throttles the download instead of filling memory. The report shows where time went.
+
+    The archive is read from source_dir when given, and otherwise downloaded (through the archive mirror
+    when configured; offline uses only the mirrored copy). When given, progress is called with the
+    running counts after every chunk of lines and once more at the end.
+
+    Every CHECKPOINT_SECONDS, the number of leading lines that are fully done (see Watermark) is stored
+    as the file's checkpoint. With resume set, those lines are left out right after decompression, so
+    an interrupted run continues where it stopped and a run over the current day's growing file (tail)
+    only ingests the lines appended since the last one. A resumed run that reads the archive to its
+    end also records the archive's ETag and size and its last block (see ResumePoint). The next
+    resumed run does nothing if the archive is unchanged, and otherwise fetches and decompresses it
+    from that block on, as long as the archive was appended to rather than compressed anew.
+    """
+    total = 0
+    success = 0
+    skipped = 0
+    failure = 0
+    unchanged = 0
+    start_time = time.time()
+    dedup_seconds = 0.0
+    duplicates = 0
+    prefilter_seconds = 0.0
+    prefiltered = 0
+    parse_seconds = 0.0
+    write_seconds = 0.0
+    written = 0
+    writers = WRITERS if writers is None else writers
+    # Guards the counters that several stages and writer threads update
+    counters_lock = threading.Lock()
+    stats = WriteStats()
+
+    resumed_from = 0
+    archive_state: ArchiveState | None = None
+    if resume:
+        with bookkeeping_connection() as (_, cur):
+            resumed_from = load_checkpoint(cur, day, file)
+            archive_state = load_archive_state(cur, day, file)
+        if resumed_from:
+            print(f"{file}: Resuming after line {resumed_from}", flush=True)
+    # Taken before reading, so an archive that changes meanwhile is never recorded as read
+    version = archive_version(file, day, source_dir, offline) if resume else None
+    archive_unchanged = version is not None and archive_state is not None and version == (archive_state.etag, archive_state.size)
+    tail = ArchiveTail() if version is not None else None
+    resume_point = None
+    if archive_state is not None and archive_state.block_bit is not None and archive_state.block_lines <= resumed_from:  # pyright: ignore[reportOptionalOperand]
+        resume_point = ResumePoint(archive_state.block_bit, archive_state.block_crc, archive_state.block_skip, archive_state.block_lines)  # pyright: ignore[reportArgumentType]
+    # Lines of the archive before the first one decompressed
+    lines_before = 0
+    watermark = Watermark(resumed_from)
+    checkpoint = resumed_from
+    checkpoint_time = time.monotonic()
+    # Held while storing the checkpoint; writers that find it taken leave it to the one holding it
+    checkpoint_lock = threading.Lock()
+
+    def save_checkpoint() -> None:
+        nonlocal checkpoint, checkpoint_time
+        line = watermark.line
+        checkpoint_time = time.monotonic()
+        if line > checkpoint:
+            with bookkeeping_connection() as (_, cur):
+                store_checkpoint(cur, day, file, line)
+            checkpoint = line
+
+    def write(pending_batch: list[PendingWrite]) -> None:
+        nonlocal success, skipped, failure, unchanged, write_seconds, written
+        with write_slots if write_slots is not None else nullcontext():
+            write_start = time.perf_counter()
+            result = flush_batch(pending_batch, bulk, stats)
+        watermark.written([pending.line_number for pending in pending_batch])
+        with counters_lock:
+            write_seconds += time.perf_counter() - write_start
+            written += len(pending_batch)
+            success += result.success
+            skipped += result.skipped
+            failure += result.failure
+            unchanged += result.unchanged
+        if time.monotonic() - checkpoint_time >= CHECKPOINT_SECONDS and checkpoint_lock.acquire(blocking=False):
+            try:
+                save_checkpoint()
+            finally:
+                checkpoint_lock.release()
+
+    parse_pool = get_parse_pool()
+    timestamp_cache = get_timestamp_cache()
+    duplicate_filter = new_duplicate_filter()
+    sharded = ShardedWriters(writers, batch_size, batch_ms, write, freshness_key) if writers > 1 else None
+
+    def report_progress() -> None:
+        if progress is None:
+            return
+        elapsed = time.time() - start_time
+        with counters_lock:
+            progress({
+                "total": total,
+                "success": success,
+                "unchanged": unchanged,
+                "skipped": skipped,
+                "duplicates": duplicates,
+                "failure": failure,
+                "seconds": round(elapsed, 2),
+                "lines_per_second": round(total / elapsed, 2) if elapsed else 0.0,
+            })
+
+    def filter_lines(chunks: Iterator[list[bytes]]) -> Iterator[list[tuple[int, bytes]]]:
+        nonlocal total, skipped, duplicates, prefiltered, dedup_seconds, prefilter_seconds
+        for chunk_lines in chunks:
+            # Drop repeated messages before paying for anything else
+            dedup_start = time.perf_counter()
+            unique_lines: list[tuple[int, bytes]] = []
+            for line_number, line in enumerate(chunk_lines, resumed_from + total + 1):
+                if duplicate_filter is not None and (fingerprint := message_fingerprint(line)) is not None and duplicate_filter.seen(fingerprint):
+                    duplicates += 1
+                else:
+                    unique_lines.append((line_number, line))
+            dedup_seconds += time.perf_counter() - dedup_start
+
+            # Drop lines that would certainly be skipped before paying for validation and conversion
+            prefilter_start = time.perf_counter()
+            numbered_lines: list[tuple[int, bytes]] = []
+            for line_number, line in unique_lines:
+                if is_prefiltered(line, freshness_key, timestamp_cache):
+                    prefiltered += 1
+                else:
+                    numbered_lines.append((line_number, line))
+            prefilter_seconds += time.perf_counter() - prefilter_start
+            with counters_lock:
+                skipped += len(chunk_lines) - len(numbered_lines)
+            watermark.read(resumed_from + total + len(chunk_lines), numbered_lines[-1][0] if numbered_lines else None)
+
+            total += len(chunk_lines)
+            if total // 1000 != (total - len(chunk_lines)) // 1000:
+                print(f"{file}: Ingested {total} lines so far, {success} successful, {unchanged} unchanged, {skipped} skipped, {failure} failed\n{time.time() - start_time:.2f} seconds elapsed, {total / (time.time() - start_time):.2f} lines/second", flush=True)
+            report_progress()
+            if numbered_lines:
+                yield numbered_lines
+
+    def parse(chunks: Iterator[list[tuple[int, bytes]]]) -> Iterator[ParsedChunk]:
+        parse_lines = partial(parse_chunk, envelope, convert_func)
+        if parse_pool is None:
+            return map(parse_lines, chunks)
+        # Results come back in file order; keep every worker busy without parsing ahead unboundedly
+        return ordered_map(parse_pool, parse_lines, chunks, window=2 * PARSE_WORKERS)
+
+    def make_batches(chunks: Iterator[ParsedChunk]) -> Iterator[list[PendingWrite]]:
+        nonlocal skipped, failure, parse_seconds
+        batch: list[PendingWrite] = []
+        batch_started = time.monotonic()
+        for chunk in chunks:
+            with counters_lock:
+                skipped += chunk.skipped
+                failure += chunk.failure
+            parse_seconds += chunk.seconds
+            watermark.parsed(chunk.last_line, [pending.line_number for pending in chunk.pending])
+            for pending in chunk.pending:
+                if not batch:
+                    batch_started = time.monotonic()
+                batch.append(pending)
+                if len(batch) >= batch_size:
+                    yield batch
+                    batch = []
+            if batch and (time.monotonic() - batch_started) * 1000 >= batch_ms:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def write_batches(batches: Iterator[list[PendingWrite]]) -> None:
+        for batch in batches:
+            if sharded is None:
+                write(batch)
+            else:
+                for pending in batch:
+                    sharded.submit(pending)
+
+    pipeline = Pipeline(PIPELINE_QUEUE_DEPTH)
+    try:
+        chunks: Iterator[bytes] | None = None
+        if archive_unchanged:
+            print(f"{file}: Archive unchanged since it was last read to its end", flush=True)
+            chunks = pipeline.source("decompress", iter(()))
+        elif resume_point is not None and tail is not None:
+            chunks = read_archive_from(pipeline, file, day, resume_point, tail, source_dir, offline)
+            if chunks is not None:
+                lines_before = resume_point.lines
+                print(f"{file}: Decompressing from the block after line {lines_before}", flush=True)
+        if chunks is None:
+            chunks = read_archive(pipeline, file, day, source_dir, offline, tail)
+        lines = pipeline.stage("split", partial(split_lines, size=PARSE_CHUNK_LINES, skip=resumed_from - lines_before), chunks)
+        filtered = pipeline.stage("filter", filter_lines, lines)
+        parsed = pipeline.stage("parse", parse, filtered)
+        batches = pipeline.stage("batch", make_batches, parsed)
+        pipeline.sink("write", write_batches, batches)
+    finally:
+        pipeline.close()
+        if sharded is not None:
+            sharded.close()
+    pipeline_report = pipeline.report()
+    read_seconds = sum(pipeline_report[name]["busy_seconds"] for name in ("fetch", "decompress", "split") if name in pipeline_report)
+    report_progress()
+    save_checkpoint()
+    if version is not None and tail is not None and not archive_unchanged and checkpoint == resumed_from + total:
+        point = tail.resume_point(resumed_from + total)
+        with bookkeeping_connection() as (_, cur):
+            store_archive_state(cur, day, file, ArchiveState(*version, *(point or ())))
+
+    report: dict[str, Any] = {
+        "status": "success",
+        "input": file,
+        "resumed_from": resumed_from,
+        "archive_unchanged": archive_unchanged,
+        "decompressed_after": lines_before,
+        "checkpoint": checkpoint,
+        "total": total,
+        "success": success,
+        "unchanged": unchanged,
+        "skipped": skipped,
+        "duplicates": duplicates,
+        "prefiltered": prefiltered,
+        "failure": failure,
+        "stages": {
+            "read": stage_report(read_seconds, total),
+            "dedup": stage_report(dedup_seconds, total),
+            "prefilter": stage_report(prefilter_seconds, total),
+            "parse": stage_report(parse_seconds, total),
+            "write": stage_report(write_seconds, written),
+        },
+        "pipeline": pipeline_report,
+        "dedup": {
+            "hit_rate": round(duplicates / total, 4) if total else 0.0,
+            **duplicate_filter.stats(),
+        } if duplicate_filter is not None else None,
+        "timestamp_cache": timestamp_cache.stats(),
+        "content_hash_cache": content_cache.stats() if (content_cache := get_content_hash_cache()) else None,
+        "statement_shapes": stats.statement_shapes(),
+        "child_rows": stats.child_row_counts(),
+    }
+    print(f'{file}: Finished ingesting {total} lines, {success} successful, {unchanged} unchanged, {skipped} skipped, {failure} failed\n{time.time() - start_time:.2f} seconds elapsed, {total / (time.time() - start_time):.2f} lines/second', flush=True)
+    print(f'{file}: read {read_seconds:.2f}s, dedup {dedup_seconds:.2f}s ({duplicates} duplicates), prefilter {prefilter_seconds:.2f}s ({prefiltered} lines dropped), parse {parse_seconds:.2f}s (CPU, {PARSE_WORKERS} workers), write {write_seconds:.2f}s', flush=True)
+    return report
+
+
+def async_write_slots() -> asyncio.Semaphore:
+    """One slot per connection of the async pool, to be shared by every dataset ingested at once."""
+    return asyncio.Semaphore(async_pool.max_size)
+
+
+async def ingest_async(day: date, file: str, envelope: type[EDDNEventEnvelope[Any]], convert_func: Callable[[Any, Any], Any], batch_size: int = 1, batch_ms: int = DEFAULT_BATCH_MS, freshness_key: FreshnessKey | None = None, source_dir: str | None = None, offline: bool = False, lanes: int | None = None, write_slots: asyncio.Semaphore | None = None):
+    """
+    Ingest one dataset file for a day on the event loop. Lines arrive from load_file, are filtered in a
+    thread like in ingest(), parsed in the parse pool (or a thread without one) with a window of chunks
+    in flight, and written by `lanes` write tasks on the async pool. Events are sharded across lanes by
+    key as with ShardedWriters, so each key's events are written in file order, and many datasets can
+    run concurrently in one process. A lane writes only while holding one of `write_slots`, which
+    datasets ingested together share (see async_write_slots), so waiting lanes queue here instead of
+    timing out on the pool. A lane that fails, e.g. on a PoolTimeout, ends the run with its error and
+    the other lanes are cancelled, as ShardedWriters re-raises a worker's error in ingest().
+    """
+    total = 0
+    success = 0
+    skipped = 0
+    failure = 0
+    unchanged = 0
+    duplicates = 0
+    prefiltered = 0
+    start_time = time.time()
+    lanes = ASYNC_WRITE_LANES if lanes is None else lanes
+    write_slots = async_write_slots() if write_slots is None else write_slots
+    stats = WriteStats()
+
+    loop = asyncio.get_running_loop()
+    parse_pool = get_parse_pool()
+    timestamp_cache = get_timestamp_cache()
+    duplicate_filter = new_duplicate_filter()
+    # Bounded, so parsing waits for a lane that falls behind
+    lane_queues: list[asyncio.Queue[list[PendingWrite] | None]] = [asyncio.Queue(maxsize=2) for _ in range(lanes)]
+    lane_batches: list[list[PendingWrite]] = [[] for _ in range(lanes)]
+    lane_started = [time.monotonic()] * lanes
+
+    async def write_lane(lane_queue: "asyncio.Queue[list[PendingWrite] | None]") -> None:
+        nonlocal success, skipped, failure, unchanged
+        while (batch := await lane_queue.get()) is not None:
+            async with write_slots:
+                result = await flush_batch_async(batch, stats)
+            success += result.success
+            skipped += result.skipped
+            failure += result.failure
+            unchanged += result.unchanged
+
+    def check_lanes() -> None:
+        """Re-raise the error of a lane that died, which would otherwise leave its queue full for good."""
+        for task in lane_tasks:
+            if task.done():
+                task.result()
+
+    async def put_lane(lane: int, batch: list[PendingWrite] | None) -> None:
+        if not lane_queues[lane].full():
+            lane_queues[lane].put_nowait(batch)
+            return
+        put = asyncio.ensure_future(lane_queues[lane].put(batch))
+        await asyncio.wait([put, lane_tasks[lane]], return_when=asyncio.FIRST_COMPLETED)
+        if not put.done():
+            put.cancel()
+            check_lanes()
+
+    async def flush_lane(lane: int) -> None:
+        if lane_batches[lane]:
+            await put_lane(lane, lane_batches[lane])
+            lane_batches[lane] = []
+
+    async def handle(chunk: ParsedChunk) -> None:
+        nonlocal skipped, failure
+        skipped += chunk.skipped
+        failure += chunk.failure
+        for pending in chunk.pending:
+            lane = hash(shard_lock(pending, freshness_key)) % lanes
+            if not lane_batches[lane]:
+                lane_started[lane] = time.monotonic()
+            lane_batches[lane].append(pending)
+            if len(lane_batches[lane]) >= batch_size:
+                await flush_lane(lane)
+        for lane in range(lanes):
+            if lane_batches[lane] and (time.monotonic() - lane_started[lane]) * 1000 >= batch_ms:
+                await flush_lane(lane)
+
+    def filter_lines(chunk_lines: list[bytes], first_line: int) -> list[tuple[int, bytes]]:
+        nonlocal duplicates, prefiltered
+        numbered_lines: list[tuple[int, bytes]] = []
+        for line_number, line in enumerate(chunk_lines, first_line):
+            if duplicate_filter is not None and (fingerprint := message_fingerprint(line)) is not None and duplicate_filter.seen(fingerprint):
+                duplicates += 1
+            elif is_prefiltered(line, freshness_key, timestamp_cache):
+                prefiltered += 1
+            else:
+                numbered_lines.append((line_number, line))
+        return numbered_lines
+
+    lane_tasks = [asyncio.create_task(write_lane(lane_queue)) for lane_queue in lane_queues]
+    in_flight: deque[asyncio.Future[ParsedChunk]] = deque()
+    try:
+        async for chunk_lines in load_file(file, day, source_dir, offline):
+            check_lanes()
+            # Fingerprinting and prefiltering are CPU work, kept off the event loop as in ingest()'s filter stage
+            numbered_lines = await asyncio.to_thread(filter_lines, chunk_lines, total + 1)
+            skipped += len(chunk_lines) - len(numbered_lines)
+            total += len(chunk_lines)
+
+            if numbered_lines:
+                in_flight.append(loop.run_in_executor(parse_pool, parse_chunk, envelope, convert_func, numbered_lines))
+            # Results are handled in file order; keep the parse workers busy without parsing ahead unboundedly
+            while in_flight and (len(in_flight) > 2 * max(PARSE_WORKERS, 1) or in_flight[0].done()):
+                await handle(await in_flight.popleft())
+
+            if total // 1000 != (total - len(chunk_lines)) // 1000:
+                print(f"{file}: Ingested {total} lines so far, {success} successful, {unchanged} unchanged, {skipped} skipped, {failure} failed\n{time.time() - start_time:.2f} seconds elapsed, {total / (time.time() - start_time):.2f} lines/second", flush=True)
+
+        while in_flight:
+            await handle(await in_flight.popleft())
+        for lane in range(lanes):
+            await flush_lane(lane)
+        for lane in range(lanes):
+            await put_lane(lane, None)
+        await asyncio.gather(*lane_tasks)
+    finally:
+        # After an error, stop the lanes still writing and let them roll back before it propagates
+        for task in lane_tasks:
+            task.cancel()
+        await asyncio.gather(*lane_tasks, return_exceptions=True)
+
+    report: dict[str, Any] = {
+        "status": "success",
+        "engine": "async",
+        "input": file,
+        "total": total,
+        "success": success,
+        "unchanged": unchanged,
+        "skipped": skipped,
+        "duplicates": duplicates,
+        "prefiltered": prefiltered,
+        "failure": failure,
+        "lanes": lanes,
+        "seconds": round(time.time() - start_time, 2),
+        "timestamp_cache": timestamp_cache.stats(),
+        "content_hash_cache": content_cache.stats() if (content_cache := get_content_hash_cache()) else None,
+        "child_rows": stats.child_row_counts(),
+    }
+    print(f'{file}: Finished ingesting {total} lines, {success} successful, {unchanged} unchanged, {skipped} skipped, {failure} failed\n{time.time() - start_time:.2f} seconds elapsed, {total / (time.time() - start_time):.2f} lines/second', flush=True)
     return report
 
 
 # New endpoint: /ingest/day/{model} with model optional
 
+# Besides what ingest() needs, a dataset may set a scheduling "priority" (default 0, higher starts first)
+# and "max_writers", the most writer threads it shards its keys across (default INGEST_SCHEDULER_WRITERS)
 datasets: dict[str, dict[str, Any]] = {
     "FSDJump": {
         "file": "Journal.FSDJump",
-        "model": FSDJump,
+        "envelope": FSDJumpEnvelope,
         "convert": convert_fsd_jump,
+        "freshness_key": FSD_JUMP_FRESHNESS_KEY,
+        "batch_size": 500,
     },
     "Scan": {
         "file": "Journal.Scan",
-        "model": Scan,
+        "envelope": ScanEnvelope,
         "convert": convert_scan,
+        "freshness_key": SCAN_FRESHNESS_KEY,
+        "batch_size": 500,
     },
     "ScanBaryCentre": {
         "file": "Journal.ScanBaryCentre",
-        "model": ScanBaryCentre,
+        "envelope": ScanBaryCentreEnvelope,
         "convert": convert_scanbarycentre,
+        "freshness_key": SCAN_BARYCENTRE_FRESHNESS_KEY,
+        "batch_size": 500,
     },
     "Docked": {
         "file": "Journal.Docked",
-        "model": Docked,
+        "envelope": DockedEnvelope,
         "convert": convert_docked,
+        "freshness_key": DOCKED_FRESHNESS_KEY,
+        "batch_size": 200,
     },
     "ApproachSettlement": {
         "file": "Journal.ApproachSettlement",
-        "model": ApproachSettlement,
+        "envelope": ApproachSettlementEnvelope,
         "convert": convert_approach_settlement,
+        "freshness_key": APPROACH_SETTLEMENT_FRESHNESS_KEY,
+        "batch_size": 200,
     },
     "CarrierJump": {
         "file": "Journal.CarrierJump",
-        "model": CarrierJump,
+        "envelope": CarrierJumpEnvelope,
         "convert": convert_carrier_jump,
+        "freshness_key": CARRIER_JUMP_FRESHNESS_KEY,
+        "batch_size": 200,
     },
     "Market": {
         "file": "Commodity",
-        "model": Market,
+        "envelope": MarketEnvelope,
         "convert": convert_market,
+        "freshness_key": MARKET_FRESHNESS_KEY,
+        "batch_size": 50,
     },
     "Outfitting": {
         "file": "Outfitting",
-        "model": Outfitting,
+        "envelope": OutfittingEnvelope,
         "convert": convert_outfitting,
+        "freshness_key": OUTFITTING_FRESHNESS_KEY,
+        "batch_size": 100,
     },
     "Shipyard": {
         "file": "Shipyard",
-        "model": Shipyard,
+        "envelope": ShipyardEnvelope,
         "convert": convert_shipyard,
+        "freshness_key": SHIPYARD_FRESHNESS_KEY,
+        "batch_size": 100,
     },
     "SAASignalsFound": {
         "file": "Journal.SAASignalsFound",
-        "model": SAASignalsFound,
+        "envelope": SAASignalsFoundEnvelope,
         "convert": convert_saa_signals_found,
+        "freshness_key": None,
+        "batch_size": 200,
     },
     "FSSSignalDiscovered": {
         "file": "Journal.FSSSignalDiscovered",
-        "model": FSSSignalDiscovered,
+        "envelope": FSSSignalDiscoveredEnvelope,
         "convert": convert_fss_signal_discovered,
+        "freshness_key": None,
+        "batch_size": 200,
     },
     "FSSBodySignals": {
         "file": "Journal.FSSBodySignals",
-        "model": FSSBodySignals,
+        "envelope": FSSBodySignalsEnvelope,
         "convert": convert_fss_body_signals,
+        "freshness_key": None,
+        "batch_size": 200,
     },
 }
 
+def schedule_datasets(day: date, names: list[str], offline: bool = False) -> list[ScheduledDataset]:
+    """Describe the datasets for the scheduler, estimating their cost by the size of their archives."""
+    return [
+        ScheduledDataset(
+            name,
+            archive_size(datasets[name]["file"], day, offline=offline),
+            datasets[name].get("priority", 0),
+            datasets[name].get("max_writers", SCHEDULER_WRITERS),
+        )
+        for name in names
+    ]
+
+
 # Accepts /ingest/{day} or /ingest/{day}/{model} with model optional
 @app.post("/ingest/today")
 @app.post("/ingest/{day}")
 @app.post("/ingest/{day}/{model}")
 async def ingest_for_day(
     day: date | None = None,
-    model: str | None = None
+    model: str | None = None,
+    bulk: bool = False,
+    offline: bool = False,
+    engine: Literal["threads", "async"] = "threads",
+    resume: bool = False,
 ):
     """
     Downloads data for a specific day, decompresses it, and ingests it line by line.
-    If model is not provided, ingests all models.
+    If model is not provided, ingests all models, largest first (see run_scheduled).
+    With bulk set, batches are written through COPY and set-based merges, which suits full-day backfills.
+    With offline set, archives are only read from INGEST_SOURCE_DIR or the archive mirror, never downloaded.
+    With engine=async, datasets are ingested by ingest_async on the event loop, all at once, and always
+    written like in bulk mode.
+    With resume set, each file continues after its checkpoint (threads engine only).
     """
     reports = {}
     if not day:
         day = date.today()
+    if engine == "async":
+        selected = {model: datasets.get(model)} if model else datasets
+        if None in selected.values():
+            return {"status": "error", "message": f"Model {model} not found."}
+        write_slots = async_write_slots()
+        results = await asyncio.gather(*(
+            ingest_async(day, dataset["file"], dataset["envelope"], dataset["convert"], dataset["batch_size"], freshness_key=dataset["freshness_key"], offline=offline, write_slots=write_slots)
+            for dataset in selected.values()  # pyright: ignore[reportOptionalSubscript]
+        ), return_exceptions=True)
+        return dict(zip(selected.keys(), results))
     if model:
         if model not in datasets:
             return {"status": "error", "message": f"Model {model} not found."}
@@ -298,45 +989,106 @@ async def ingest_for_day(
         report = ingest(
             day,
             dataset["file"],
-            dataset["model"],
-            dataset["convert"]
+            dataset["envelope"],
+            dataset["convert"],
+            dataset["batch_size"],
+            bulk=bulk,
+            freshness_key=dataset["freshness_key"],
+            offline=offline,
+            resume=resume,
         )
         reports[model] = report
     else:
-        # Ingest all datasets 4 at once, start the 5th once one of the first 4 is done, and so on, so a pool size of 4
-        import asyncio
-        from concurrent.futures import ThreadPoolExecutor
-
-        with ThreadPoolExecutor(max_workers=4) as executor:
-            loop = asyncio.get_event_loop()
-            tasks = [
-                loop.run_in_executor(executor, ingest, day, dataset["file"], dataset["model"], dataset["convert"])
-                for dataset in datasets.values()
-            ]
-            results = await asyncio.gather(*tasks, return_exceptions=True)
-            for model_name, report in zip(datasets.keys(), results):
-                reports[model_name] = report
+        # Largest datasets first, sharing the write slots (see run_scheduled)
+        def run(scheduled: ScheduledDataset, writers: int, write_slots: threading.Semaphore) -> dict[str, Any]:
+            dataset = datasets[scheduled.name]
+            print(f"Starting {scheduled.name} ({scheduled.cost or 'unknown'} bytes) with {writers} writers", flush=True)
+            return ingest(day, dataset["file"], dataset["envelope"], dataset["convert"], dataset["batch_size"], bulk=bulk, freshness_key=dataset["freshness_key"], offline=offline, writers=writers, resume=resume, write_slots=write_slots)
+
+        scheduled = await asyncio.to_thread(schedule_datasets, day, list(datasets), offline)
+        reports.update(await asyncio.to_thread(run_scheduled, scheduled, SCHEDULER_WORKERS, SCHEDULER_WRITERS, run))
 
     return reports
 
 
+# Within this long after midnight, tail runs also pick up the lines appended to the previous day's files
+TAIL_GRACE = timedelta(hours=1)
+
+
+@app.post("/jobs/tail")
+def enqueue_tail_jobs():
+    """
+    Queues jobs that ingest only the lines appended to today's files since their checkpoints, for near
+    real-time data when called every few minutes. A file that has not changed since its last run is
+    not read again, and one that grew is decompressed from its last block on. Datasets that still have
+    a job queued or running for the day are left out, so slow runs do not pile up.
+    """
+    now = datetime.now()
+    days = [now.date()]
+    if now - datetime.combine(now.date(), datetime.min.time()) < TAIL_GRACE:
+        days.insert(0, now.date() - timedelta(days=1))
+    queued: dict[str, dict[str, int]] = {}
+    with pg_connection() as (_, cur):
+        for day in days:
+            queued[day.isoformat()] = enqueue_jobs(cur, day, list(datasets), {"bulk": False, "offline": False, "resume": True}, unless_pending=True)
+    return {"status": "queued", "jobs": queued}
+
+
+# Accepts /jobs/{day} or /jobs/{day}/{model} like /ingest, but returns right away
+@app.post("/jobs/today")
+@app.post("/jobs/{day}")
+@app.post("/jobs/{day}/{model}")
+def enqueue_jobs_for_day(
+    day: date | None = None,
+    model: str | None = None,
+    bulk: bool = False,
+    offline: bool = False,
+    resume: bool = True,
+):
+    """
+    Queues one ingest job per dataset for the day (or only the given one) and returns their ids. Jobs
+    are run by the job workers (python -m src.Jobs), any number of which may run at once.
+    By default jobs continue after each file's checkpoint; resume=false ingests the files from the start.
+    """
+    if not day:
+        day = date.today()
+    if model and model not in datasets:
+        return {"status": "error", "message": f"Model {model} not found."}
+    selected = [model] if model else list(datasets)
+    # Queued largest first, as workers claim jobs in queue order
+    selected = [scheduled.name for scheduled in schedule_order(schedule_datasets(day, selected, offline))]
+    with pg_connection() as (_, cur):
+        jobs = enqueue_jobs(cur, day, selected, {"bulk": bulk, "offline": offline, "resume": resume})
+    return {"status": "queued", "day": day, "jobs": jobs}
+
+
+@app.get("/jobs")
+def get_jobs(status: Literal["queued", "running", "done", "failed"] | None = None, limit: int = 100):
+    """The most recent ingest jobs with their live progress."""
+    with pg_connection() as (_, cur):
+        return list_jobs(cur, status, limit)
+
+
+@app.get("/jobs/{job_id}")
+def get_job_by_id(job_id: int):
+    with pg_connection() as (_, cur):
+        job = get_job(cur, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found.")
+    return job
+
 
 if __name__ == "__main__":
     print("Starting EDSearch-ng Ingest Service", flush=True)
-    print("Creating database tables if they do not exist", flush=True)
-    # Create necessary tables
-    create_tables([
-        create_ingestion_table(),
-        create_system_tables(),
-        create_body_tables(),
-        create_station_tables(),
-        create_landmark_tables(),
-        create_market_tables(),
-        create_shipyard_tables(),
-        create_outfitting_tables(),
-        create_signal_tables(),
-    ], drop=True)
-    print("Database tables created", flush=True)
+    print("Migrating the database schema", flush=True)
+    migrate(MIGRATIONS)
+    print("Database schema is up to date", flush=True)
+    if SCHEDULER_WRITERS > POOL_MAX_SIZE:
+        print(f"INGEST_SCHEDULER_WRITERS ({SCHEDULER_WRITERS}) exceeds DATABASE_POOL_MAX_SIZE ({POOL_MAX_SIZE}); writers will wait for connections and may time out", flush=True)
+    if TIMESTAMP_CACHE_WARM_DAYS > 0:
+        with pg_connection() as (conn, _):
+            loaded = get_timestamp_cache().warm(conn, TIMESTAMP_CACHE_WARM_DAYS)
+        print(f"Loaded {loaded} timestamps of the last {TIMESTAMP_CACHE_WARM_DAYS:g} days into the timestamp cache", flush=True)
     print("Starting FastAPI server", flush=True)
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=5000)
\ No newline at end of file
@@ -0,0 +1,158 @@
+import argparse
+import json
+import os
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from typing import Any, Callable, TypeVar
+
+import psycopg
+
+from .Database import conninfo, migrate, set_relaxed_durability
+from .Ingest import SCHEDULER_WORKERS, SCHEDULER_WRITERS, datasets, ingest, schedule_datasets
+from .ingest.schedule import ScheduledDataset, run_scheduled
+from .models.db.initial_load import (
+    defer_constraints,
+    defer_indexes,
+    deferred_indexes,
+    is_loaded,
+    load_tables,
+    rebuild_index,
+    restore_constraints,
+    set_logged,
+    unlogged_tables,
+    unvalidated_constraints,
+    validate_constraint,
+)
+from .models.db.migrations import MIGRATIONS
+
+T = TypeVar("T")
+
+# Connections rebuilding indexes, switching tables back to logged and validating foreign keys at once
+BUILD_CONNECTIONS = int(os.getenv("INGEST_INITIAL_LOAD_BUILD_CONNECTIONS", "2"))
+# maintenance_work_mem of each of those connections; index builds that fit in memory are much faster
+MAINTENANCE_WORK_MEM = os.getenv("INGEST_INITIAL_LOAD_MAINTENANCE_WORK_MEM", "512MB")
+# Parallel workers Postgres may add to each index build
+PARALLEL_MAINTENANCE_WORKERS = int(os.getenv("INGEST_INITIAL_LOAD_PARALLEL_WORKERS", "2"))
+
+
+def prepare(force: bool = False) -> dict[str, int]:
+    """
+    Make the database cheap to bulk load: drop the foreign keys and secondary indexes (recording them
+    to restore later) and make the tables unlogged. A crash truncates unlogged tables, so this refuses
+    to touch a database that already holds data unless forced; an interrupted initial load is fine.
+    """
+    with psycopg.connect(conninfo, autocommit=True) as conn:
+        if is_loaded(conn) and not unlogged_tables(conn) and not force:
+            raise RuntimeError("The database already holds data, which a crash during the initial load would lose; use --force to load anyway")
+        constraints = defer_constraints(conn)
+        indexes = defer_indexes(conn)
+        tables = load_tables(conn)
+        for table in tables:
+            set_logged(conn, table, False)
+    return {"constraints": constraints, "indexes": indexes, "tables": len(tables)}
+
+
+def load(start: date, end: date, offline: bool = False) -> dict[str, Any]:
+    """Ingest every day from start to end, oldest first, each with the dataset scheduler and bulk writes."""
+    totals: Counter[str] = Counter()
+    failed: dict[str, str] = {}
+    day = start
+    while day <= end:
+        def run(scheduled: ScheduledDataset, writers: int, write_slots: threading.Semaphore) -> dict[str, Any]:
+            dataset = datasets[scheduled.name]
+            return ingest(day, dataset["file"], dataset["envelope"], dataset["convert"], dataset["batch_size"], bulk=True, freshness_key=dataset["freshness_key"], offline=offline, writers=writers, resume=True, write_slots=write_slots)
+
+        results = run_scheduled(schedule_datasets(day, list(datasets), offline), SCHEDULER_WORKERS, SCHEDULER_WRITERS, run)
+        for name, result in results.items():
+            if isinstance(result, Exception):
+                failed[f"{day} {name}"] = str(result)
+            else:
+                totals.update({key: result[key] for key in ("total", "success", "unchanged", "skipped", "failure")})
+        print(f"Initial load: {day} done, {totals['total']} lines so far", flush=True)
+        day += timedelta(days=1)
+    return {**totals, "failed": failed}
+
+
+def in_parallel(func: Callable[[psycopg.Connection, T], None], items: list[T]) -> dict[str, str]:
+    """Run func on BUILD_CONNECTIONS connections at once, each set up for maintenance work. Returns the errors by item."""
+    def run(item: T) -> str | None:
+        try:
+            with psycopg.connect(conninfo, autocommit=True) as conn:
+                conn.execute(f"SET maintenance_work_mem = '{MAINTENANCE_WORK_MEM}'")  # pyright: ignore[reportArgumentType]
+                conn.execute(f"SET max_parallel_maintenance_workers = {PARALLEL_MAINTENANCE_WORKERS}")  # pyright: ignore[reportArgumentType]
+                func(conn, item)
+            return None
+        except psycopg.Error as e:
+            print(f"Initial load: {item} failed: {e}", flush=True)
+            return str(e)
+
+    with ThreadPoolExecutor(max_workers=BUILD_CONNECTIONS) as executor:
+        errors = dict(zip(map(str, items), executor.map(run, items)))
+    return {item: error for item, error in errors.items() if error is not None}
+
+
+def finish(phases: dict[str, float]) -> dict[str, Any]:
+    """
+    Turn the database back to normal: switch the tables back to logged, rebuild the deferred indexes,
+    then add the foreign keys back and check the loaded rows against them, each step in parallel. Also
+    completes an initial load that was interrupted before.
+    """
+    with psycopg.connect(conninfo, autocommit=True) as conn:
+        tables = unlogged_tables(conn)
+        indexes = deferred_indexes(conn)
+    errors: dict[str, dict[str, str]] = {}
+
+    start = time.perf_counter()
+    errors["logged"] = in_parallel(lambda conn, table: set_logged(conn, table, True), tables)
+    phases["logged"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    errors["indexes"] = in_parallel(lambda conn, index: rebuild_index(conn, *index), indexes)
+    phases["indexes"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    with psycopg.connect(conninfo, autocommit=True) as conn:
+        restore_constraints(conn)
+        constraints = unvalidated_constraints(conn)
+    errors["constraints"] = in_parallel(lambda conn, constraint: validate_constraint(conn, *constraint), constraints)
+    phases["constraints"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    with psycopg.connect(conninfo, autocommit=True) as conn:
+        conn.execute("ANALYZE")
+    phases["analyze"] = time.perf_counter() - start
+    return {"tables": len(tables), "indexes": len(indexes), "constraints": len(constraints), "errors": {step: e for step, e in errors.items() if e}}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Bootstrap a database from the archives of a range of days, with indexes and foreign keys deferred to the end and tables unlogged meanwhile.",
+    )
+    parser.add_argument("start", nargs="?", type=date.fromisoformat, help="First day to load")
+    parser.add_argument("end", nargs="?", type=date.fromisoformat, help="Last day to load (default: start)")
+    parser.add_argument("--offline", action="store_true", help="Only read archives from INGEST_SOURCE_DIR or the mirror")
+    parser.add_argument("--force", action="store_true", help="Load into a database that already holds data")
+    parser.add_argument("--finish", action="store_true", help="Only restore the database after an interrupted initial load")
+    args = parser.parse_args()
+    if not args.finish and args.start is None:
+        parser.error("start is required unless --finish is given")
+
+    # Before anything opens the connection pools
+    set_relaxed_durability(True)
+    migrate(MIGRATIONS)
+    phases: dict[str, float] = {}
+    report: dict[str, Any] = {}
+    if not args.finish:
+        start = time.perf_counter()
+        report["prepare"] = prepare(args.force)
+        phases["prepare"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        report["load"] = load(args.start, args.end or args.start, args.offline)
+        phases["load"] = time.perf_counter() - start
+    report["finish"] = finish(phases)
+    report["phases"] = {phase: round(seconds, 2) for phase, seconds in phases.items()}
+    print(json.dumps(report, indent=2), flush=True)
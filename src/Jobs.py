@@ -0,0 +1,116 @@
+import os
+import socket
+import threading
+import traceback
+from typing import Any
+
+from psycopg.rows import DictRow
+
+from .Database import bookkeeping_connection, migrate, pg_connection
+from .Ingest import TIMESTAMP_CACHE_WARM_DAYS, datasets, get_timestamp_cache, ingest
+from .models.db.jobs import claim_job, finish_job, heartbeat_job
+from .models.db.migrations import MIGRATIONS
+
+# Jobs a worker process runs at once
+JOB_WORKERS = int(os.getenv("INGEST_JOB_WORKERS", "1"))
+# How often a running job records its progress, which also tells other workers it is still alive
+JOB_HEARTBEAT_SECONDS = float(os.getenv("INGEST_JOB_HEARTBEAT_SECONDS", "10"))
+# A running job without a heartbeat for this long is considered abandoned and taken over by another worker
+JOB_STALE_SECONDS = float(os.getenv("INGEST_JOB_STALE_SECONDS", "120"))
+# Attempts after which an abandoned job is failed instead of taken over
+JOB_MAX_ATTEMPTS = int(os.getenv("INGEST_JOB_MAX_ATTEMPTS", "3"))
+# How long an idle worker waits before looking for queued jobs again
+JOB_POLL_SECONDS = float(os.getenv("INGEST_JOB_POLL_SECONDS", "5"))
+
+
+def run_job(job: DictRow, worker: str) -> None:
+    """
+    Run a claimed job, sending its latest counts as heartbeats while it runs, and record its report or
+    error. A job taken over by another worker in the meantime is finished by that worker instead, and
+    with resume set it continues from the file's checkpoint rather than from the start.
+    """
+    progress: dict[str, Any] = {}
+    done = threading.Event()
+
+    def record(counts: dict[str, Any]) -> None:
+        nonlocal progress
+        progress = counts
+
+    def heartbeat() -> None:
+        while not done.wait(JOB_HEARTBEAT_SECONDS):
+            try:
+                with bookkeeping_connection() as (_, cur):
+                    if not heartbeat_job(cur, job["id"], worker, progress):
+                        print(f"Job {job['id']} was taken over by another worker", flush=True)
+                        return
+            except Exception as e:
+                print(f"Heartbeat of job {job['id']} failed: {e}", flush=True)
+
+    print(f"{worker}: running job {job['id']} ({job['dataset']} of {job['day']}, attempt {job['attempts']})", flush=True)
+    heartbeat_thread = threading.Thread(target=heartbeat, daemon=True)
+    heartbeat_thread.start()
+    result: dict[str, Any] | None = None
+    error: str | None = None
+    try:
+        dataset = datasets.get(job["dataset"])
+        if dataset is None:
+            raise ValueError(f"Model {job['dataset']} not found.")
+        options = job["options"]
+        result = ingest(
+            job["day"],
+            dataset["file"],
+            dataset["envelope"],
+            dataset["convert"],
+            dataset["batch_size"],
+            bulk=options.get("bulk", False),
+            freshness_key=dataset["freshness_key"],
+            offline=options.get("offline", False),
+            progress=record,
+            resume=options.get("resume", False),
+        )
+    except Exception:
+        error = traceback.format_exc()
+        print(f"{worker}: job {job['id']} failed\n{error}", flush=True)
+    finally:
+        done.set()
+        heartbeat_thread.join()
+    with bookkeeping_connection() as (_, cur):
+        finish_job(cur, job["id"], worker, progress, result, error)
+
+
+def work(worker: str, stop: threading.Event) -> None:
+    """Claim and run jobs until stopped."""
+    while not stop.is_set():
+        try:
+            with bookkeeping_connection() as (_, cur):
+                job = claim_job(cur, worker, JOB_STALE_SECONDS, JOB_MAX_ATTEMPTS)
+        except Exception as e:
+            print(f"{worker}: could not claim a job: {e}", flush=True)
+            job = None
+        if job is None:
+            stop.wait(JOB_POLL_SECONDS)
+            continue
+        run_job(job, worker)
+
+
+if __name__ == "__main__":
+    print("Starting EDSearch-ng Ingest Job Worker", flush=True)
+    migrate(MIGRATIONS)
+    if TIMESTAMP_CACHE_WARM_DAYS > 0:
+        with pg_connection() as (conn, _):
+            loaded = get_timestamp_cache().warm(conn, TIMESTAMP_CACHE_WARM_DAYS)
+        print(f"Loaded {loaded} timestamps of the last {TIMESTAMP_CACHE_WARM_DAYS:g} days into the timestamp cache", flush=True)
+    stop = threading.Event()
+    name = f"{socket.gethostname()}:{os.getpid()}"
+    threads = [threading.Thread(target=work, args=(f"{name}:{n}", stop)) for n in range(JOB_WORKERS)]
+    for thread in threads:
+        thread.start()
+    print(f"Running {JOB_WORKERS} job workers as {name}", flush=True)
+    try:
+        for thread in threads:
+            thread.join()
+    except KeyboardInterrupt:
+        # Running jobs finish first; a killed worker's jobs are taken over once their heartbeats go stale
+        stop.set()
+        for thread in threads:
+            thread.join()
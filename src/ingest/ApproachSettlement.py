@@ -3,11 +3,16 @@ from pydantic import BaseModel
 
 from ..models.eddn.EDDNEnvelope import EDDNEnvelope
 from ..models.db.ingestion import DatabaseModels
+from .prefilter import FreshnessKey
 from ..models.db.station import Station, StationEconomy
 from ..models.eddn.ApproachSettlement import ApproachSettlement
 from ..models.db.landmark import Landmark
 
 
+# Only settlements with a market become stations; the others are landmarks and are not pre-filtered
+APPROACH_SETTLEMENT_FRESHNESS_KEY = FreshnessKey("station", "ApproachSettlement", {"MarketID": "MarketID"})
+
+
 def convert_approach_settlement(settlement: ApproachSettlement, envelope: EDDNEnvelope) -> DatabaseModels:
     """Convert an ApproachSettlement event to a Station model or a landmark."""
     dbModels = DatabaseModels()
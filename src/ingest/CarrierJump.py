@@ -2,6 +2,10 @@ from ..models.eddn.EDDNEnvelope import EDDNEnvelope
 from ..models.db.station import Station
 from ..models.eddn.CarrierJump import CarrierJump
 from ..models.db.ingestion import DatabaseModels
+from .prefilter import FreshnessKey
+
+
+CARRIER_JUMP_FRESHNESS_KEY = FreshnessKey("station", "CarrierJump", {"MarketID": "MarketID"})
 
 
 def convert_carrier_jump(carrier_jump: CarrierJump, envelope: EDDNEnvelope) -> DatabaseModels:
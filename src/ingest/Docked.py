@@ -2,6 +2,10 @@ from ..models.eddn.EDDNEnvelope import EDDNEnvelope
 from ..models.db.station import Station, StationEconomy
 from ..models.eddn.Docked import Docked
 from ..models.db.ingestion import DatabaseModels
+from .prefilter import FreshnessKey
+
+
+DOCKED_FRESHNESS_KEY = FreshnessKey("station", "Docked", {"MarketID": "MarketID"})
 
 
 def convert_docked(docked: Docked, envelope: EDDNEnvelope) -> DatabaseModels:
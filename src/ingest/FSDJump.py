@@ -4,6 +4,10 @@ from ..models.db.system import SystemPower, Faction, FactionStateT, Conflict, Sy
 from ..models.db.body import Body
 from ..models.eddn.FSDJump import FSDJump
 from ..models.db.ingestion import DatabaseModels
+from .prefilter import FreshnessKey
+
+FSD_JUMP_FRESHNESS_KEY = FreshnessKey("system", "FSDJump", {"SystemAddress": "SystemAddress"})
+
 
 def convert_fsd_jump(fsdJump: FSDJump, envelope: EDDNEnvelope) -> DatabaseModels:
     dbModels = DatabaseModels()
@@ -3,6 +3,10 @@ from ..models.eddn.EDDNEnvelope import EDDNEnvelope
 from ..models.db.market import Market, MarketCommodity
 from ..models.eddn.Market import Market as EDDNMarket
 from ..models.db.ingestion import DatabaseModels
+from .prefilter import FreshnessKey
+
+MARKET_FRESHNESS_KEY = FreshnessKey("market", "Market", {"marketId": "marketId"})
+
 
 def convert_market(market_event: EDDNMarket, envelope: EDDNEnvelope) -> DatabaseModels:
     dbModels = DatabaseModels()
@@ -2,6 +2,10 @@ from ..models.eddn.EDDNEnvelope import EDDNEnvelope
 from ..models.db.outfitting import Outfitting, OutfittingItem
 from ..models.eddn.Outfitting import Outfitting as EDDNOutfitting
 from ..models.db.ingestion import DatabaseModels
+from .prefilter import FreshnessKey
+
+OUTFITTING_FRESHNESS_KEY = FreshnessKey("outfitting", "Outfitting", {"marketId": "marketId"})
+
 
 def convert_outfitting(outfitting_event: EDDNOutfitting, envelope: EDDNEnvelope) -> DatabaseModels:
     dbModels = DatabaseModels()
@@ -2,6 +2,10 @@ from ..models.eddn.EDDNEnvelope import EDDNEnvelope
 from ..models.db.body import Body, Material, Atmospherecomposition, Ring
 from ..models.eddn.Scan import Scan
 from ..models.db.ingestion import DatabaseModels
+from .prefilter import FreshnessKey
+
+
+SCAN_FRESHNESS_KEY = FreshnessKey("body", "Scan", {"SystemAddress": "SystemAddress", "BodyID": "BodyID"})
 
 
 def convert_scan(scan: Scan, envelope: EDDNEnvelope) -> DatabaseModels:
@@ -2,10 +2,14 @@ from pydantic import BaseModel
 
 from ..models.eddn.EDDNEnvelope import EDDNEnvelope
 from ..models.db.ingestion import DatabaseModels
+from .prefilter import FreshnessKey
 from ..models.eddn.ScanBaryCentre import ScanBaryCentre
 from ..models.db.body import Body
 
 
+SCAN_BARYCENTRE_FRESHNESS_KEY = FreshnessKey("body", "ScanBaryCentre", {"SystemAddress": "SystemAddress", "BodyID": "BodyID"})
+
+
 def convert_scanbarycentre(scan: ScanBaryCentre, envelope: EDDNEnvelope) -> DatabaseModels:
     dbModels = DatabaseModels()
     # Determine body type based on scan type and star/planet class
@@ -2,6 +2,10 @@ from ..models.eddn.EDDNEnvelope import EDDNEnvelope
 from ..models.db.shipyard import Shipyard, ShipyardShip
 from ..models.eddn.Shipyard import Shipyard as EDDNShipyard
 from ..models.db.ingestion import DatabaseModels
+from .prefilter import FreshnessKey
+
+SHIPYARD_FRESHNESS_KEY = FreshnessKey("shipyard", "Shipyard", {"marketId": "marketId"})
+
 
 def convert_shipyard(shipyard_event: EDDNShipyard, envelope: EDDNEnvelope) -> DatabaseModels:
     dbModels = DatabaseModels()
@@ -0,0 +1,267 @@
+import json
+import os
+import tempfile
+import threading
+from datetime import date
+from typing import Iterator
+
+import httpx
+
+ARCHIVE_URL = "https://edgalaxydata.space/EDDN/{year_month}/{filename}-{full_date}.jsonl.bz2"
+
+# Directory of the on-disk archive mirror; unset disables the mirror and streams every download
+MIRROR_DIR = os.getenv("INGEST_MIRROR_DIR")
+# Size budget of the mirror; least recently used archives are evicted beyond it
+MIRROR_MAX_BYTES = int(float(os.getenv("INGEST_MIRROR_MAX_GB", "50")) * 1024**3)
+# Directory of local archives to ingest from instead of downloading, for offline backfills and benchmarks
+SOURCE_DIR = os.getenv("INGEST_SOURCE_DIR")
+
+
+def archive_name(filename: str, day: date) -> str:
+    """Path of a day's archive relative to the archive root, e.g. 2025-01/Journal.Scan-2025-01-15.jsonl.bz2"""
+    return f"{day:%Y-%m}/{filename}-{day:%Y-%m-%d}.jsonl.bz2"
+
+
+def archive_url(filename: str, day: date) -> str:
+    return ARCHIVE_URL.format(year_month=day.strftime("%Y-%m"), filename=filename, full_date=day.strftime("%Y-%m-%d"))
+
+
+def find_local_archive(source_dir: str, filename: str, day: date) -> str:
+    """Find a day's archive in a local directory, laid out like the mirror (by month) or flat."""
+    nested = os.path.join(source_dir, archive_name(filename, day))
+    flat = os.path.join(source_dir, os.path.basename(nested))
+    for path in (nested, flat):
+        if os.path.isfile(path):
+            return path
+    raise FileNotFoundError(f"No local archive for {filename} on {day} in {source_dir}")
+
+
+def stream_url_chunks(url: str) -> Iterator[bytes]:
+    with httpx.stream("GET", url, timeout=None) as response:
+        response.raise_for_status()
+        yield from response.iter_bytes()
+
+
+class ArchiveMirror:
+    """
+    On-disk mirror of the edgalaxydata.space archives.
+
+    An archive is streamed to the caller while it is being written to a temporary file next to its final
+    path. Once the whole body has arrived and its size matches Content-Length, it is renamed into place
+    with its ETag and size in a sidecar file. Later reads revalidate the ETag with a conditional request
+    and then read the file from disk. Files are evicted least recently used first (by mtime, which is
+    touched on every read) once the mirror grows beyond its size budget.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._evict_lock = threading.Lock()
+
+    def path(self, filename: str, day: date) -> str:
+        return os.path.join(self.directory, archive_name(filename, day))
+
+    def _read_meta(self, path: str) -> dict[str, str | int] | None:
+        """Return the sidecar of a complete mirrored archive, or None if it is missing or does not match."""
+        try:
+            with open(path + ".json") as file:
+                meta = json.load(file)
+            if os.path.getsize(path) != meta["size"]:
+                return None
+            return meta
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def version(self, filename: str, day: date) -> tuple[str | None, int] | None:
+        """ETag and size of the mirrored archive, or None if it is not complete in the mirror."""
+        meta = self._read_meta(self.path(filename, day))
+        if meta is None:
+            return None
+        etag = meta.get("etag")
+        return (str(etag) if etag else None), int(meta["size"])
+
+    def current_path(self, filename: str, day: date, offline: bool = False) -> str | None:
+        """
+        Return the path of the mirrored archive if it is current, revalidating its ETag with a conditional
+        request (or, without an ETag, its size), or None if it has to be downloaded. With offline set the
+        mirrored copy is used without revalidation.
+        """
+        path = self.path(filename, day)
+        meta = self._read_meta(path)
+        if offline:
+            if meta is None:
+                raise FileNotFoundError(f"{archive_name(filename, day)} is not in the mirror")
+            os.utime(path)
+            return path
+        if meta is None:
+            return None
+
+        headers = {"If-None-Match": str(meta["etag"])} if meta.get("etag") else {}
+        with httpx.stream("GET", archive_url(filename, day), headers=headers, timeout=None) as response:
+            if response.status_code != 304:
+                response.raise_for_status()
+                length = response.headers.get("Content-Length")
+                if meta.get("etag") or length is None or int(length) != meta["size"]:
+                    return None
+        print(f"{archive_name(filename, day)} is up to date in the mirror", flush=True)
+        os.utime(path)
+        return path
+
+    def download(self, filename: str, day: date) -> Iterator[bytes]:
+        """Stream a day's archive from the network while writing it into the mirror."""
+        url = archive_url(filename, day)
+        print(f"Downloading data from {url}", flush=True)
+        with httpx.stream("GET", url, timeout=None) as response:
+            response.raise_for_status()
+            yield from self._download(response, self.path(filename, day), url)
+
+    def _download(self, response: httpx.Response, path: str, url: str) -> Iterator[bytes]:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, part_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=os.path.basename(path) + ".", suffix=".part")
+        try:
+            size = 0
+            with os.fdopen(fd, "wb") as file:
+                for chunk in response.iter_bytes():
+                    file.write(chunk)
+                    size += len(chunk)
+                    yield chunk
+                file.flush()
+                os.fsync(file.fileno())
+
+            length = response.headers.get("Content-Length")
+            if length is not None and int(length) != size:
+                raise IOError(f"Incomplete download of {url}: {size} of {length} bytes")
+
+            meta = {"url": url, "etag": response.headers.get("ETag"), "size": size}
+            with open(part_path + ".json", "w") as file:
+                json.dump(meta, file)
+            # Replace the archive before its sidecar; a crash in between leaves a size mismatch, never a stale match
+            os.replace(part_path, path)
+            os.replace(part_path + ".json", path + ".json")
+        finally:
+            for leftover in (part_path, part_path + ".json"):
+                if os.path.exists(leftover):
+                    os.remove(leftover)
+        self.evict(keep=path)
+
+    def evict(self, keep: str | None = None) -> None:
+        """Remove least recently used archives until the mirror fits its size budget."""
+        with self._evict_lock:
+            archives: list[tuple[float, int, str]] = []
+            for root, _, files in os.walk(self.directory):
+                for name in files:
+                    if name.endswith(".jsonl.bz2"):
+                        path = os.path.join(root, name)
+                        stat = os.stat(path)
+                        archives.append((stat.st_mtime, stat.st_size, path))
+            total = sum(size for _, size, _ in archives)
+            for _, size, path in sorted(archives):
+                if total <= self.max_bytes:
+                    break
+                if path == keep:
+                    continue
+                print(f"Evicting {os.path.relpath(path, self.directory)} from the archive mirror", flush=True)
+                for victim in (path, path + ".json"):
+                    if os.path.exists(victim):
+                        os.remove(victim)
+                total -= size
+
+
+_mirror = ArchiveMirror(MIRROR_DIR, MIRROR_MAX_BYTES) if MIRROR_DIR else None
+
+
+def get_archive_mirror() -> ArchiveMirror | None:
+    """Get the archive mirror configured with INGEST_MIRROR_DIR, if any."""
+    return _mirror
+
+
+def local_archive(filename: str, day: date, source_dir: str | None = None, offline: bool = False) -> str | None:
+    """
+    Return the path of a day's archive on disk: in source_dir when given, else the current copy in the
+    mirror when configured. Returns None when the archive has to be downloaded.
+    """
+    source_dir = source_dir or SOURCE_DIR
+    if source_dir:
+        path = find_local_archive(source_dir, filename, day)
+        print(f"Reading data from {path}", flush=True)
+        return path
+
+    mirror = get_archive_mirror()
+    if mirror:
+        return mirror.current_path(filename, day, offline)
+    if offline:
+        raise FileNotFoundError("Offline ingestion needs INGEST_SOURCE_DIR or INGEST_MIRROR_DIR")
+    return None
+
+
+def download_chunks(filename: str, day: date) -> Iterator[bytes]:
+    """Yield the compressed bytes of a day's archive from edgalaxydata.space, through the mirror when configured."""
+    mirror = get_archive_mirror()
+    if mirror:
+        yield from mirror.download(filename, day)
+        return
+    url = archive_url(filename, day)
+    print(f"Downloading data from {url}", flush=True)
+    yield from stream_url_chunks(url)
+
+
+def archive_size(filename: str, day: date, source_dir: str | None = None, offline: bool = False) -> int | None:
+    """
+    Compressed size of a day's archive, for estimating how long it takes to ingest: from disk when it is
+    in source_dir or the mirror (current or not), else from the Content-Length of a HEAD request. Returns
+    None when it is unknown, e.g. for a day that has no archive yet.
+    """
+    try:
+        source_dir = source_dir or SOURCE_DIR
+        if source_dir:
+            return os.path.getsize(find_local_archive(source_dir, filename, day))
+        mirror = get_archive_mirror()
+        if mirror and os.path.isfile(mirror.path(filename, day)):
+            return os.path.getsize(mirror.path(filename, day))
+        if offline:
+            return None
+        response = httpx.head(archive_url(filename, day), timeout=10, follow_redirects=True)
+        response.raise_for_status()
+        return int(response.headers["Content-Length"])
+    except (OSError, httpx.HTTPError, KeyError, ValueError):
+        return None
+
+
+def archive_version(filename: str, day: date, source_dir: str | None = None, offline: bool = False) -> tuple[str | None, int] | None:
+    """
+    ETag and size of a day's archive as it is now, to tell whether it changed since it was read: from
+    disk in source_dir (without an ETag) or, offline, in the mirror, else from a HEAD request. Returns
+    None when it is unknown, e.g. for a day that has no archive yet.
+    """
+    try:
+        source_dir = source_dir or SOURCE_DIR
+        if source_dir:
+            return None, os.path.getsize(find_local_archive(source_dir, filename, day))
+        mirror = get_archive_mirror()
+        if offline:
+            return mirror.version(filename, day) if mirror else None
+        response = httpx.head(archive_url(filename, day), timeout=10, follow_redirects=True)
+        response.raise_for_status()
+        return response.headers.get("ETag"), int(response.headers["Content-Length"])
+    except (OSError, httpx.HTTPError, KeyError, ValueError):
+        return None
+
+
+def archive_bytes_from(filename: str, day: date, start: int, source_dir: str | None = None, offline: bool = False) -> bytes | None:
+    """
+    The bytes of a day's archive from byte `start` on, read from disk when it is local (see
+    local_archive) and otherwise with a range request. Returns None when the server sends the whole
+    archive instead.
+    """
+    path = local_archive(filename, day, source_dir, offline)
+    if path:
+        with open(path, "rb") as file:
+            file.seek(start)
+            return file.read()
+    url = archive_url(filename, day)
+    print(f"Downloading data from {url} after byte {start}", flush=True)
+    with httpx.stream("GET", url, headers={"Range": f"bytes={start}-"}, timeout=None, follow_redirects=True) as response:
+        response.raise_for_status()
+        if response.status_code != 206:
+            return None
+        return response.read()
@@ -0,0 +1,57 @@
+import threading
+from typing import Any
+
+
+class Watermark:
+    """
+    Low watermark of the lines of a file: every line up to it is finished, i.e. written, or dropped by
+    the filter or the parser, so a run resumed from it neither misses nor repeats work. Lines finish out
+    of order (batches of sharded writers commit in any order), so the lines of each chunk are counted
+    down and the watermark only moves past a chunk once all of its lines are done.
+
+    Chunks are read in file order, then parsed, then their converted events are written. A chunk is
+    identified by the last of its lines that went on to be parsed, which is what the parser reports.
+    """
+
+    def __init__(self, line: int):
+        self.line = line
+        self._lock = threading.Lock()
+        # Chunks not yet passed, in file order: key -> [events still to write (None until parsed), last line]
+        self._chunks: dict[int, list[Any]] = {}
+        # Line of each event waiting to be written -> key of its chunk
+        self._chunk_of: dict[int, int] = {}
+
+    def read(self, last_line: int, parsed_last_line: int | None) -> None:
+        """
+        Add a chunk ending at last_line, of which the lines up to parsed_last_line go on to be parsed.
+        Without any lines to parse, the chunk is finished right away.
+        """
+        with self._lock:
+            if parsed_last_line is None:
+                self._chunks[last_line] = [0, last_line]
+            else:
+                self._chunks[parsed_last_line] = [None, last_line]
+            self._advance()
+
+    def parsed(self, parsed_last_line: int, lines: list[int]) -> None:
+        """Record the lines of a parsed chunk that are left to write."""
+        with self._lock:
+            self._chunks[parsed_last_line][0] = len(lines)
+            for line in lines:
+                self._chunk_of[line] = parsed_last_line
+            self._advance()
+
+    def written(self, lines: list[int]) -> None:
+        with self._lock:
+            for line in lines:
+                self._chunks[self._chunk_of.pop(line)][0] -= 1
+            self._advance()
+
+    def _advance(self) -> None:
+        while self._chunks:
+            key = next(iter(self._chunks))
+            outstanding, last_line = self._chunks[key]
+            if outstanding != 0:
+                return
+            del self._chunks[key]
+            self.line = last_line
@@ -0,0 +1,241 @@
+import bz2
+import mmap
+from collections import deque
+from concurrent.futures import Executor, Future
+from typing import Iterable, Iterator, NamedTuple
+
+from .lines import LineSplitter
+
+# Every bz2 block starts with this 48-bit magic (BCD pi) and every stream ends with the second one
+# (BCD sqrt(pi)) followed by the 32-bit combined CRC. Neither is byte aligned inside a stream.
+BLOCK_MAGIC = 0x314159265359
+END_OF_STREAM_MAGIC = 0x177245385090
+# A single-block stream is decoded with the largest block size so any block fits
+STREAM_HEADER = b"BZh9"
+# Compressed bytes at the end of an archive that always hold its whole last block: a block holds at
+# most 900 kB before compression, and bz2 barely grows data that does not compress
+LAST_BLOCK_BYTES = 2 * 1024 * 1024
+
+
+class StreamDecompressor:
+    """Incremental bz2 decompression of a byte stream, including files made of several concatenated streams."""
+
+    def __init__(self) -> None:
+        self._decompressor = bz2.BZ2Decompressor()
+
+    def decompress(self, chunk: bytes) -> bytes:
+        """Decompress the next chunk of the stream and return what it completes, possibly nothing."""
+        output: list[bytes] = []
+        while chunk:
+            output.append(self._decompressor.decompress(chunk))
+            if not self._decompressor.eof:
+                break
+            chunk = self._decompressor.unused_data
+            self._decompressor = bz2.BZ2Decompressor()
+        return b"".join(output)
+
+
+def decompress_chunks(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    """Decompress a bz2 byte stream sequentially, including files made of several concatenated streams."""
+    decompressor = StreamDecompressor()
+    for chunk in chunks:
+        decompressed_chunk = decompressor.decompress(chunk)
+        if decompressed_chunk:
+            yield decompressed_chunk
+
+
+def _magic_patterns(magic: int) -> list[tuple[int, bytes, int, int, int, int]]:
+    """
+    For each of the 8 bit offsets a 48-bit magic can start at, return the fully determined bytes to
+    search for, and the masks and values of the partially covered bytes before and after them.
+    """
+    patterns: list[tuple[int, bytes, int, int, int, int]] = []
+    for shift in range(8):
+        window_bytes = 6 if shift == 0 else 7
+        window = (magic << (window_bytes * 8 - shift - 48)).to_bytes(window_bytes, "big")
+        if shift == 0:
+            patterns.append((shift, window, 0, 0, 0, 0))
+        else:
+            head_mask = (1 << (8 - shift)) - 1
+            tail_mask = (0xFF << (8 - shift)) & 0xFF
+            patterns.append((shift, window[1:6], head_mask, window[0] & head_mask, tail_mask, window[6] & tail_mask))
+    return patterns
+
+
+_BLOCK_PATTERNS = _magic_patterns(BLOCK_MAGIC)
+_END_OF_STREAM_PATTERNS = _magic_patterns(END_OF_STREAM_MAGIC)
+
+
+def find_magic(data: bytes | mmap.mmap, patterns: list[tuple[int, bytes, int, int, int, int]]) -> list[int]:
+    """Return the bit offsets of every occurrence of a magic in data."""
+    offsets: list[int] = []
+    for shift, needle, head_mask, head, tail_mask, tail in patterns:
+        position = data.find(needle, 1 if shift else 0)
+        while position >= 0:
+            if shift == 0:
+                offsets.append(position * 8)
+            elif position + 5 < len(data) and data[position - 1] & head_mask == head and data[position + 5] & tail_mask == tail:
+                offsets.append((position - 1) * 8 + shift)
+            position = data.find(needle, position + 1)
+    return sorted(offsets)
+
+
+def find_blocks(data: bytes | mmap.mmap) -> list[tuple[int, int]]:
+    """
+    Return the (start, end) bit offsets of every compressed block, in file order. A block runs from its
+    magic to the next block or end-of-stream magic. Returns no blocks if the last one is unterminated.
+    """
+    blocks = find_magic(data, _BLOCK_PATTERNS)
+    markers = sorted(blocks + find_magic(data, _END_OF_STREAM_PATTERNS))
+    following = {start: end for start, end in zip(markers, markers[1:])}
+    if any(start not in following for start in blocks):
+        return []
+    return [(start, following[start]) for start in blocks]
+
+
+def decompress_block(data: bytes, start: int, end: int) -> bytes:
+    """
+    Decompress one block cut out of a stream. data starts at the byte holding bit `start`; the block's
+    bits are realigned and wrapped into a standalone single-block stream whose combined CRC is the
+    block's own CRC.
+    """
+    bit_offset = start % 8
+    bits = end - start
+    value = int.from_bytes(data, "big")
+    value >>= len(data) * 8 - bit_offset - bits
+    value &= (1 << bits) - 1
+    block_crc = (value >> (bits - 80)) & 0xFFFFFFFF
+
+    value = (value << 80) | (END_OF_STREAM_MAGIC << 32) | block_crc
+    bits += 80
+    padding = -bits % 8
+    stream = STREAM_HEADER + (value << padding).to_bytes((bits + padding) // 8, "big")
+    return bz2.decompress(stream)
+
+
+def decompress_file(path: str, pool: Executor | None, window: int = 16) -> Iterator[bytes]:
+    """
+    Decompress a local bz2 archive, decoding its blocks in parallel on the pool and yielding the
+    output in file order. Up to `window` blocks are in flight at once.
+
+    If the blocks cannot be found or one fails to decode (e.g. a magic number occurring by chance in
+    compressed data), falls back to sequential decompression and resumes after the output already yielded.
+    """
+    with open(path, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        yielded = 0
+        blocks = find_blocks(data) if pool is not None else []
+        if blocks:
+            in_flight: deque[Future[bytes]] = deque()
+            pending = iter(blocks)
+            try:
+                while True:
+                    for start, end in pending:
+                        in_flight.append(pool.submit(decompress_block, data[start // 8:(end + 7) // 8], start, end))  # pyright: ignore[reportOptionalMemberAccess]
+                        if len(in_flight) >= window:
+                            break
+                    if not in_flight:
+                        return
+                    decompressed_chunk = in_flight.popleft().result()
+                    yielded += len(decompressed_chunk)
+                    yield decompressed_chunk
+            except Exception as e:
+                print(f"Parallel decompression of {path} failed, continuing sequentially: {e}", flush=True)
+                for future in in_flight:
+                    future.cancel()
+
+        skip = yielded
+        for decompressed_chunk in decompress_chunks(iter(lambda: data.read(1024 * 1024), b"")):
+            if skip >= len(decompressed_chunk):
+                skip -= len(decompressed_chunk)
+                continue
+            yield decompressed_chunk[skip:]
+            skip = 0
+
+
+class ResumePoint(NamedTuple):
+    """
+    Where to pick up decompressing an archive that has grown since it was read: its block at bit offset
+    `bit` with the block CRC `crc`, the first `skip` decompressed bytes of which complete a line begun
+    before the block, and the number of lines before it.
+    """
+    bit: int
+    crc: int
+    skip: int
+    lines: int
+
+
+class ArchiveTail:
+    """The last LAST_BLOCK_BYTES compressed bytes of an archive as it is read, and the offset they start at."""
+
+    def __init__(self) -> None:
+        self.data = bytearray()
+        self.offset = 0
+
+    def add(self, chunk: bytes) -> None:
+        self.data += chunk
+        excess = len(self.data) - LAST_BLOCK_BYTES
+        if excess > 0:
+            del self.data[:excess]
+            self.offset += excess
+
+    def watch(self, chunks: Iterable[bytes]) -> Iterator[bytes]:
+        """Pass compressed chunks through, keeping the last bytes."""
+        for chunk in chunks:
+            self.add(chunk)
+            yield chunk
+
+    def read_file(self, path: str) -> None:
+        """Keep the last bytes of an archive on disk."""
+        with open(path, "rb") as file:
+            self.offset = max(0, file.seek(0, 2) - LAST_BLOCK_BYTES)
+            file.seek(self.offset)
+            self.data = bytearray(file.read())
+
+    def resume_point(self, lines: int) -> ResumePoint | None:
+        """
+        The resume point at the archive's last block, `lines` being how many lines the whole archive
+        holds. None when the block cannot be found (e.g. a block magic occurring by chance in compressed
+        data) or holds no line start.
+        """
+        data = bytes(self.data)
+        blocks = find_blocks(data)
+        if not blocks:
+            return None
+        start, end = blocks[-1]
+        try:
+            output = decompress_block(data[start // 8:(end + 7) // 8], start, end)
+        except (OSError, ValueError, EOFError):
+            return None
+        newline = output.find(b"\n")
+        if newline < 0:
+            return None
+        splitter = LineSplitter()
+        after = len(splitter.feed(output[newline + 1:])) + len(splitter.flush())
+        return ResumePoint(self.offset * 8 + start, block_crc(data, start), newline + 1, lines - after)
+
+
+def block_crc(data: bytes, start: int) -> int:
+    """The CRC of the block whose magic starts at bit offset `start`, the 32 bits following the magic."""
+    first = start // 8
+    value = int.from_bytes(data[first:first + 11], "big")
+    return (value >> (88 - start % 8 - 80)) & 0xFFFFFFFF
+
+
+def decompress_from(data: bytes, resume: ResumePoint) -> Iterator[bytes] | None:
+    """
+    Decompress an archive from a resume point on, `data` being its bytes from the one holding bit
+    resume.bit on, each block on its own since the stream's combined CRC covers the blocks left out.
+    Output starts at a line start. Returns None when the block found there is not the one recorded,
+    e.g. because the archive was compressed anew rather than appended to, and has to be read whole.
+    """
+    blocks = find_blocks(data)
+    first = resume.bit % 8
+    if not blocks or blocks[0][0] != first or block_crc(data, first) != resume.crc:
+        return None
+
+    def chunks() -> Iterator[bytes]:
+        skip = resume.skip
+        for start, end in blocks:
+            yield decompress_block(data[start // 8:(end + 7) // 8], start, end)[skip:]
+            skip = 0
+    return chunks()
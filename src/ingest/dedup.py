@@ -0,0 +1,98 @@
+import hashlib
+import math
+import os
+
+from .prefilter import UNREADABLE, peek_field
+
+# Messages remembered per generation of the duplicate filter; 0 disables it
+DEDUP_CAPACITY = int(os.getenv("INGEST_DEDUP_CAPACITY", "1000000"))
+# False positive rate of one generation: the share of new messages wrongly dropped as repeats
+DEDUP_ERROR_RATE = float(os.getenv("INGEST_DEDUP_ERROR_RATE", "1e-6"))
+
+# Header fields a converter reads (Shipyard checks gameversion), so they are part of a message's identity
+FINGERPRINT_HEADER_FIELDS = ("gameversion",)
+_MESSAGE_KEY = b'"message"'
+
+
+def message_fingerprint(line: bytes) -> bytes | None:
+    """
+    Fingerprint a line by its message body, so copies relayed by different uploaders or tools match.
+    Covers the raw bytes from the message key to the end of the line, plus the header fields conversion
+    depends on. Since the message comes last in EDDN envelopes, the uploader header is not included;
+    if it did come after the message it would be, which only makes repeats go unnoticed. Returns None
+    when the line cannot be fingerprinted safely.
+    """
+    position = line.find(_MESSAGE_KEY)
+    if position < 0:
+        return None
+    digest = hashlib.blake2b(digest_size=16)
+    for field in FINGERPRINT_HEADER_FIELDS:
+        value = peek_field(line, field)
+        if value is UNREADABLE:
+            return None
+        digest.update(f"{value}\0".encode())
+    digest.update(line[position:].rstrip())
+    return digest.digest()
+
+
+class DuplicateFilter:
+    """
+    Rotating Bloom filter of message fingerprints. Each generation is sized for `capacity` messages at
+    `error_rate`; once the current one is full it becomes the previous one and the old previous one is
+    dropped, so memory stays at two generations while the most recent messages are always remembered.
+    A message counts as seen if either generation holds it, so the overall false positive rate is at
+    most twice the per-generation one. There are no false negatives within the last `capacity` messages.
+    """
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.bits = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.bits / capacity * math.log(2)))
+        self._current = bytearray((self.bits + 7) // 8)
+        self._previous: bytearray | None = None
+        self._added = 0
+        self.rotations = 0
+
+    def _positions(self, fingerprint: bytes) -> list[int]:
+        # Double hashing: k positions from the two 64-bit halves of the fingerprint
+        first = int.from_bytes(fingerprint[:8], "little")
+        second = int.from_bytes(fingerprint[8:16], "little") | 1
+        return [(first + i * second) % self.bits for i in range(self.hashes)]
+
+    @staticmethod
+    def _contains(generation: bytearray, positions: list[int]) -> bool:
+        return all(generation[p >> 3] & (1 << (p & 7)) for p in positions)
+
+    def seen(self, fingerprint: bytes) -> bool:
+        """Return True if the fingerprint was probably added before, and add it otherwise."""
+        positions = self._positions(fingerprint)
+        if self._contains(self._current, positions):
+            return True
+        if self._previous is not None and self._contains(self._previous, positions):
+            return True
+        if self._added >= self.capacity:
+            self._previous = self._current
+            self._current = bytearray(len(self._current))
+            self._added = 0
+            self.rotations += 1
+        for p in positions:
+            self._current[p >> 3] |= 1 << (p & 7)
+        self._added += 1
+        return False
+
+    def stats(self) -> dict[str, int | float]:
+        return {
+            "capacity": self.capacity,
+            "error_rate": self.error_rate,
+            "hashes": self.hashes,
+            "bytes": len(self._current) * (1 if self._previous is None else 2),
+            "rotations": self.rotations,
+        }
+
+
+def new_duplicate_filter() -> DuplicateFilter | None:
+    """Create a duplicate filter configured with INGEST_DEDUP_CAPACITY and INGEST_DEDUP_ERROR_RATE, or None if disabled."""
+    if DEDUP_CAPACITY <= 0:
+        return None
+    return DuplicateFilter(DEDUP_CAPACITY, DEDUP_ERROR_RATE)
@@ -0,0 +1,54 @@
+from typing import Iterable, Iterator
+
+
+class LineSplitter:
+    """
+    Incrementally split a stream of byte chunks into JSON lines.
+
+    Complete lines are sliced straight out of each chunk; only the unterminated tail is carried over in a
+    bytearray and extended in place, so a line spanning many chunks is never re-copied or re-split.
+    Lines are yielded as bytes, which pydantic and jiter consume without decoding to str first.
+    """
+
+    def __init__(self) -> None:
+        self._partial = bytearray()
+
+    def feed(self, chunk: bytes) -> list[bytes]:
+        """Add a chunk and return the lines it completes."""
+        parts = chunk.split(b"\n")
+        if len(parts) == 1:
+            self._partial += chunk
+            return []
+
+        if self._partial:
+            self._partial += parts[0]
+            parts[0] = bytes(self._partial)
+            self._partial.clear()
+        self._partial += parts.pop()
+        return [line for line in map(bytes.strip, parts) if line.startswith(b'{"')]
+
+    def flush(self) -> list[bytes]:
+        """Return the last line if the stream did not end with a newline."""
+        line = bytes(self._partial).strip()
+        self._partial.clear()
+        return [line] if line.startswith(b'{"') else []
+
+
+def split_lines(chunks: Iterable[bytes], size: int, skip: int = 0) -> Iterator[list[bytes]]:
+    """Split decompressed chunks into lists of up to `size` JSON lines, leaving out the first `skip` lines."""
+    splitter = LineSplitter()
+    lines: list[bytes] = []
+    for chunk in chunks:
+        lines.extend(splitter.feed(chunk))
+        if skip and lines:
+            skipped = min(skip, len(lines))
+            del lines[:skipped]
+            skip -= skipped
+        while len(lines) >= size:
+            yield lines[:size]
+            del lines[:size]
+    lines.extend(splitter.flush())
+    del lines[:skip]
+    while lines:
+        yield lines[:size]
+        del lines[:size]
@@ -0,0 +1,63 @@
+import time
+import traceback
+from typing import Any, Callable, NamedTuple
+
+from ..models.eddn.EDDNEnvelope import EDDNEventEnvelope
+from ..models.db.ingestion import DatabaseModels
+
+
+class PendingWrite(NamedTuple):
+    """A converted event waiting to be written as part of a batch."""
+    line_number: int
+    event: str
+    timestamp: str
+    models: DatabaseModels
+    locks: list[tuple[str, str]]
+
+
+class ParsedChunk(NamedTuple):
+    """The outcome of parsing and converting a chunk of lines."""
+    pending: list[PendingWrite]
+    skipped: int
+    failure: int
+    seconds: float
+    # Line number of the chunk's last line, which identifies the chunk (0 for an empty chunk)
+    last_line: int
+
+
+def parse_chunk(envelope_type: type[EDDNEventEnvelope[Any]], convert_func: Callable[[Any, Any], Any], lines: list[tuple[int, bytes]]) -> ParsedChunk:
+    """
+    Validate and convert a chunk of raw EDDN lines. This is the CPU-bound part of ingestion and runs
+    in the parse worker processes, so it only depends on the EDDN and DB models, never on the database.
+
+    Each line is parsed in one pass into the dataset's typed envelope (e.g. ScanEnvelope). Lines come
+    with their line numbers, as pre-filtered lines leave gaps.
+    """
+    start_time = time.process_time()
+    pending: list[PendingWrite] = []
+    skipped = 0
+    failure = 0
+    for line_number, line in lines:
+        try:
+            envelope = envelope_type.model_validate_json(line)
+            event: Any = envelope.message
+            if not event.odyssey or not event.horizons:
+                skipped += 1
+                continue
+
+            # Convert first to know which DB models and primary keys will be affected
+            models: DatabaseModels = convert_func(event, envelope)
+            locks = models.ingestion_locks()
+
+            if not locks:
+                # Nothing to write
+                skipped += 1
+                continue
+
+            pending.append(PendingWrite(line_number, getattr(event, 'event'), getattr(event, 'timestamp'), models, locks))
+        except Exception as e:
+            failure += 1
+            print(f"Error ingesting line {line_number}: {line.decode(errors='replace')}", flush=True)
+            print(f"Exception: {e}", flush=True)
+            traceback.print_exc()
+    return ParsedChunk(pending, skipped, failure, time.process_time() - start_time, lines[-1][0] if lines else 0)
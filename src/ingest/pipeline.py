@@ -0,0 +1,175 @@
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Executor, Future
+from typing import Any, Callable, Iterable, Iterator, TypeVar
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+# Marks the end of a stage's output
+_DONE = object()
+
+
+class StageStats:
+    """
+    What one stage did: items produced, time spent working versus waiting for input or for room in its
+    output queue, and the depth of that queue sampled at every put. A stage that is busy most of the
+    time while its input queue runs full is the bottleneck; one mostly blocked on output is held back
+    by the stages after it.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.items = 0
+        self.seconds = 0.0
+        self.input_wait = 0.0
+        self.output_wait = 0.0
+        self.depth_total = 0
+        self.depth_max = 0
+
+    def report(self) -> dict[str, Any]:
+        busy = max(0.0, self.seconds - self.input_wait - self.output_wait)
+        return {
+            "items": self.items,
+            "busy_seconds": round(busy, 2),
+            "busy_ratio": round(busy / self.seconds, 3) if self.seconds else 0.0,
+            "input_wait_seconds": round(self.input_wait, 2),
+            "output_wait_seconds": round(self.output_wait, 2),
+            "queue_mean": round(self.depth_total / self.items, 2) if self.items else 0.0,
+            "queue_max": self.depth_max,
+        }
+
+
+class Pipeline:
+    """
+    Stages of a streaming job, each running in its own thread and handing its output to the next one
+    through a bounded queue. A stage that falls behind fills its input queue and blocks the one before
+    it, so a slow database holds back parsing and reading instead of buffering the file in memory,
+    and memory stays capped at `depth` items per queue whatever the input size.
+
+    Stages are generator functions from an input iterator to output items; parallelism within a stage
+    (a process pool, writer threads) is up to the stage. The first error of any stage is re-raised by
+    whoever consumes the last stage, and close() stops every stage.
+    """
+
+    def __init__(self, depth: int):
+        self.depth = depth
+        self.stats: list[StageStats] = []
+        self._stopped = threading.Event()
+        self._threads: list[threading.Thread] = []
+
+    def source(self, name: str, items: Iterable[T]) -> Iterator[T]:
+        """Run an iterable (e.g. a download) as the first stage."""
+        return self.stage(name, lambda _: items, iter(()))
+
+    def stage(self, name: str, func: Callable[[Iterator[Any]], Iterable[R]], upstream: Iterator[Any]) -> Iterator[R]:
+        """Run func over the upstream items in a thread of its own and return an iterator of its output."""
+        stats = StageStats(name)
+        self.stats.append(stats)
+        output: queue.Queue[Any] = queue.Queue(maxsize=self.depth)
+        thread = threading.Thread(target=self._run, args=(stats, func, upstream, output), name=f"pipeline-{name}", daemon=True)
+        self._threads.append(thread)
+        thread.start()
+        return self._drain(output)
+
+    def sink(self, name: str, func: Callable[[Iterator[Any]], None], upstream: Iterator[Any]) -> None:
+        """Run the last stage in the calling thread until the pipeline is done."""
+        stats = StageStats(name)
+        self.stats.append(stats)
+        start = time.perf_counter()
+        try:
+            func(self._timed(stats, upstream, count=True))
+        finally:
+            stats.seconds = time.perf_counter() - start
+
+    def _timed(self, stats: StageStats, upstream: Iterator[Any], count: bool = False) -> Iterator[Any]:
+        """Pass the upstream items through, adding the time spent waiting for them to the stage's input wait."""
+        while True:
+            wait_start = time.perf_counter()
+            try:
+                item = next(upstream)
+            except StopIteration:
+                return
+            finally:
+                stats.input_wait += time.perf_counter() - wait_start
+            if count:
+                stats.items += 1
+            yield item
+
+    def _put(self, output: "queue.Queue[Any]", item: Any) -> None:
+        while not self._stopped.is_set():
+            try:
+                output.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+        raise _Stopped()
+
+    def _run(self, stats: StageStats, func: Callable[[Iterator[Any]], Iterable[Any]], upstream: Iterator[Any], output: "queue.Queue[Any]") -> None:
+        start = time.perf_counter()
+        try:
+            for item in func(self._timed(stats, upstream)):
+                depth = output.qsize()
+                stats.depth_total += depth
+                stats.depth_max = max(stats.depth_max, depth)
+                stats.items += 1
+                wait_start = time.perf_counter()
+                self._put(output, item)
+                stats.output_wait += time.perf_counter() - wait_start
+            self._put(output, _DONE)
+        except _Stopped:
+            pass
+        except BaseException as e:
+            try:
+                self._put(output, _Failed(e))
+            except _Stopped:
+                pass
+        finally:
+            stats.seconds = time.perf_counter() - start
+
+    def _drain(self, output: "queue.Queue[Any]") -> Iterator[Any]:
+        while True:
+            try:
+                item = output.get(timeout=0.1)
+            except queue.Empty:
+                if self._stopped.is_set():
+                    return
+                continue
+            if item is _DONE:
+                return
+            if isinstance(item, _Failed):
+                raise item.error
+            yield item
+
+    def close(self) -> None:
+        """Stop every stage and wait for their threads."""
+        self._stopped.set()
+        for thread in self._threads:
+            thread.join()
+
+    def report(self) -> dict[str, dict[str, Any]]:
+        return {stats.name: stats.report() for stats in self.stats}
+
+
+class _Stopped(Exception):
+    """Raised inside a stage once the pipeline is closed."""
+
+
+class _Failed:
+    """An error raised by a stage, passed downstream in place of its output."""
+
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+def ordered_map(pool: Executor, func: Callable[[T], R], items: Iterable[T], window: int) -> Iterator[R]:
+    """Map func over items on the pool with up to `window` calls in flight, yielding results in input order."""
+    in_flight: deque[Future[R]] = deque()
+    for item in items:
+        in_flight.append(pool.submit(func, item))
+        while in_flight and (len(in_flight) > window or in_flight[0].done()):
+            yield in_flight.popleft().result()
+    while in_flight:
+        yield in_flight.popleft().result()
@@ -0,0 +1,84 @@
+import re
+from typing import Any, NamedTuple
+
+from ..models.db.ingestion import TimestampCache, ingestion_lock_key
+
+
+class FreshnessKey(NamedTuple):
+    """
+    Where to find the ingestion lock key of the main entity an event writes, so stale lines can be
+    rejected from the raw message. Maps each primary key of the DB model, in `primary_keys` order, to
+    its top-level message field.
+    """
+    model_name: str
+    event: str
+    fields: dict[str, str]
+
+
+# Marker for a field whose value could not be read unambiguously
+UNREADABLE = object()
+
+# A top-level scalar value following a quoted key: a plain string, an integer, or a literal.
+# Floats, escaped strings, nulls, objects and arrays are not needed by the pre-filter and count as unreadable.
+_VALUE = re.compile(rb'\s*:\s*(?:"([^"\\]*)"|(-?\d+)(?=[\s,}\]])|(true|false|null))')
+_LITERALS: dict[bytes, Any] = {b"true": True, b"false": False, b"null": UNREADABLE}
+
+
+def peek_field(line: bytes, name: str) -> Any:
+    """
+    Read the scalar value of a message field straight from the raw line. Returns None when the field is
+    absent, and UNREADABLE when the key occurs more than once (e.g. also in a nested object) or its
+    value is not a plain scalar, in which case only a full parse can tell.
+    """
+    needle = b'"' + name.encode() + b'"'
+    position = line.find(needle)
+    if position < 0:
+        return None
+    end = position + len(needle)
+    if line.find(needle, end) >= 0:
+        return UNREADABLE
+    match = _VALUE.match(line, end)
+    if not match:
+        return UNREADABLE
+    string, integer, literal = match.groups()
+    if string is not None:
+        return string.decode()
+    if integer is not None:
+        return int(integer)
+    return _LITERALS[literal]
+
+
+def is_prefiltered(line: bytes, freshness_key: FreshnessKey | None, timestamp_cache: TimestampCache) -> bool:
+    """
+    Decide from the raw bytes whether a line would certainly be skipped: it is not flagged for both
+    odyssey and horizons, or its timestamp is not newer than the one cached for its key.
+
+    Only returns True when the same line would be skipped after full parsing and conversion; anything
+    that cannot be read unambiguously is left to the parse stage.
+    """
+    for flag in ("odyssey", "horizons"):
+        value = peek_field(line, flag)
+        if value is UNREADABLE:
+            return False
+        if not value:
+            # Absent or false; the message flags default to False
+            return value is None or value is False
+
+    if freshness_key is None:
+        return False
+
+    event = peek_field(line, "event")
+    if event is not None and event != freshness_key.event:
+        return False
+    timestamp = peek_field(line, "timestamp")
+    if not isinstance(timestamp, str):
+        return False
+    primary_key: list[Any] = []
+    for field in freshness_key.fields.values():
+        value = peek_field(line, field)
+        if not isinstance(value, (int, str)) or isinstance(value, bool) or not value:
+            return False
+        primary_key.append(value)
+
+    model_name, encoded_key = ingestion_lock_key(freshness_key.model_name, primary_key)
+    return not timestamp_cache.is_newer(model_name, encoded_key, freshness_key.event, timestamp)
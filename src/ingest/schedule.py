@@ -0,0 +1,65 @@
+import threading
+from collections import deque
+from typing import Callable, NamedTuple, TypeVar
+
+R = TypeVar("R")
+
+
+class ScheduledDataset(NamedTuple):
+    """A dataset to ingest, with what the scheduler needs to know about it."""
+    name: str
+    # Estimated cost, e.g. the archive's compressed size; None when unknown
+    cost: float | None
+    # Datasets with a higher priority start first, whatever their cost
+    priority: int
+    # Most writer threads the dataset may use at once
+    max_writers: int
+
+
+def schedule_order(datasets: list[ScheduledDataset]) -> list[ScheduledDataset]:
+    """
+    Order datasets to start by priority, then largest first (longest processing time first), so the
+    day is not held up by a big file that started last. Datasets of unknown cost are assumed to be large.
+    """
+    return sorted(datasets, key=lambda dataset: (-dataset.priority, -(dataset.cost if dataset.cost is not None else float("inf"))))
+
+
+def run_scheduled(datasets: list[ScheduledDataset], workers: int, writer_budget: int, run: Callable[[ScheduledDataset, int, threading.Semaphore], R]) -> dict[str, R | Exception]:
+    """
+    Ingest datasets on `workers` threads, starting them in schedule_order. The writer budget is shared
+    as write slots rather than split up front: every dataset runs its own writer threads, up to its
+    max_writers and the budget, and each of them holds a slot while it writes a batch. So the batches
+    written at once, and with them the connections held and load put on the database, never exceed the
+    budget, while a writer is never left idle because another dataset holds slots it does not use: the
+    slots of finished datasets go to the writers of those still running, and a small dataset that only
+    writes now and then leaves the rest to the large ones.
+
+    A dataset keeps its writer threads for the whole file, since its events are sharded across them by
+    key and adding one mid-file would split a key's events across two of them; what grows and shrinks
+    is how many of them are writing at once.
+
+    run(dataset, writers, write_slots) is called for each dataset; the result of each, or the exception
+    it raised, is returned by dataset name.
+    """
+    pending = deque(schedule_order(datasets))
+    results: dict[str, R | Exception] = {}
+    write_slots = threading.Semaphore(writer_budget)
+    lock = threading.Lock()
+
+    def work() -> None:
+        while True:
+            with lock:
+                if not pending:
+                    return
+                dataset = pending.popleft()
+            try:
+                results[dataset.name] = run(dataset, max(1, min(dataset.max_writers, writer_budget)), write_slots)
+            except Exception as e:
+                results[dataset.name] = e
+
+    threads = [threading.Thread(target=work, name=f"scheduler-{n}") for n in range(max(1, workers))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return {dataset.name: results[dataset.name] for dataset in datasets}
@@ -0,0 +1,94 @@
+import queue
+import threading
+import time
+from typing import Callable
+
+from .parse import PendingWrite
+from .prefilter import FreshnessKey
+
+
+def shard_lock(pending: PendingWrite, freshness_key: FreshnessKey | None) -> tuple[str, str]:
+    """
+    The lock an event is sharded by: the one of the dataset's main entity (its freshness key), so all
+    events of a key are written by one writer in file order, or the event's first lock without one.
+    """
+    if freshness_key is not None:
+        for lock in pending.locks:
+            if lock[0] == freshness_key.model_name:
+                return lock
+    return pending.locks[0]
+
+
+class ShardedWriters:
+    """
+    Writer threads for one dataset file, each owning the events of a slice of the key space. Events are
+    routed by the hash of their shard lock, so a worker sees every event of its keys in file order and
+    the workers do not wait on each other's advisory locks. Each worker batches its events by size and
+    age like the single writer and hands every batch to `flush`, which must be thread-safe.
+
+    Keys that events share besides the sharded one (e.g. the body of an FSDJump) are still serialized
+    by the advisory locks and checked against ingestion_lock, so the outcome does not depend on timing.
+    """
+
+    def __init__(
+        self,
+        workers: int,
+        batch_size: int,
+        batch_ms: int,
+        flush: Callable[[list[PendingWrite]], None],
+        freshness_key: FreshnessKey | None = None,
+    ):
+        self.batch_size = batch_size
+        self.batch_ms = batch_ms
+        self.flush = flush
+        self.freshness_key = freshness_key
+        # Bounded, so parsing cannot run arbitrarily far ahead of a slow writer
+        self.queues: list[queue.Queue[PendingWrite | None]] = [queue.Queue(maxsize=4 * batch_size) for _ in range(workers)]
+        self.errors: list[BaseException] = []
+        self.threads = [threading.Thread(target=self._run, args=(q,), daemon=True) for q in self.queues]
+        for thread in self.threads:
+            thread.start()
+
+    def submit(self, pending: PendingWrite) -> None:
+        if self.errors:
+            raise self.errors[0]
+        self.queues[hash(shard_lock(pending, self.freshness_key)) % len(self.queues)].put(pending)
+
+    def _run(self, pending_queue: "queue.Queue[PendingWrite | None]") -> None:
+        batch: list[PendingWrite] = []
+        batch_started = time.monotonic()
+        closed = False
+        try:
+            while True:
+                timeout = max(0.0, self.batch_ms / 1000 - (time.monotonic() - batch_started)) if batch else None
+                try:
+                    pending = pending_queue.get(timeout=timeout)
+                except queue.Empty:
+                    # The batch aged out before filling up
+                    self.flush(batch)
+                    batch = []
+                    continue
+                if pending is None:
+                    closed = True
+                    break
+                if not batch:
+                    batch_started = time.monotonic()
+                batch.append(pending)
+                if len(batch) >= self.batch_size:
+                    self.flush(batch)
+                    batch = []
+            self.flush(batch)
+        except BaseException as e:
+            self.errors.append(e)
+            # Keep draining so the producer never blocks on a full queue
+            while not closed:
+                closed = pending_queue.get() is None
+
+    def close(self) -> None:
+        """Write what is left, wait for every worker and re-raise the first error of any of them."""
+        for pending_queue in self.queues:
+            pending_queue.put(None)
+        for thread in self.threads:
+            thread.join()
+        if self.errors:
+            raise self.errors[0]
@@ -1,10 +1,14 @@
 from typing import ClassVar
-from pydantic import BaseModel
+from dataclasses import dataclass
 import psycopg
-from psycopg import sql
 from psycopg.rows import DictRow
 
-class Atmospherecomposition(BaseModel):
+from .bulk import StagingColumns, StagingRows, merge_parent, replace_children, skip_stored
+from .content import hash_content
+from .statements import ChildRows, UpsertStatement, WriteStats
+
+@dataclass(slots=True, kw_only=True)
+class Atmospherecomposition:
     sources: ClassVar[list[str]] = ["Scan"]
     primary_keys: ClassVar[list[str]] = ["SystemAddress", "BodyID", "Name"]
     SystemAddress: int # Scan
@@ -12,7 +16,8 @@ class Atmospherecomposition(BaseModel):
     
     Percent: float # Scan.AtmosphereComposition[]
     Name: str # Scan.AtmosphereComposition[]
-class Material(BaseModel):
+@dataclass(slots=True, kw_only=True)
+class Material:
     sources: ClassVar[list[str]] = ["Scan"]
     primary_keys: ClassVar[list[str]] = ["SystemAddress", "BodyID", "Name"]
     SystemAddress: int # Scan
@@ -21,7 +26,8 @@ class Material(BaseModel):
     Percent: float # Scan.Materials[]
     Name: str # Scan.Materials[]
 
-class Ring(BaseModel):
+@dataclass(slots=True, kw_only=True)
+class Ring:
     sources: ClassVar[list[str]] = ["Scan"]
     primary_keys: ClassVar[list[str]] = ["SystemAddress", "BodyID", "Name"]
     SystemAddress: int # Scan
@@ -34,7 +40,8 @@ class Ring(BaseModel):
     MassMT: float # Scan.Rings[]
 
 # None fields should be considered "unknown", meaning that no event has reported this field yet, e.g only FSDJump reported, all other fields are None
-class Body(BaseModel): 
+@dataclass(slots=True, kw_only=True)
+class Body: 
     sources: ClassVar[list[str]] = ["FSDJump", "ScanBaryCentre", "Scan"]
     primary_keys: ClassVar[list[str]] = ["SystemAddress", "BodyID"]
     SystemAddress: int
@@ -133,8 +140,10 @@ def create_body_tables() -> str:
         numMaterials INT,
         numAtmosphereComposition INT,
         numRings INT,
+        content_hash BIGINT,
         PRIMARY KEY (SystemAddress, BodyID)
     );
+    ALTER TABLE body ADD COLUMN IF NOT EXISTS content_hash BIGINT;
 
     CREATE TABLE IF NOT EXISTS body_atmosphere_composition (
         SystemAddress BIGINT NOT NULL,
@@ -167,59 +176,150 @@ def create_body_tables() -> str:
     );
     """
 
-def upsert_body(conn: psycopg.Cursor[DictRow], body: Body) -> None:
-    """Upsert a body into the database, including its materials, atmosphere composition, and rings."""
+UPSERT_BODY = UpsertStatement(
+    "body", Body, "(SystemAddress, BodyID)",
+    exclude={'Materials', 'AtmosphereComposition', 'Rings'}, keys=['SystemAddress', 'BodyID'])
+BODY_MATERIALS = ChildRows("body_material", ["SystemAddress", "BodyID"], ["SystemAddress", "BodyID", "Name", "Percent"])
+BODY_ATMOSPHERE_COMPOSITION = ChildRows(
+    "body_atmosphere_composition", ["SystemAddress", "BodyID"], ["SystemAddress", "BodyID", "Name", "Percent"])
+BODY_RINGS = ChildRows(
+    "body_ring", ["SystemAddress", "BodyID"], ["SystemAddress", "BodyID", "Name", "OuterRad", "InnerRad", "RingClass", "MassMT"])
+
+def upsert_body(conn: psycopg.Cursor[DictRow], body: Body, content_hash: int | None = None, stats: WriteStats | None = None) -> bool:
+    """
+    Upsert a body into the database, including its materials, atmosphere composition, and rings.
+    Returns False if the stored content was the same.
+    """
     # Upsert the body
-    body_dict = body.model_dump(exclude={'Materials', 'AtmosphereComposition', 'Rings'})
-    
-    columns = sql.SQL(', ').join(map(sql.SQL, body_dict.keys()))
-    placeholders = sql.SQL(', ').join([sql.Placeholder()] * len(body_dict))
-    
-    # ON CONFLICT DO UPDATE
-    update_columns = sql.SQL(', ').join(
-        sql.SQL("{} = EXCLUDED.{}").format(sql.SQL(k), sql.SQL(k)) for (k, v) in body_dict.items() if k not in ['SystemAddress', 'BodyID'] and v is not None
-    )
+    if UPSERT_BODY.execute(conn, body, hash_content(body) if content_hash is None else content_hash, stats) is None:
+        return False
 
-    query = sql.SQL("""
-        INSERT INTO body ({columns}) VALUES ({placeholders})
-        ON CONFLICT (SystemAddress, BodyID) DO UPDATE SET {update_columns}
-    """).format(
-        columns=columns,
-        placeholders=placeholders,
-        update_columns=update_columns
-    )
-    
-    conn.execute(query, tuple(body_dict.values()))
+    key = (body.SystemAddress, body.BodyID)
 
     # Insert materials
     if body.Materials is not None:
-        conn.execute("DELETE FROM body_material WHERE SystemAddress = %s AND BodyID = %s;", (body.SystemAddress, body.BodyID))
-        for material in body.Materials:
-            conn.execute("""
-                INSERT INTO body_material (SystemAddress, BodyID, Name, Percent) 
-                VALUES (%s, %s, %s, %s)
-                ON CONFLICT (SystemAddress, BodyID, Name) DO NOTHING
-            """, (body.SystemAddress, body.BodyID, material.Name, material.Percent))
+        BODY_MATERIALS.replace(conn, key, ((*key, material.Name, material.Percent) for material in body.Materials))
 
     # Insert atmosphere composition
     if body.AtmosphereComposition is not None:
-        conn.execute("DELETE FROM body_atmosphere_composition WHERE SystemAddress = %s AND BodyID = %s;", (body.SystemAddress, body.BodyID))
-        for comp in body.AtmosphereComposition:
-            conn.execute("""
-                INSERT INTO body_atmosphere_composition (SystemAddress, BodyID, Name, Percent)
-                VALUES (%s, %s, %s, %s)
-                ON CONFLICT (SystemAddress, BodyID, Name) DO NOTHING
-            """, (body.SystemAddress, body.BodyID, comp.Name, comp.Percent))
+        BODY_ATMOSPHERE_COMPOSITION.replace(conn, key, ((*key, comp.Name, comp.Percent) for comp in body.AtmosphereComposition))
 
     # Insert rings
     if body.Rings is not None:
-        conn.execute("DELETE FROM body_ring WHERE SystemAddress = %s AND BodyID = %s;", (body.SystemAddress, body.BodyID))
-        for ring in body.Rings:
-            conn.execute("""
-                INSERT INTO body_ring (SystemAddress, BodyID, Name, OuterRad, InnerRad, RingClass, MassMT)
-                VALUES (%s, %s, %s, %s, %s, %s, %s)
-                ON CONFLICT (SystemAddress, BodyID, Name) DO NOTHING
-            """, (body.SystemAddress, body.BodyID, ring.Name, ring.OuterRad, ring.InnerRad, ring.RingClass, ring.MassMT))
+        BODY_RINGS.replace(conn, key, (
+            (*key, ring.Name, ring.OuterRad, ring.InnerRad, ring.RingClass, ring.MassMT) for ring in body.Rings
+        ))
+    return True
+
+
+BODY_STAGING: StagingColumns = {
+    "stage_body": [
+        ("SystemAddress", "BIGINT"),
+        ("BodyID", "INT"),
+        ("BodyType", "TEXT"),
+        ("BodyName", "TEXT"),
+        ("DistanceFromArrivalLS", "DOUBLE PRECISION"),
+        ("MeanAnomaly", "DOUBLE PRECISION"),
+        ("Eccentricity", "DOUBLE PRECISION"),
+        ("AscendingNode", "DOUBLE PRECISION"),
+        ("Periapsis", "DOUBLE PRECISION"),
+        ("SemiMajorAxis", "DOUBLE PRECISION"),
+        ("OrbitalPeriod", "DOUBLE PRECISION"),
+        ("OrbitalInclination", "DOUBLE PRECISION"),
+        ("TidalLock", "BOOLEAN"),
+        ("RotationPeriod", "DOUBLE PRECISION"),
+        ("AxialTilt", "DOUBLE PRECISION"),
+        ("Radius", "DOUBLE PRECISION"),
+        ("MassEM", "DOUBLE PRECISION"),
+        ("StellarMass", "DOUBLE PRECISION"),
+        ("Age_MY", "INT"),
+        ("StarType", "TEXT"),
+        ("PlanetClass", "TEXT"),
+        ("Subclass", "INT"),
+        ("Parent", "INT"),
+        ("AtmosphereType", "TEXT"),
+        ("AbsoluteMagnitude", "DOUBLE PRECISION"),
+        ("Luminosity", "TEXT"),
+        ("SurfaceTemperature", "DOUBLE PRECISION"),
+        ("SurfaceGravity", "DOUBLE PRECISION"),
+        ("SurfacePressure", "DOUBLE PRECISION"),
+        ("Volcanism", "TEXT"),
+        ("TerraformState", "TEXT"),
+        ("Landable", "BOOLEAN"),
+        ("Atmosphere", "TEXT"),
+        ("ReserveLevel", "TEXT"),
+        ("CompositionIce", "DOUBLE PRECISION"),
+        ("CompositionMetal", "DOUBLE PRECISION"),
+        ("CompositionRock", "DOUBLE PRECISION"),
+        ("numMaterials", "INT"),
+        ("numAtmosphereComposition", "INT"),
+        ("numRings", "INT"),
+        ("hasMaterials", "BOOLEAN"),
+        ("hasAtmosphereComposition", "BOOLEAN"),
+        ("hasRings", "BOOLEAN"),
+        ("content_hash", "BIGINT"),
+    ],
+    "stage_body_material": [
+        ("SystemAddress", "BIGINT"),
+        ("BodyID", "INT"),
+        ("Name", "TEXT"),
+        ("Percent", "DOUBLE PRECISION"),
+    ],
+    "stage_body_atmosphere_composition": [
+        ("SystemAddress", "BIGINT"),
+        ("BodyID", "INT"),
+        ("Name", "TEXT"),
+        ("Percent", "DOUBLE PRECISION"),
+    ],
+    "stage_body_ring": [
+        ("SystemAddress", "BIGINT"),
+        ("BodyID", "INT"),
+        ("Name", "TEXT"),
+        ("OuterRad", "DOUBLE PRECISION"),
+        ("InnerRad", "DOUBLE PRECISION"),
+        ("RingClass", "TEXT"),
+        ("MassMT", "DOUBLE PRECISION"),
+    ],
+}
+
+BODY_COLUMNS = [name for name, _ in BODY_STAGING["stage_body"] if not name.startswith("has") and name != "content_hash"]
+
+
+def stage_body(rows: StagingRows, seq: int, body: Body, content_hash: int) -> None:
+    """Add a body and its child rows to the staging rows of a bulk batch."""
+    rows["stage_body"].append((
+        seq,
+        *(getattr(body, c) for c in BODY_COLUMNS),
+        body.Materials is not None,
+        body.AtmosphereComposition is not None,
+        body.Rings is not None,
+        content_hash,
+    ))
+    for material in body.Materials or []:
+        rows["stage_body_material"].append((seq, body.SystemAddress, body.BodyID, material.Name, material.Percent))
+    for comp in body.AtmosphereComposition or []:
+        rows["stage_body_atmosphere_composition"].append((seq, body.SystemAddress, body.BodyID, comp.Name, comp.Percent))
+    for ring in body.Rings or []:
+        rows["stage_body_ring"].append((seq, body.SystemAddress, body.BodyID, ring.Name, ring.OuterRad, ring.InnerRad, ring.RingClass, ring.MassMT))
+
+
+def merge_body_statements() -> list[tuple[str, str]]:
+    """Set-based merge of the body staging tables, as (staging table, statement) pairs."""
+    keys = ["SystemAddress", "BodyID"]
+    return [
+        *(("stage_body", statement) for statement in skip_stored(
+            "body", "stage_body", keys, ["stage_body_material", "stage_body_atmosphere_composition", "stage_body_ring"])),
+        ("stage_body", merge_parent("body", "stage_body", "(SystemAddress, BodyID)", keys, BODY_COLUMNS[2:] + ["content_hash"])),
+        *(("stage_body", statement) for statement in replace_children(
+            "stage_body", "hasMaterials", keys,
+            "body_material", "stage_body_material", ["SystemAddress", "BodyID", "Name", "Percent"])),
+        *(("stage_body", statement) for statement in replace_children(
+            "stage_body", "hasAtmosphereComposition", keys,
+            "body_atmosphere_composition", "stage_body_atmosphere_composition", ["SystemAddress", "BodyID", "Name", "Percent"])),
+        *(("stage_body", statement) for statement in replace_children(
+            "stage_body", "hasRings", keys,
+            "body_ring", "stage_body_ring", ["SystemAddress", "BodyID", "Name", "OuterRad", "InnerRad", "RingClass", "MassMT"])),
+    ]
 
 
 def get_body(conn: psycopg.Cursor[DictRow], system_address: int, body_id: int) -> Body | None:
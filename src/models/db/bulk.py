@@ -0,0 +1,167 @@
+import asyncio
+from typing import Any
+import psycopg
+from psycopg.rows import DictRow
+
+from .columnar import ColumnarTable
+
+# Rows destined for the staging tables, keyed by staging table name. Every row starts with its
+# sequence number: the position of the entity in the batch, used to replay "last write wins".
+StagingRows = dict[str, list[tuple[Any, ...]]]
+
+# Staging table name -> list of (column, type), not including the leading seq column
+StagingColumns = dict[str, list[tuple[str, str]]]
+
+
+def create_staging_tables(staging: StagingColumns) -> str:
+    """Create session-local staging tables; temporary tables are never WAL-logged and are emptied on commit."""
+    statements: list[str] = []
+    for table, columns in staging.items():
+        column_defs = ",\n        ".join(f"{name} {type}" for name, type in columns)
+        statements.append(f"""
+    CREATE TEMP TABLE IF NOT EXISTS {table} (
+        seq INT NOT NULL,
+        {column_defs}
+    ) ON COMMIT DELETE ROWS;
+    """)
+    return "".join(statements)
+
+
+def latest(column: str) -> str:
+    """Aggregate expression picking the last non-null value of a column within a group."""
+    return f"(array_agg({column} ORDER BY seq DESC) FILTER (WHERE {column} IS NOT NULL))[1]"
+
+
+def merge_parent(table: str, stage: str, conflict: str, keys: list[str], columns: list[str], expressions: dict[str, str] | None = None) -> str:
+    """
+    Merge the staged rows of a parent table with one INSERT ... ON CONFLICT. Rows for the same key are
+    collapsed first, keeping the last non-null value of every column, and existing values are only
+    overwritten by non-null ones, matching the per-row upserts where None means unknown.
+    """
+    expressions = expressions or {}
+    target_columns = keys + columns
+    select_columns = keys + [expressions.get(c, latest(c)) for c in columns]
+    update_columns = ",\n            ".join(f"{c} = COALESCE(EXCLUDED.{c}, {table}.{c})" for c in columns)
+    return f"""
+        INSERT INTO {table} ({', '.join(target_columns)})
+        SELECT {', '.join(select_columns)}
+        FROM {stage}
+        GROUP BY {', '.join(keys)}
+        ON CONFLICT {conflict} DO UPDATE SET
+            {update_columns}
+    """
+
+
+def skip_stored(table: str, stage: str, keys: list[str], child_stages: list[str], key_match: str | None = None) -> list[str]:
+    """
+    Drop the staged entities whose content hash is the one stored in the table, with their staged child
+    rows, like the content hash check of the per-row upserts. Only the first staged row of a key can
+    match: stage_all already drops rows repeating the content staged before them, so every later row
+    differs from what the one before it writes. The first statement returns the seq of dropped rows.
+    key_match joins the stored row t to the staged row s, by default on equal keys.
+    """
+    key_match = key_match or " AND ".join(f"t.{k} = s.{k}" for k in keys)
+    first_rows = f"SELECT min(seq) AS seq FROM {stage} GROUP BY {', '.join(keys)}"
+    return [
+        f"""
+        DELETE FROM {stage} s
+        USING {table} t, ({first_rows}) f
+        WHERE s.seq = f.seq AND {key_match} AND t.content_hash = s.content_hash
+        RETURNING s.seq
+        """,
+        *(f"DELETE FROM {child} c WHERE NOT EXISTS (SELECT 1 FROM {stage} p WHERE p.seq = c.seq)" for child in child_stages),
+    ]
+
+
+def replace_children(stage: str, flag: str, keys: list[str], table: str, child_stage: str, columns: list[str]) -> list[str]:
+    """
+    Replace the child rows of every staged parent whose list was reported (flag set). The list of the
+    last such parent row wins, like the DELETE + INSERT the per-row upserts run for each event.
+    """
+    latest_parents = f"SELECT {', '.join(keys)}, max(seq) AS seq FROM {stage} WHERE {flag} GROUP BY {', '.join(keys)}"
+    key_match = " AND ".join(f"c.{k} = p.{k}" for k in keys)
+    return [
+        f"""
+        DELETE FROM {table} c
+        USING ({latest_parents}) p
+        WHERE {key_match}
+        """,
+        f"""
+        INSERT INTO {table} ({', '.join(columns)})
+        SELECT {', '.join(f'c.{col}' for col in columns)}
+        FROM {child_stage} c
+        JOIN ({latest_parents}) p ON c.seq = p.seq AND {key_match}
+        ON CONFLICT DO NOTHING
+        """,
+    ]
+
+
+def merge_children(stage: str, keys: list[str], table: str, child_stage: str, name: str, columns: list[str]) -> list[str]:
+    """
+    Delta version of replace_children for child tables keyed by the parent key plus a name column:
+    rows missing from the last staged list are deleted and the others are inserted or, only when a
+    value differs, updated. Staged names must be unique per parent row. Each statement returns one row
+    of the child table's name and the rows it deleted, or wrote and left untouched, to be added to the
+    run's counts of the per-row delta writes (see statements.WriteStats).
+    """
+    latest_parents = f"SELECT {', '.join(keys)}, max(seq) AS seq FROM {stage} GROUP BY {', '.join(keys)}"
+    key_match = " AND ".join(f"c.{k} = p.{k}" for k in keys)
+    values = [c for c in columns if c not in keys and c != name]
+    return [
+        f"""
+        WITH deleted AS (
+            DELETE FROM {table} c
+            USING ({latest_parents}) p
+            WHERE {key_match}
+            AND NOT EXISTS (SELECT 1 FROM {child_stage} s WHERE s.seq = p.seq AND s.{name} = c.{name})
+            RETURNING 1
+        )
+        SELECT '{table}' AS child_table, count(*) AS deleted FROM deleted
+        """,
+        f"""
+        WITH staged AS (
+            SELECT {', '.join(f'c.{col}' for col in columns)}
+            FROM {child_stage} c
+            JOIN ({latest_parents}) p ON c.seq = p.seq AND {key_match}
+        ), written AS (
+            INSERT INTO {table} ({', '.join(columns)})
+            SELECT * FROM staged
+            ON CONFLICT ({', '.join(keys + [name])}) DO UPDATE SET
+                {', '.join(f'{c} = EXCLUDED.{c}' for c in values)}
+            WHERE ({', '.join(f'{table}.{c}' for c in values)}) IS DISTINCT FROM ({', '.join(f'EXCLUDED.{c}' for c in values)})
+            RETURNING 1
+        )
+        SELECT '{table}' AS child_table, w.written, (SELECT count(*) FROM staged) - w.written AS untouched
+        FROM (SELECT count(*) AS written FROM written) w
+        """,
+    ]
+
+
+def columnar_staging_rows(staging: StagingColumns, rows: StagingRows) -> dict[str, ColumnarTable]:
+    """The staged rows of every staging table that has any, held column-wise."""
+    return {
+        table: ColumnarTable.from_rows([("seq", "INT"), *staging[table]], table_rows)
+        for table, table_rows in rows.items() if table_rows
+    }
+
+
+def encode_staging_rows(staging: StagingColumns, rows: StagingRows) -> dict[str, tuple[str, bytes]]:
+    """The COPY statement and binary COPY data of every staging table that has rows."""
+    return {
+        table: (f"COPY {table} ({', '.join(columns.columns)}) FROM STDIN (FORMAT BINARY)", columns.copy_data())
+        for table, columns in columnar_staging_rows(staging, rows).items()
+    }
+
+
+def copy_staging_rows(cur: psycopg.Cursor[DictRow], staging: StagingColumns, rows: StagingRows) -> None:
+    """Stream the staged rows into their staging tables with binary COPY, one encoded buffer per table."""
+    for statement, data in encode_staging_rows(staging, rows).values():
+        with cur.copy(statement) as copy:  # pyright: ignore[reportArgumentType]
+            copy.write(data)
+
+
+async def copy_staging_rows_async(cur: psycopg.AsyncCursor[DictRow], staging: StagingColumns, rows: StagingRows) -> None:
+    """copy_staging_rows on an async cursor, encoding in a thread so the event loop keeps serving other writes."""
+    for statement, data in (await asyncio.to_thread(encode_staging_rows, staging, rows)).values():
+        async with cur.copy(statement) as copy:  # pyright: ignore[reportArgumentType]
+            await copy.write(data)
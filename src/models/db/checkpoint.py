@@ -0,0 +1,66 @@
+from datetime import date
+from typing import NamedTuple
+
+import psycopg
+from psycopg.rows import DictRow
+
+
+def load_checkpoint(cur: psycopg.Cursor[DictRow], day: date, file: str) -> int:
+    """Lines of the archive that are fully ingested, 0 if none."""
+    cur.execute("SELECT lines FROM ingest_checkpoint WHERE day = %s AND file = %s", (day, file))
+    row = cur.fetchone()
+    return row["lines"] if row else 0
+
+
+def store_checkpoint(cur: psycopg.Cursor[DictRow], day: date, file: str, lines: int) -> None:
+    """Record that the first `lines` lines are fully ingested. Checkpoints only move forward."""
+    cur.execute(
+        """
+        INSERT INTO ingest_checkpoint (day, file, lines) VALUES (%s, %s, %s)
+        ON CONFLICT (day, file) DO UPDATE SET lines = GREATEST(ingest_checkpoint.lines, EXCLUDED.lines), updated_at = now()
+        """,
+        (day, file, lines),
+    )
+
+
+class ArchiveState(NamedTuple):
+    """
+    The archive a resumed run read to its end: its ETag (None for local files) and size, and where to
+    pick up decompressing it once it has grown (see ResumePoint), if a block to resume at was found.
+    """
+    etag: str | None
+    size: int
+    block_bit: int | None = None
+    block_crc: int | None = None
+    block_skip: int | None = None
+    block_lines: int | None = None
+
+
+def load_archive_state(cur: psycopg.Cursor[DictRow], day: date, file: str) -> ArchiveState | None:
+    """The archive as its last resumed run read it, None if unknown."""
+    cur.execute(
+        """
+        SELECT archive_etag, archive_size, block_bit, block_crc, block_skip, block_lines
+        FROM ingest_checkpoint WHERE day = %s AND file = %s AND archive_size IS NOT NULL
+        """,
+        (day, file),
+    )
+    row = cur.fetchone()
+    if row is None:
+        return None
+    return ArchiveState(row["archive_etag"], row["archive_size"], row["block_bit"], row["block_crc"], row["block_skip"], row["block_lines"])
+
+
+def store_archive_state(cur: psycopg.Cursor[DictRow], day: date, file: str, state: ArchiveState) -> None:
+    """Record the archive a run has read to its end, all of whose lines the checkpoint covers."""
+    cur.execute(
+        """
+        INSERT INTO ingest_checkpoint (day, file, lines, archive_etag, archive_size, block_bit, block_crc, block_skip, block_lines)
+        VALUES (%s, %s, 0, %s, %s, %s, %s, %s, %s)
+        ON CONFLICT (day, file) DO UPDATE SET
+            archive_etag = EXCLUDED.archive_etag, archive_size = EXCLUDED.archive_size,
+            block_bit = EXCLUDED.block_bit, block_crc = EXCLUDED.block_crc,
+            block_skip = EXCLUDED.block_skip, block_lines = EXCLUDED.block_lines
+        """,
+        (day, file, *state),
+    )
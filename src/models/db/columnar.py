@@ -0,0 +1,133 @@
+from operator import itemgetter
+from typing import Any, NamedTuple
+
+import numpy as np
+
+# Binary COPY signature, flags and header extension length
+COPY_HEADER = b"PGCOPY\n\xff\r\n\x00" + (0).to_bytes(4, "big") + (0).to_bytes(4, "big")
+COPY_TRAILER = (-1).to_bytes(2, "big", signed=True)
+
+# Staging column type -> NumPy dtype of its binary COPY representation (big-endian, as Postgres sends it)
+FIXED_TYPES = {
+    "INT": np.dtype(">i4"),
+    "BIGINT": np.dtype(">i8"),
+    "DOUBLE PRECISION": np.dtype(">f8"),
+    "BOOLEAN": np.dtype("?"),
+}
+
+
+class Column(NamedTuple):
+    """
+    One column of a ColumnarTable. Fixed-width values are a NumPy array of the column's type, 0 where
+    null. Text is packed: the UTF-8 bytes of all values back to back, value i being
+    values[offsets[i]:offsets[i + 1]].
+    """
+    values: np.ndarray
+    nulls: np.ndarray
+    offsets: np.ndarray | None = None
+
+    def lengths(self) -> np.ndarray:
+        """Byte length of every value in binary COPY, 0 for nulls."""
+        if self.offsets is not None:
+            return np.diff(self.offsets)
+        return np.where(self.nulls, 0, self.values.dtype.itemsize)
+
+    def strings(self) -> list[str | None]:
+        """The values of a text column as str."""
+        assert self.offsets is not None
+        data = self.values.tobytes()
+        return [
+            None if null else data[start:end].decode()
+            for null, start, end in zip(self.nulls.tolist(), self.offsets[:-1].tolist(), self.offsets[1:].tolist())
+        ]
+
+
+def fixed_column(values: list[Any], dtype: np.dtype) -> Column:
+    """Column of numbers or booleans, None being null."""
+    if None not in values:
+        return Column(np.array(values, dtype=dtype), np.zeros(len(values), dtype=bool))
+    nulls = np.array([value is None for value in values], dtype=bool)
+    return Column(np.array([0 if value is None else value for value in values], dtype=dtype), nulls)
+
+
+def text_column(values: list[Any]) -> Column:
+    """Column of str, packed into one buffer, None being null."""
+    if None in values:
+        nulls = np.array([value is None for value in values], dtype=bool)
+        encoded = [b"" if value is None else value.encode() for value in values]
+    else:
+        nulls = np.zeros(len(values), dtype=bool)
+        encoded = [value.encode() for value in values]
+    offsets = np.zeros(len(values) + 1, dtype=np.int64)
+    np.cumsum(np.fromiter(map(len, encoded), dtype=np.int64, count=len(values)), out=offsets[1:])
+    return Column(np.frombuffer(b"".join(encoded), dtype=np.uint8), nulls, offsets)
+
+
+class ColumnarTable:
+    """
+    The rows of one staging table held column-wise: NumPy arrays for numbers and booleans, packed
+    UTF-8 buffers for text. The whole table is encoded into binary COPY with a few array operations
+    per column instead of formatting every row in Python, and the arrays can be read directly, e.g.
+    to analyze a batch without loading it into the database.
+    """
+
+    def __init__(self, columns: dict[str, Column], length: int):
+        self.columns = columns
+        self.length = length
+
+    @classmethod
+    def from_rows(cls, columns: list[tuple[str, str]], rows: list[tuple[Any, ...]]) -> "ColumnarTable":
+        """Transpose rows given in the order of columns, a list of (name, type) as in StagingColumns."""
+        table: dict[str, Column] = {}
+        for i, (name, type) in enumerate(columns):
+            # One C-level pass over the rows per column, which is faster than zip(*rows) for large batches
+            values = list(map(itemgetter(i), rows))
+            table[name] = fixed_column(values, FIXED_TYPES[type]) if type in FIXED_TYPES else text_column(values)
+        return cls(table, len(rows))
+
+    def copy_data(self) -> bytes:
+        """
+        Encode the table as a binary COPY stream. Every row is a field count followed by each field's
+        byte length (-1 for null) and bytes. The fields of a row between two variable-length values
+        (text, or numbers with nulls) have the same size in every row, so they are assembled into one
+        block for all rows and placed with one assignment, as is each packed variable-length column.
+        """
+        lengths = [column.lengths() for column in self.columns.values()]
+        row_sizes = 2 + 4 * len(lengths) + np.sum(lengths, axis=0, dtype=np.int64)
+        row_starts = np.zeros(self.length, dtype=np.int64)
+        np.cumsum(row_sizes[:-1], out=row_starts[1:])
+        row_starts += len(COPY_HEADER)
+        size = len(COPY_HEADER) + int(row_sizes.sum()) + len(COPY_TRAILER)
+        data = np.empty(size, dtype=np.uint8)
+        data[:len(COPY_HEADER)] = np.frombuffer(COPY_HEADER, dtype=np.uint8)
+        data[size - len(COPY_TRAILER):] = np.frombuffer(COPY_TRAILER, dtype=np.uint8)
+
+        position = row_starts
+        # Byte columns of the fixed-size block being assembled, (rows, width) each
+        block = [np.broadcast_to(np.frombuffer(len(lengths).to_bytes(2, "big"), dtype=np.uint8), (self.length, 2))]
+
+        def place_block() -> None:
+            nonlocal position
+            fixed = np.concatenate(block, axis=1)
+            data[position[:, None] + np.arange(fixed.shape[1])] = fixed
+            position = position + fixed.shape[1]
+            block.clear()
+
+        for column, length in zip(self.columns.values(), lengths):
+            block.append(np.where(column.nulls, -1, length).astype(">i4").view(np.uint8).reshape(-1, 4))
+            if column.offsets is None and not column.nulls.any():
+                block.append(column.values.view(np.uint8).reshape(-1, column.values.dtype.itemsize))
+                continue
+            place_block()
+            if column.offsets is not None:
+                values, offsets = column.values, column.offsets
+            else:
+                values = column.values.view(np.uint8).reshape(-1, column.values.dtype.itemsize)[~column.nulls].ravel()
+                offsets = np.zeros(self.length + 1, dtype=np.int64)
+                np.cumsum(length, out=offsets[1:])
+            # Destination of every byte of the packed values: its row's position plus its index within the value
+            data[np.repeat(position - offsets[:-1], length) + np.arange(offsets[-1])] = values
+            position = position + length
+        if block:
+            place_block()
+        return data.tobytes()
@@ -0,0 +1,66 @@
+import hashlib
+import json
+import operator
+import typing
+from dataclasses import fields, is_dataclass
+from typing import Any, Callable
+
+# Function returning the content of a row class as a tuple, composed once per class
+_content_getters: dict[type, Callable[[Any], tuple[Any, ...]]] = {}
+# Row content only holds tuples and scalars, so the encoder skips checking for cycles
+_encoder = json.JSONEncoder(check_circular=False, separators=(",", ":"))
+
+
+def _row_type(annotation: Any) -> type | None:
+    """The row class of a child list annotation like list[Material] | None, else None."""
+    for arg in typing.get_args(annotation):
+        if typing.get_origin(arg) is list:
+            return _row_type(arg)
+        if is_dataclass(arg):
+            return arg  # pyright: ignore[reportReturnType]
+    return None
+
+
+def _content_getter(cls: type) -> Callable[[Any], tuple[Any, ...]]:
+    """
+    Compose a function returning a row's field values minus content_exclude, in declaration order,
+    with child rows turned into tuples of theirs. The values are read by one attrgetter per class, so
+    a market of a few hundred commodities is not walked field by field in Python.
+    """
+    getter = _content_getters.get(cls)
+    if getter is not None:
+        return getter
+    exclude: set[str] = getattr(cls, "content_exclude", set())
+    names = [f.name for f in fields(cls) if f.name not in exclude]
+    if len(names) == 1:
+        # attrgetter of a single name returns the bare value
+        name = names[0]
+
+        def get(row: Any) -> tuple[Any, ...]:
+            return (getattr(row, name),)
+    else:
+        get = operator.attrgetter(*names)
+    hints = typing.get_type_hints(cls)
+    children = [(i, _content_getter(row_type)) for i, name in enumerate(names) if (row_type := _row_type(hints[name])) is not None]
+    if not children:
+        getter = get
+    else:
+        def getter(row: Any) -> tuple[Any, ...]:
+            values = list(get(row))
+            for i, child in children:
+                if values[i] is not None:
+                    values[i] = tuple(map(child, values[i]))
+            return tuple(values)
+    _content_getters[cls] = getter
+    return getter
+
+
+def hash_content(model: Any) -> int:
+    """
+    Signed 64-bit hash of a converted entity's content, child lists included. Fields named in the
+    model's content_exclude (like the event timestamp) are left out, so a report that only repeats
+    what is stored hashes the same.
+    """
+    content = _content_getter(type(model))(model)
+    digest = hashlib.blake2b(_encoder.encode(content).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big", signed=True)
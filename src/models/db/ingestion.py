@@ -1,212 +1,634 @@
-from typing import final
+import asyncio
+import bisect
+import hashlib
+import itertools
+import json
+import os
+from collections import Counter
+from typing import Any, Callable, Iterable, Iterator, NamedTuple, final
 import psycopg
-from psycopg import sql
 from psycopg.rows import DictRow
-from datetime import datetime
-from collections import OrderedDict
-
-from pydantic import BaseModel
-
-
-
-from .body import Body, upsert_body
-from .station import Station, upsert_station
-from .system import System, upsert_system
-from .landmark import Landmark, upsert_landmark
-from .market import Market, upsert_market
-from .shipyard import Shipyard, upsert_shipyard
-from .outfitting import Outfitting, upsert_outfitting
-from .signals import Signal, upsert_signal
-
-class DatabaseModels(BaseModel):
-    systems: list[System] = []
-    stations: list[Station] = []
-    bodies: list[Body] = []
-    landmarks: list[Landmark] = []
-    markets: list[Market] = []
-    shipyards: list[Shipyard] = []
-    outfittings: list[Outfitting] = []
-    signals: list[Signal] = []
-
-    def upsert_all(self, cur: psycopg.Cursor[DictRow]) -> None:
-        """Upsert all models in this DatabaseModels instance to the database."""
-        for system in self.systems:
-            upsert_system(cur, system)
-        for station in self.stations:
-            upsert_station(cur, station)
-        for body in self.bodies:
-            upsert_body(cur, body)
-        for landmark in self.landmarks:
-            upsert_landmark(cur, landmark)
-        for market in self.markets:
-            upsert_market(cur, market)
-        for shipyard in self.shipyards:
-            upsert_shipyard(cur, shipyard)
-        for outfitting in self.outfittings:
-            upsert_outfitting(cur, outfitting)
-        for signal in self.signals:
-            upsert_signal(cur, signal)
+from datetime import datetime, timedelta, timezone
+
+from dataclasses import dataclass, field
+
+
+
+from .bulk import StagingColumns, StagingRows, columnar_staging_rows, copy_staging_rows, copy_staging_rows_async, create_staging_tables
+from .columnar import ColumnarTable
+from .content import hash_content
+from .statements import UpsertStatement, WriteStats
+from .body import BODY_STAGING, Body, merge_body_statements, stage_body, upsert_body
+from .station import STATION_STAGING, Station, merge_station_statements, stage_station, upsert_station
+from .system import SYSTEM_STAGING, System, merge_system_statements, stage_system, upsert_system
+from .landmark import LANDMARK_STAGING, Landmark, merge_landmark_statements, stage_landmark, upsert_landmark
+from .market import MARKET_STAGING, UPSERT_MARKET, Market, merge_market_statements, stage_market, upsert_market
+from .shipyard import SHIPYARD_STAGING, UPSERT_SHIPYARD, Shipyard, merge_shipyard_statements, stage_shipyard, upsert_shipyard
+from .outfitting import OUTFITTING_STAGING, UPSERT_OUTFITTING, Outfitting, merge_outfitting_statements, stage_outfitting, upsert_outfitting
+from .signals import SIGNAL_STAGING, Signal, merge_signal_statements, stage_signal, upsert_signal
+
+# Writes keys as Postgres prints a jsonb array, so migrations can build the same keys in SQL
+_key_encoder = json.JSONEncoder(ensure_ascii=False, check_circular=False)
+
+
+def ingestion_lock_key(model_name: str, primary_key: Iterable[Any]) -> tuple[str, str]:
+    """
+    Encode a model's primary key values, in `primary_keys` order, as the (model_name, primary_key) pair
+    used by ingestion_lock: a JSON array, e.g. ("body", "[2870514583017, 14]"), so None, "" and values
+    holding separators all stay distinct.
+    """
+    return model_name, _key_encoder.encode(list(primary_key))
+
+
+# DatabaseModels attribute -> model name used by ingestion_lock and the caches, in upsert order
+MODEL_NAMES = {
+    'systems': 'system',
+    'stations': 'station',
+    'bodies': 'body',
+    'landmarks': 'landmark',
+    'markets': 'market',
+    'shipyards': 'shipyard',
+    'outfittings': 'outfitting',
+    'signals': 'signal',
+}
+
+UPSERTS: dict[str, Callable[[psycopg.Cursor[DictRow], Any, int, WriteStats | None], bool]] = {
+    'system': upsert_system,
+    'station': upsert_station,
+    'body': upsert_body,
+    'landmark': upsert_landmark,
+    'market': upsert_market,
+    'shipyard': upsert_shipyard,
+    'outfitting': upsert_outfitting,
+    'signal': upsert_signal,
+}
+
+# Upserts of the models whose content_exclude columns are still written when the content is unchanged
+# (see UpsertStatement.touch_query), by model name
+TOUCHES: dict[str, UpsertStatement] = {
+    'market': UPSERT_MARKET,
+    'shipyard': UPSERT_SHIPYARD,
+    'outfitting': UPSERT_OUTFITTING,
+}
+
+
+class UpsertResult(NamedTuple):
+    """Outcome of writing one DatabaseModels: entities written, entities skipped as unchanged, and the
+    (cache key, content hash) pairs now stored, for the content hash cache once committed."""
+    written: int
+    unchanged: int
+    content_hashes: list[tuple[int, int]]
+
+    @property
+    def is_unchanged(self) -> bool:
+        """True if every entity was skipped because its content was already stored."""
+        return self.unchanged > 0 and self.written == 0
+
+
+def content_key(model_name: str, entity: Any) -> int:
+    """Key of an entity in the content hash cache."""
+    return hash(ingestion_lock_key(model_name, (getattr(entity, k) for k in entity.primary_keys)))  # pyright: ignore[reportAttributeAccessIssue]
+
+
+@dataclass(slots=True)
+class DatabaseModels:
+    """
+    The rows an event converts to. Rows are slotted dataclasses in column order that converters fill
+    and writers read as is: the event was validated when it was parsed, so they are not validated again.
+    """
+    systems: list[System] = field(default_factory=list)
+    stations: list[Station] = field(default_factory=list)
+    bodies: list[Body] = field(default_factory=list)
+    landmarks: list[Landmark] = field(default_factory=list)
+    markets: list[Market] = field(default_factory=list)
+    shipyards: list[Shipyard] = field(default_factory=list)
+    outfittings: list[Outfitting] = field(default_factory=list)
+    signals: list[Signal] = field(default_factory=list)
+
+    def entities(self) -> Iterator[tuple[str, Any]]:
+        """Yield (model_name, entity) for every model in this DatabaseModels instance, in upsert order."""
+        for attr, model_name in MODEL_NAMES.items():
+            for entity in getattr(self, attr):
+                yield model_name, entity
+
+    def upsert_all(self, cur: psycopg.Cursor[DictRow], content_cache: "ContentHashCache | None" = None, stats: WriteStats | None = None) -> UpsertResult:
+        """
+        Upsert all models in this DatabaseModels instance to the database. Entities whose content hash
+        matches the one last stored for their key, in the cache or in the database, are not written.
+        """
+        written = 0
+        unchanged = 0
+        content_hashes: list[tuple[int, int]] = []
+        for model_name, entity in self.entities():
+            key = content_key(model_name, entity)
+            digest = hash_content(entity)
+            if content_cache is not None and content_cache.is_unchanged(key, digest):
+                if model_name in TOUCHES:
+                    touch(cur, model_name, [entity])
+                unchanged += 1
+                continue
+            if UPSERTS[model_name](cur, entity, digest, stats):
+                written += 1
+            else:
+                unchanged += 1
+            content_hashes.append((key, digest))
+        return UpsertResult(written, unchanged, content_hashes)
+
+    def ingestion_locks(self) -> list[tuple[str, str]]:
+        """Return the sorted (model_name, primary_key) pairs touched by these models."""
+        locks: set[tuple[str, str]] = set()
+        for model_name, m in self.entities():
+            locks.add(ingestion_lock_key(model_name, (getattr(m, k) for k in m.primary_keys)))  # pyright: ignore[reportAttributeAccessIssue]
+        # Stable order so concurrent writers acquire locks without deadlocking
+        return sorted(locks)
+
+BULK_STAGING: StagingColumns = {
+    **SYSTEM_STAGING,
+    **STATION_STAGING,
+    **BODY_STAGING,
+    **LANDMARK_STAGING,
+    **MARKET_STAGING,
+    **SHIPYARD_STAGING,
+    **OUTFITTING_STAGING,
+    **SIGNAL_STAGING,
+}
+
+# Merge order follows upsert_all
+BULK_MERGE_STATEMENTS: list[tuple[str, str]] = [
+    *merge_system_statements(),
+    *merge_station_statements(),
+    *merge_body_statements(),
+    *merge_landmark_statements(),
+    *merge_market_statements(),
+    *merge_shipyard_statements(),
+    *merge_outfitting_statements(),
+    *merge_signal_statements(),
+]
+
+
+STAGES: dict[str, Callable[[StagingRows, int, Any, int], None]] = {
+    'system': stage_system,
+    'station': stage_station,
+    'body': stage_body,
+    'landmark': stage_landmark,
+    'market': stage_market,
+    'shipyard': stage_shipyard,
+    'outfitting': stage_outfitting,
+    'signal': stage_signal,
+}
+
+
+def stage_all(batch: Iterable[DatabaseModels], content_cache: "ContentHashCache | None" = None) -> tuple[StagingRows, list[UpsertResult]]:
+    """
+    Flatten a batch of DatabaseModels into staging rows, numbering entities in batch order. Entities the
+    content hash cache knows to be stored already, or that repeat the content staged last for their key
+    earlier in the batch, are left out.
+    """
+    rows: StagingRows = {table: [] for table in BULK_STAGING}
+    results: list[UpsertResult] = []
+    # Content hash staged last per key in this batch
+    staged_hashes: dict[int, int] = {}
+    seq = 0
+    for models in batch:
+        staged = 0
+        unchanged = 0
+        content_hashes: list[tuple[int, int]] = []
+        for model_name, entity in models.entities():
+            key = content_key(model_name, entity)
+            digest = hash_content(entity)
+            if key in staged_hashes:
+                if staged_hashes[key] == digest:
+                    unchanged += 1
+                    continue
+            elif content_cache is not None and content_cache.is_unchanged(key, digest):
+                unchanged += 1
+                continue
+            seq += 1
+            STAGES[model_name](rows, seq, entity, digest)
+            staged_hashes[key] = digest
+            staged += 1
+            content_hashes.append((key, digest))
+        results.append(UpsertResult(staged, unchanged, content_hashes))
+    return rows, results
+
+
+def columnar_batch(batch: Iterable[DatabaseModels]) -> dict[str, ColumnarTable]:
+    """A batch of DatabaseModels staged as NumPy columns per staging table, e.g. to analyze it without the database."""
+    rows, _ = stage_all(batch)
+    return columnar_staging_rows(BULK_STAGING, rows)
+
+
+def count_stored(results: list[UpsertResult], stored: list[int]) -> list[UpsertResult]:
+    """
+    Count the staged entities the merge dropped because their content hash was stored already, given
+    their seq, as unchanged in the result of the batch item that staged them. stage_all numbers
+    entities in batch order, so item i staged the seqs after the entities written by the items before it.
+    """
+    if not stored:
+        return results
+    ends = list(itertools.accumulate(result.written for result in results))
+    counts = Counter(bisect.bisect_left(ends, seq) for seq in stored)
+    return [
+        UpsertResult(result.written - counts[i], result.unchanged + counts[i], result.content_hashes)
+        for i, result in enumerate(results)
+    ]
+
+
+def touch(cur: psycopg.Cursor[DictRow], model_name: str, entities: Iterable[Any]) -> None:
+    """Write the content_exclude columns of entities whose content was not written (see UpsertStatement.touch_query)."""
+    statement = TOUCHES[model_name]
+    cur.executemany(statement.touch_query, [statement.touch_values(entity) for entity in entities])  # pyright: ignore[reportArgumentType]
+
+
+def latest_touched(batch: Iterable[DatabaseModels]) -> dict[str, list[Any]]:
+    """
+    The last entity of every key in a batch, per model in TOUCHES. Written after the merges, they bring the
+    touched columns of the keys whose last reports were dropped as stored or repeated up to date.
+    """
+    latest: dict[str, dict[int, Any]] = {}
+    for models in batch:
+        for model_name, entity in models.entities():
+            if model_name in TOUCHES:
+                latest.setdefault(model_name, {})[content_key(model_name, entity)] = entity
+    return {model_name: list(entities.values()) for model_name, entities in latest.items()}
+
+
+def take_merge_rows(returned: list[DictRow], stored: list[int], stats: WriteStats | None = None) -> None:
+    """
+    Take in the rows a bulk merge statement returned: the seq of a staged entity dropped because its
+    content is stored already (see bulk.skip_stored), or child rows counts (see bulk.merge_children).
+    """
+    for row in returned:
+        if "seq" in row:
+            stored.append(row["seq"])
+        elif stats is not None:
+            stats.add_child_rows(row.pop("child_table"), row)
+
+
+def bulk_upsert_all(cur: psycopg.Cursor[DictRow], batch: list[DatabaseModels], content_cache: "ContentHashCache | None" = None, stats: WriteStats | None = None) -> list[UpsertResult]:
+    """
+    Upsert a whole batch of DatabaseModels at once: COPY every row into the staging tables, then merge
+    each target table with one set-based statement. The result is the same as calling upsert_all on
+    every item in order. The content hash cache only spares staging entities it knows to be stored;
+    the merges themselves drop staged entities whose content hash is the stored one. The last entity of
+    each key of a model in TOUCHES then has its content_exclude columns written, as upsert_all would.
+    """
+    rows, results = stage_all(batch, content_cache)
+    cur.execute(create_staging_tables(BULK_STAGING))  # pyright: ignore[reportArgumentType]
+    copy_staging_rows(cur, BULK_STAGING, rows)
+    stored: list[int] = []
+    for stage, statement in BULK_MERGE_STATEMENTS:
+        if rows[stage]:
+            cur.execute(statement)  # pyright: ignore[reportArgumentType]
+            if cur.description is not None:
+                take_merge_rows(cur.fetchall(), stored, stats)
+    for model_name, entities in latest_touched(batch).items():
+        touch(cur, model_name, entities)
+    return count_stored(results, stored)
+
+
+async def bulk_upsert_all_async(cur: psycopg.AsyncCursor[DictRow], batch: list[DatabaseModels], content_cache: "ContentHashCache | None" = None, stats: WriteStats | None = None) -> list[UpsertResult]:
+    """
+    bulk_upsert_all on an async cursor, running the same staging tables and merge statements. Hashing
+    and staging run in a thread, so the event loop keeps serving the other writes meanwhile.
+    """
+    rows, results = await asyncio.to_thread(stage_all, batch, content_cache)
+    await cur.execute(create_staging_tables(BULK_STAGING))  # pyright: ignore[reportArgumentType]
+    await copy_staging_rows_async(cur, BULK_STAGING, rows)
+    stored: list[int] = []
+    for stage, statement in BULK_MERGE_STATEMENTS:
+        if rows[stage]:
+            await cur.execute(statement)  # pyright: ignore[reportArgumentType]
+            if cur.description is not None:
+                take_merge_rows(await cur.fetchall(), stored, stats)
+    for model_name, entities in latest_touched(batch).items():
+        statement = TOUCHES[model_name]
+        await cur.executemany(statement.touch_query, [statement.touch_values(entity) for entity in entities])  # pyright: ignore[reportArgumentType]
+    return count_stored(results, stored)
+
+
+# Memory taken by one cache entry: a dict slot plus an int key and an int value
+CACHE_ENTRY_BYTES = 120
+# Memory budget of the timestamp cache
+TIMESTAMP_CACHE_MB = int(os.getenv("INGEST_TIMESTAMP_CACHE_MB", "256"))
+# Memory budget of the content hash cache, off by default. It only knows what this process stored last, so
+# it must stay 0 when several processes write the same tables; the upserts check the stored hashes anyway
+CONTENT_HASH_CACHE_MB = int(os.getenv("INGEST_CONTENT_HASH_CACHE_MB", "0"))
+
+
+def timestamp_ms(timestamp: str) -> int:
+    """Epoch milliseconds of an EDDN timestamp."""
+    return int(parse_timestamp(timestamp).timestamp() * 1000)
+
+
+class GenerationalCache:
+    """
+    Bounded map of 64-bit keys to integers in two generations of plain dicts: a hit in the old generation
+    moves the entry to the current one, and once the current one holds half the capacity the old one is
+    dropped whole. This approximates LRU at about a third of the memory of an OrderedDict of string keys,
+    and the capacity follows from a memory budget.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.capacity = max(2, max_bytes // CACHE_ENTRY_BYTES)
+        self._current: dict[int, int] = {}
+        self._previous: dict[int, int] = {}
+        self.evictions = 0
+
+    def _lookup(self, key: int) -> int | None:
+        value = self._current.get(key)
+        if value is None:
+            value = self._previous.pop(key, None)
+            if value is not None:
+                self._store(key, value)
+        return value
+
+    def _store(self, key: int, value: int) -> None:
+        self._current[key] = value
+        if len(self._current) >= self.capacity // 2:
+            self.evictions += len(self._previous)
+            self._previous = self._current
+            self._current = {}
+
+    def __len__(self) -> int:
+        return len(self._current) + len(self._previous)
+
+    def clear(self):
+        """Clear all cached entries."""
+        self._current = {}
+        self._previous = {}
+
 
 @final
-class TimestampCache:
-    """In-memory LRU cache for storing the latest timestamps for (model, primary_key, event) combinations."""
-    
-    def __init__(self, max_size: int = 1024*10):
-        self.max_size = max_size
-        self._cache: OrderedDict[str, str] = OrderedDict()
-    
-    def _make_key(self, model_name: str, primary_key: str, event: str) -> str:
+class TimestampCache(GenerationalCache):
+    """
+    In-memory cache of the latest committed timestamps for (model, primary_key, event) combinations.
+    Keys are stored as 64-bit hashes and timestamps as epoch milliseconds.
+    """
+
+    def __init__(self, max_bytes: int = TIMESTAMP_CACHE_MB * 1024 * 1024):
+        super().__init__(max_bytes)
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+
+    def _make_key(self, model_name: str, primary_key: str, event: str) -> int:
         """Create a cache key from model_name, primary_key and event."""
-        return f"{model_name}|{primary_key}|{event}"
-    
-    def is_newer_and_update(self, model_name: str, primary_key: str, event: str, new_timestamp: str) -> bool:
+        return hash((model_name, primary_key, event))
+
+    def is_newer(self, model_name: str, primary_key: str, event: str, new_timestamp: str) -> bool:
         """
-        Check if the new timestamp is newer than the cached one and update if so.
+        Check if the new timestamp is newer than the cached one without updating the cache.
         Returns True if the timestamp is newer (or no cached value exists), False otherwise.
         """
-        cache_key = self._make_key(model_name, primary_key, event)
-        cached_timestamp = self._cache.get(cache_key)
-        
-        # If no cached value, consider it newer and cache it
+        cached_timestamp = self._lookup(self._make_key(model_name, primary_key, event))
         if cached_timestamp is None:
-            self._cache[cache_key] = new_timestamp
-            # Move to end (most recently used)
-            self._cache.move_to_end(cache_key)
-            self._evict_if_needed()
+            self.misses += 1
             return True
-        
-        # Move to end (most recently used) regardless of outcome
-        self._cache.move_to_end(cache_key)
-        
+        self.hits += 1
+
         try:
-            # Parse timestamps for comparison
-            new_dt = datetime.fromisoformat(new_timestamp.replace('Z', '+00:00'))
-            cached_dt = datetime.fromisoformat(cached_timestamp.replace('Z', '+00:00'))
-            
-            # If new timestamp is newer, update cache and return True
-            if new_dt > cached_dt:
-                self._cache[cache_key] = new_timestamp
-                return True
-            else:
-                return False
-                
-        except (ValueError, AttributeError):
-            # If timestamp parsing fails, assume it's newer and update
-            self._cache[cache_key] = new_timestamp
+            newer = timestamp_ms(new_timestamp) > cached_timestamp
+        except ValueError:
+            # If timestamp parsing fails, assume it's newer
             return True
-    
-    def _evict_if_needed(self):
-        """Remove oldest entries if cache exceeds max size."""
-        while len(self._cache) > self.max_size:
-            self._cache.popitem(last=False)  # Remove oldest (first) item
-    
-    def get(self, model_name: str, primary_key: str, event: str) -> str | None:
-        """Get cached timestamp for (model, primary_key, event) combination."""
-        cache_key = self._make_key(model_name, primary_key, event)
-        timestamp = self._cache.get(cache_key)
-        if timestamp:
-            # Move to end (most recently used)
-            self._cache.move_to_end(cache_key)
-        return timestamp
-    
-    def clear(self):
-        """Clear all cached timestamps."""
-        self._cache.clear()
+        if not newer:
+            self.stale += 1
+        return newer
+
+    def update(self, model_name: str, primary_key: str, event: str, new_timestamp: str) -> None:
+        """Store the timestamp for (model, primary_key, event) if it is newer than the cached one."""
+        try:
+            timestamp = timestamp_ms(new_timestamp)
+        except ValueError:
+            return
+        self._set(self._make_key(model_name, primary_key, event), timestamp)
+
+    def _set(self, key: int, timestamp: int) -> None:
+        cached_timestamp = self._lookup(key)
+        if cached_timestamp is None or timestamp > cached_timestamp:
+            self._store(key, timestamp)
+
+    def is_newer_and_update(self, model_name: str, primary_key: str, event: str, new_timestamp: str) -> bool:
+        """
+        Check if the new timestamp is newer than the cached one and update if so.
+        Returns True if the timestamp is newer (or no cached value exists), False otherwise.
+        """
+        if not self.is_newer(model_name, primary_key, event, new_timestamp):
+            return False
+        self.update(model_name, primary_key, event, new_timestamp)
+        return True
+
+    def warm(self, conn: psycopg.Connection[Any], days: float | None = None) -> int:
+        """
+        Load the most recent timestamps from ingestion_lock, optionally only those of the last `days`
+        days, up to what fits in one generation. Returns the number of entries loaded.
+        """
+        since = "WHERE timestamp > now() - make_interval(secs => %(seconds)s)" if days else ""
+        loaded = 0
+        # A named cursor streams the rows instead of fetching them all at once
+        with conn.cursor(name="timestamp_cache_warmup") as cur:
+            cur.itersize = 10000
+            cur.execute(
+                f"""
+                SELECT model_name, primary_key, event, timestamp_ms FROM (
+                    SELECT model_name, primary_key, event, (extract(epoch FROM timestamp) * 1000)::bigint AS timestamp_ms
+                    FROM ingestion_lock
+                    {since}
+                    ORDER BY timestamp DESC
+                    LIMIT %(limit)s
+                ) recent
+                ORDER BY timestamp_ms
+                """,  # pyright: ignore[reportArgumentType]
+                {"seconds": (days or 0) * 86400, "limit": self.capacity // 2 - 1},
+            )
+            for model_name, primary_key, event, timestamp in cur:
+                self._set(self._make_key(model_name, primary_key, event), timestamp)
+                loaded += 1
+        return loaded
+
+    def stats(self) -> dict[str, int]:
+        """Entry count, capacity and hit/miss/stale/eviction counters."""
+        return {
+            "size": len(self),
+            "capacity": self.capacity,
+            "hits": self.hits,
+            "misses": self.misses,
+            "stale": self.stale,
+            "evictions": self.evictions,
+        }
 
 
 # Global timestamp cache instance
+@final
+class ContentHashCache(GenerationalCache):
+    """In-memory cache of the content hash last stored for each (model, primary_key), keyed by content_key."""
+
+    def __init__(self, max_bytes: int = CONTENT_HASH_CACHE_MB * 1024 * 1024):
+        super().__init__(max_bytes)
+        self.hits = 0
+        self.misses = 0
+
+    def is_unchanged(self, key: int, content_hash: int) -> bool:
+        """Return True if the content hash is the one last stored for the key."""
+        unchanged = self._lookup(key) == content_hash
+        if unchanged:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return unchanged
+
+    def update(self, key: int, content_hash: int) -> None:
+        """Remember the content hash committed for the key."""
+        self._store(key, content_hash)
+
+    def stats(self) -> dict[str, int]:
+        """Entry count, capacity and hit/miss/eviction counters."""
+        return {
+            "size": len(self),
+            "capacity": self.capacity,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
 _timestamp_cache = TimestampCache()
 
 
+_content_hash_cache = ContentHashCache() if CONTENT_HASH_CACHE_MB > 0 else None
+
+
+def get_content_hash_cache() -> ContentHashCache | None:
+    """Get the global content hash cache instance, or None if INGEST_CONTENT_HASH_CACHE_MB is 0."""
+    return _content_hash_cache
+
+
 def get_timestamp_cache() -> TimestampCache:
     """Get the global timestamp cache instance."""
     return _timestamp_cache
 
 
-def create_ingestion_table() -> str:
-    """Create the ingestion lock table keyed by model and primary key, tracking latest timestamp per event."""
-    return """
-    CREATE TABLE IF NOT EXISTS ingestion_lock (
-        model_name TEXT NOT NULL,
-        primary_key TEXT NOT NULL,
-        event TEXT NOT NULL,
-        timestamp TEXT NOT NULL,
-        PRIMARY KEY (model_name, primary_key, event)
-    );
-    """
+# An event only replaces what an earlier event of the same kind wrote if it is at least this much newer
+FRESHNESS_GUARD = timedelta(seconds=10)
 
+# (model_name, primary_key, event)
+IngestionClaim = tuple[str, str, str]
 
-def lock_latest_ingestion_timestamp(cur: psycopg.Cursor[DictRow], model_name: str, primary_key: str, event: str, new_timestamp: str) -> bool:
-    """
-    Serialize by (model_name, primary_key) using a sentinel row lock, then insert or update the
-    timestamp for the specific (model_name, primary_key, event). This prevents concurrent updates to
-    the same model instance across different events and avoids deadlocks even when no rows exist yet.
 
-    Returns False if the (model_name, primary_key, event) row exists and the new timestamp is not
-    sufficiently newer (10s guard).
+def parse_timestamp(timestamp: str) -> datetime:
+    """Parse an EDDN timestamp; timestamps without a zone are UTC."""
+    parsed = datetime.fromisoformat(timestamp.replace("Z", "+00:00"))
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def advisory_lock_id(model_name: str, primary_key: str) -> int:
+    """64-bit advisory lock id of a (model_name, primary_key) pair."""
+    digest = hashlib.blake2b(f"{model_name}|{primary_key}".encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big", signed=True)
+
+
+# unnest preserves the array order, so the locks are taken in sorted order
+LOCK_KEYS_QUERY = "SELECT pg_advisory_xact_lock(lock_id) FROM unnest(%s::bigint[]) AS lock_id"
+
+
+def lock_ingestion_keys(cur: psycopg.Cursor[DictRow], locks: Iterable[tuple[str, str]]) -> None:
+    """
+    Serialize by (model_name, primary_key) with transaction-scoped advisory locks. All keys of a batch are
+    locked with one statement, in sorted lock id order, so concurrent writers cannot deadlock. Nothing is
+    written to take the locks, and they are released on commit or rollback.
 
     Assumes the caller manages the transaction (BEGIN/COMMIT) and sets appropriate lock timeout.
     """
-    
-    # First check the in-memory cache to avoid unnecessary database operations
-    if not _timestamp_cache.is_newer_and_update(model_name, primary_key, event, new_timestamp):
-        return False
-
-    # 1) Ensure a sentinel row exists and lock it to serialize by (model_name, primary_key)
-    sentinel_event = "__lock__"
-    try:
-        cur.execute(
-            """
-            INSERT INTO ingestion_lock (model_name, primary_key, event, timestamp)
-            VALUES (%s, %s, %s, %s)
-            ON CONFLICT (model_name, primary_key, event) DO NOTHING
-            """,
-            (model_name, primary_key, sentinel_event, "1970-01-01T00:00:00Z"),
-        )
-    except Exception:
-        # Ignore errors here; we'll still attempt to lock
-        pass
-
-    cur.execute(
-        """
-        SELECT 1 FROM ingestion_lock
-        WHERE model_name = %s AND primary_key = %s AND event = %s
-        FOR UPDATE
-        """,
-        (model_name, primary_key, sentinel_event),
-    )
-    # Now we hold a row-level lock that serializes all work for this model/primary_key
-
-    # 2) Upsert the specific (model_name, primary_key, event) timestamp with a 10s update guard
-    upsert_query = sql.SQL("""
-        WITH upsert AS (
-            INSERT INTO ingestion_lock (model_name, primary_key, event, timestamp) 
-            VALUES (%s, %s, %s, %s)
-            ON CONFLICT (model_name, primary_key, event) 
-            DO UPDATE SET 
-                timestamp = EXCLUDED.timestamp
-                WHERE EXCLUDED.timestamp::timestamp > ingestion_lock.timestamp::timestamp + interval '10 seconds'
-            RETURNING 
-                (xmax = 0) AS inserted, 
-                (xmax <> 0) AS updated
-        )
-        SELECT
-            COALESCE((SELECT inserted FROM upsert), FALSE) AS inserted,
-            COALESCE((SELECT updated  FROM upsert), FALSE) AS updated,
-            COALESCE((SELECT TRUE FROM upsert), FALSE)     AS applied;
-    """)
-    
-    cur.execute(upsert_query, (model_name, primary_key, event, new_timestamp))
-    result = cur.fetchone()
-    
-    if not result:
-        print('Failed to insert or update ingestion timestamp', flush=True)
-        return False
-    
-    was_applied = result['applied']
-    
-    if not was_applied:
-        # Nothing changed; let caller roll back to release locks
-        return False
-
-    return True
\ No newline at end of file
+    lock_ids = sorted({advisory_lock_id(model_name, primary_key) for model_name, primary_key in locks})
+    if lock_ids:
+        cur.execute(LOCK_KEYS_QUERY, (lock_ids,))
+
+
+async def lock_ingestion_keys_async(cur: psycopg.AsyncCursor[DictRow], locks: Iterable[tuple[str, str]]) -> None:
+    """lock_ingestion_keys on an async cursor."""
+    lock_ids = sorted({advisory_lock_id(model_name, primary_key) for model_name, primary_key in locks})
+    if lock_ids:
+        await cur.execute(LOCK_KEYS_QUERY, (lock_ids,))
+
+
+@final
+class IngestionTimestamps:
+    """
+    The freshness guard of one write batch. The stored timestamps of every key in the batch are read
+    with one statement once the keys are locked; events are then checked and claimed in batch order in
+    memory, and the claimed timestamps are written back with one statement before commit.
+    """
+
+    FETCH_QUERY = """
+        SELECT l.model_name, l.primary_key, l.event, l.timestamp
+        FROM ingestion_lock l
+        JOIN unnest(%s::text[], %s::text[], %s::text[]) AS k(model_name, primary_key, event)
+            USING (model_name, primary_key, event)
+    """
+    STORE_QUERY = """
+        INSERT INTO ingestion_lock (model_name, primary_key, event, timestamp)
+        SELECT * FROM unnest(%s::text[], %s::text[], %s::text[], %s::timestamptz[])
+        ON CONFLICT (model_name, primary_key, event) DO UPDATE SET timestamp = EXCLUDED.timestamp
+    """
+
+    def __init__(self, current: dict[IngestionClaim, datetime]):
+        self._current = current
+        self._claimed: dict[IngestionClaim, datetime] = {}
+
+    @staticmethod
+    def _fetch_params(claims: Iterable[IngestionClaim]) -> tuple[list[str], list[str], list[str]] | None:
+        distinct = sorted(set(claims))
+        if not distinct:
+            return None
+        return [c[0] for c in distinct], [c[1] for c in distinct], [c[2] for c in distinct]
+
+    @classmethod
+    def _from_rows(cls, rows: list[DictRow]) -> "IngestionTimestamps":
+        return cls({(row["model_name"], row["primary_key"], row["event"]): row["timestamp"] for row in rows})
+
+    @classmethod
+    def fetch(cls, cur: psycopg.Cursor[DictRow], claims: Iterable[IngestionClaim]) -> "IngestionTimestamps":
+        """Read the stored timestamps of the given claims. The keys must already be locked."""
+        params = cls._fetch_params(claims)
+        if params is None:
+            return cls({})
+        cur.execute(cls.FETCH_QUERY, params)
+        return cls._from_rows(cur.fetchall())
+
+    @classmethod
+    async def fetch_async(cls, cur: psycopg.AsyncCursor[DictRow], claims: Iterable[IngestionClaim]) -> "IngestionTimestamps":
+        """fetch on an async cursor."""
+        params = cls._fetch_params(claims)
+        if params is None:
+            return cls({})
+        await cur.execute(cls.FETCH_QUERY, params)
+        return cls._from_rows(await cur.fetchall())
+
+    def is_fresh(self, claims: Iterable[IngestionClaim], timestamp: datetime) -> bool:
+        """True if the timestamp is sufficiently newer (10s guard) than the current one of every claim."""
+        for claim in claims:
+            current = self._current.get(claim)
+            if current is not None and timestamp <= current + FRESHNESS_GUARD:
+                return False
+        return True
+
+    def claim(self, claims: Iterable[IngestionClaim], timestamp: datetime) -> None:
+        """Record the timestamp of an accepted event, for later events in the batch and for `store`."""
+        for claim in claims:
+            self._current[claim] = timestamp
+            self._claimed[claim] = timestamp
+
+    def _store_params(self) -> tuple[list[str], list[str], list[str], list[datetime]]:
+        claims = sorted(self._claimed)
+        return [c[0] for c in claims], [c[1] for c in claims], [c[2] for c in claims], [self._claimed[c] for c in claims]
+
+    def store(self, cur: psycopg.Cursor[DictRow]) -> None:
+        """Write all claimed timestamps with one upsert."""
+        if self._claimed:
+            cur.execute(self.STORE_QUERY, self._store_params())
+
+    async def store_async(self, cur: psycopg.AsyncCursor[DictRow]) -> None:
+        """store on an async cursor."""
+        if self._claimed:
+            await cur.execute(self.STORE_QUERY, self._store_params())
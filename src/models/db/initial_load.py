@@ -0,0 +1,127 @@
+import psycopg
+from psycopg import sql
+
+# Tables that stay logged during an initial load: the job queue and the bookkeeping of the load itself.
+# Everything else, ingest_checkpoint included, is unlogged, so a crash that truncates the loaded data
+# truncates the checkpoints claiming it was loaded with it.
+KEEP_LOGGED = ["schema_version", "ingest_job", "deferred_index", "deferred_constraint"]
+
+
+def load_tables(conn: psycopg.Connection) -> list[str]:
+    """The tables an initial load writes to."""
+    rows = conn.execute(
+        """
+        SELECT c.relname FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE n.nspname = 'public' AND c.relkind = 'r' AND c.relname <> ALL(%s)
+        ORDER BY c.relname
+        """,
+        (KEEP_LOGGED,),
+    ).fetchall()
+    return [row[0] for row in rows]
+
+
+def is_loaded(conn: psycopg.Connection) -> bool:
+    """Whether anything was ingested yet."""
+    return conn.execute("SELECT EXISTS (SELECT FROM ingestion_lock)").fetchone()[0]  # pyright: ignore[reportOptionalSubscript]
+
+
+def defer_constraints(conn: psycopg.Connection) -> int:
+    """
+    Drop every foreign key, recording its definition in deferred_constraint. Returns how many. The
+    writes never rely on ON DELETE CASCADE, as they delete the child rows they replace themselves.
+    """
+    with conn.transaction():
+        rows = conn.execute(
+            """
+            SELECT con.conname, rel.relname, pg_get_constraintdef(con.oid)
+            FROM pg_constraint con
+            JOIN pg_class rel ON rel.oid = con.conrelid
+            JOIN pg_namespace n ON n.oid = rel.relnamespace
+            WHERE n.nspname = 'public' AND con.contype = 'f'
+            """
+        ).fetchall()
+        for name, table, definition in rows:
+            conn.execute("INSERT INTO deferred_constraint (table_name, name, definition) VALUES (%s, %s, %s)", (table, name, definition))
+            conn.execute(sql.SQL("ALTER TABLE {} DROP CONSTRAINT {}").format(sql.Identifier(table), sql.Identifier(name)))
+    return len(rows)
+
+
+def defer_indexes(conn: psycopg.Connection) -> int:
+    """
+    Drop the secondary indexes of the load tables (e.g. HNSW on system.StarPos), recording their
+    definitions in deferred_index. Unique indexes stay, as ON CONFLICT needs them to find the rows
+    an upsert replaces. Returns how many were dropped.
+    """
+    with conn.transaction():
+        rows = conn.execute(
+            """
+            SELECT i.relname, t.relname, pg_get_indexdef(i.oid)
+            FROM pg_index x
+            JOIN pg_class i ON i.oid = x.indexrelid
+            JOIN pg_class t ON t.oid = x.indrelid
+            JOIN pg_namespace n ON n.oid = t.relnamespace
+            WHERE n.nspname = 'public' AND NOT x.indisunique AND NOT x.indisprimary AND t.relname <> ALL(%s)
+            """,
+            (KEEP_LOGGED,),
+        ).fetchall()
+        for name, table, definition in rows:
+            conn.execute("INSERT INTO deferred_index (name, table_name, definition) VALUES (%s, %s, %s)", (name, table, definition))
+            conn.execute(sql.SQL("DROP INDEX {}").format(sql.Identifier(name)))
+    return len(rows)
+
+
+def set_logged(conn: psycopg.Connection, table: str, logged: bool) -> None:
+    """Switch a table between logged and unlogged; either way the table is rewritten."""
+    conn.execute(sql.SQL("ALTER TABLE {} SET {}").format(sql.Identifier(table), sql.SQL("LOGGED" if logged else "UNLOGGED")))
+
+
+def unlogged_tables(conn: psycopg.Connection) -> list[str]:
+    rows = conn.execute(
+        """
+        SELECT c.relname FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE n.nspname = 'public' AND c.relkind = 'r' AND c.relpersistence = 'u'
+        ORDER BY c.relname
+        """
+    ).fetchall()
+    return [row[0] for row in rows]
+
+
+def deferred_indexes(conn: psycopg.Connection) -> list[tuple[str, str]]:
+    """(name, definition) of the indexes left to rebuild."""
+    return conn.execute("SELECT name, definition FROM deferred_index ORDER BY name").fetchall()
+
+
+def rebuild_index(conn: psycopg.Connection, name: str, definition: str) -> None:
+    """Build a deferred index and forget it in the same transaction, so a crash never builds it twice."""
+    with conn.transaction():
+        conn.execute(definition)  # pyright: ignore[reportArgumentType]
+        conn.execute("DELETE FROM deferred_index WHERE name = %s", (name,))
+
+
+def restore_constraints(conn: psycopg.Connection) -> None:
+    """
+    Add the deferred foreign keys back as NOT VALID, which is instant, and forget them. They are
+    enforced for new rows from then on; validate_constraint checks the loaded rows.
+    """
+    with conn.transaction():
+        for table, name, definition in conn.execute("SELECT table_name, name, definition FROM deferred_constraint").fetchall():
+            conn.execute(sql.SQL("ALTER TABLE {} ADD CONSTRAINT {} {} NOT VALID").format(sql.Identifier(table), sql.Identifier(name), sql.SQL(definition)))
+        conn.execute("DELETE FROM deferred_constraint")
+
+
+def unvalidated_constraints(conn: psycopg.Connection) -> list[tuple[str, str]]:
+    """(table, name) of the foreign keys whose existing rows were not checked yet."""
+    return conn.execute(
+        """
+        SELECT rel.relname, con.conname
+        FROM pg_constraint con
+        JOIN pg_class rel ON rel.oid = con.conrelid
+        JOIN pg_namespace n ON n.oid = rel.relnamespace
+        WHERE n.nspname = 'public' AND con.contype = 'f' AND NOT con.convalidated
+        ORDER BY 1, 2
+        """
+    ).fetchall()
+
+
+def validate_constraint(conn: psycopg.Connection, table: str, name: str) -> None:
+    conn.execute(sql.SQL("ALTER TABLE {} VALIDATE CONSTRAINT {}").format(sql.Identifier(table), sql.Identifier(name)))
@@ -0,0 +1,95 @@
+from datetime import date
+from typing import Any
+
+import psycopg
+from psycopg.rows import DictRow
+from psycopg.types.json import Jsonb
+
+
+JOB_COLUMNS = "id, day, dataset, options, status, attempts, worker, created_at, started_at, heartbeat_at, finished_at, progress, result, error"
+
+
+def enqueue_jobs(cur: psycopg.Cursor[DictRow], day: date, datasets: list[str], options: dict[str, Any], unless_pending: bool = False) -> dict[str, int]:
+    """
+    Queue one job per dataset for the day and return their ids by dataset. With unless_pending set,
+    datasets that already have a queued or running job for the day are left out.
+    """
+    cur.execute(
+        """
+        INSERT INTO ingest_job (day, dataset, options)
+        SELECT %(day)s, dataset, %(options)s FROM unnest(%(datasets)s::text[]) WITH ORDINALITY AS d(dataset, n)
+        WHERE NOT %(unless_pending)s OR NOT EXISTS (
+            SELECT FROM ingest_job j WHERE j.day = %(day)s AND j.dataset = d.dataset AND j.status IN ('queued', 'running')
+        )
+        ORDER BY n
+        RETURNING dataset, id
+        """,
+        {"day": day, "options": Jsonb(options), "datasets": datasets, "unless_pending": unless_pending},
+    )
+    return {row["dataset"]: row["id"] for row in cur.fetchall()}
+
+
+def claim_job(cur: psycopg.Cursor[DictRow], worker: str, stale_seconds: float, max_attempts: int) -> DictRow | None:
+    """
+    Claim the oldest queued job, or a running one whose worker stopped sending heartbeats, and mark it
+    running for this worker. SKIP LOCKED lets any number of workers claim concurrently without waiting
+    on each other or claiming the same job. Abandoned jobs that ran out of attempts are failed instead.
+    """
+    cur.execute(
+        """
+        UPDATE ingest_job SET status = 'failed', finished_at = now(), error = 'Abandoned by its worker too often'
+        WHERE status = 'running' AND heartbeat_at < now() - make_interval(secs => %s) AND attempts >= %s
+        """,
+        (stale_seconds, max_attempts),
+    )
+    cur.execute(
+        f"""
+        UPDATE ingest_job SET status = 'running', worker = %(worker)s, attempts = attempts + 1,
+            started_at = now(), heartbeat_at = now(), progress = NULL, error = NULL
+        WHERE id = (
+            SELECT id FROM ingest_job
+            WHERE status = 'queued'
+                OR (status = 'running' AND heartbeat_at < now() - make_interval(secs => %(stale)s))
+            ORDER BY id
+            FOR UPDATE SKIP LOCKED
+            LIMIT 1
+        )
+        RETURNING {JOB_COLUMNS}
+        """,
+        {"worker": worker, "stale": stale_seconds},
+    )
+    return cur.fetchone()
+
+
+def heartbeat_job(cur: psycopg.Cursor[DictRow], job_id: int, worker: str, progress: dict[str, Any]) -> bool:
+    """Record a running job's progress. Returns False if the job is no longer this worker's."""
+    cur.execute(
+        "UPDATE ingest_job SET heartbeat_at = now(), progress = %s WHERE id = %s AND worker = %s AND status = 'running'",
+        (Jsonb(progress), job_id, worker),
+    )
+    return cur.rowcount == 1
+
+
+def finish_job(cur: psycopg.Cursor[DictRow], job_id: int, worker: str, progress: dict[str, Any], result: dict[str, Any] | None, error: str | None = None) -> None:
+    """Mark a job done with its final counts and report, or failed with its error."""
+    cur.execute(
+        """
+        UPDATE ingest_job SET status = %s, finished_at = now(), heartbeat_at = now(), progress = %s, result = %s, error = %s
+        WHERE id = %s AND worker = %s AND status = 'running'
+        """,
+        ("failed" if error else "done", Jsonb(progress), Jsonb(result) if result is not None else None, error, job_id, worker),
+    )
+
+
+def get_job(cur: psycopg.Cursor[DictRow], job_id: int) -> DictRow | None:
+    cur.execute(f"SELECT {JOB_COLUMNS} FROM ingest_job WHERE id = %s", (job_id,))
+    return cur.fetchone()
+
+
+def list_jobs(cur: psycopg.Cursor[DictRow], status: str | None = None, limit: int = 100) -> list[DictRow]:
+    """The most recent jobs, optionally only those with the given status."""
+    cur.execute(
+        f"SELECT {JOB_COLUMNS} FROM ingest_job WHERE %(status)s::text IS NULL OR status = %(status)s ORDER BY id DESC LIMIT %(limit)s",
+        {"status": status, "limit": limit},
+    )
+    return cur.fetchall()
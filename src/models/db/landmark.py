@@ -1,11 +1,15 @@
 from typing import ClassVar
 import psycopg
-from psycopg import sql
 from psycopg.rows import DictRow
-from pydantic import BaseModel
+from dataclasses import dataclass
+
+from .bulk import StagingColumns, StagingRows, merge_parent, skip_stored
+from .content import hash_content
+from .statements import ChildRows, UpsertStatement, WriteStats
 
     
-class Landmark(BaseModel):
+@dataclass(slots=True, kw_only=True)
+class Landmark:
     sources: ClassVar[list[str]] = ["CodexEntry", "ApproachSettlement"]
     primary_keys: ClassVar[list[str]] = ["EntryID", "AuxiliaryID"]
     EntryID: int | None
@@ -41,8 +45,10 @@ def create_landmark_tables() -> str:
         SubCategory TEXT,
         NearestDestination TEXT,
         VoucherAmount INT,
-        numTraits INT
+        numTraits INT,
+        content_hash BIGINT
     );
+    ALTER TABLE landmark ADD COLUMN IF NOT EXISTS content_hash BIGINT;
 
     -- Create unique constraint that handles nulls properly
     CREATE UNIQUE INDEX IF NOT EXISTS idx_landmark_unique_entries 
@@ -57,45 +63,97 @@ def create_landmark_tables() -> str:
     );
     """
 
-def upsert_landmark(conn: psycopg.Cursor[DictRow], landmark: Landmark) -> None:
-    """Upsert a landmark into the database, including its traits."""
+UPSERT_LANDMARK = UpsertStatement(
+    "landmark", Landmark, "(COALESCE(EntryID, -1), COALESCE(AuxiliaryID, ''))",
+    exclude={'Traits'}, keys=['EntryID', 'AuxiliaryID'], returning="id")
+LANDMARK_TRAITS = ChildRows("landmark_trait", ["landmark_id"], ["landmark_id", "Trait"])
+
+def upsert_landmark(conn: psycopg.Cursor[DictRow], landmark: Landmark, content_hash: int | None = None, stats: WriteStats | None = None) -> bool:
+    """Upsert a landmark into the database, including its traits. Returns False if the stored content was the same."""
     # Upsert the landmark
-    landmark_dict = landmark.model_dump(exclude={'Traits'})
-    
-    columns = list(landmark_dict.keys())
-    column_names = sql.SQL(', ').join([sql.SQL(col) for col in columns])
-    placeholders = sql.SQL(', ').join([sql.Placeholder()] * len(landmark_dict))
-    
-    # ON CONFLICT DO UPDATE
-    update_columns = sql.SQL(', ').join(
-        sql.SQL(k) + sql.SQL(" = EXCLUDED.") + sql.SQL(k) 
-        for k, v in landmark_dict.items() 
-        if k not in ['EntryID', 'AuxiliaryID'] and v is not None
-    )
-
-    query = sql.SQL("""
-        INSERT INTO landmark ({columns}) VALUES ({placeholders})
-        ON CONFLICT (COALESCE(EntryID, -1), COALESCE(AuxiliaryID, '')) DO UPDATE SET {update_columns}
-        RETURNING id
-    """).format(
-        columns=column_names,
-        placeholders=placeholders,
-        update_columns=update_columns
-    )
-    
-    conn.execute(query, tuple(landmark_dict.values()))
-    result = conn.fetchone()
-    landmark_id = result['id'] if result else None
+    result = UPSERT_LANDMARK.execute(conn, landmark, hash_content(landmark) if content_hash is None else content_hash, stats)
+    if result is None:
+        return False
+    landmark_id = result['id']
 
     # Insert traits
-    if landmark.Traits is not None and landmark_id is not None:
-        conn.execute("DELETE FROM landmark_trait WHERE landmark_id = %s;", (landmark_id,))
-        for trait in landmark.Traits:
-            conn.execute("""
-                INSERT INTO landmark_trait (landmark_id, Trait) 
-                VALUES (%s, %s)
-                ON CONFLICT (landmark_id, Trait) DO NOTHING
-            """, (landmark_id, trait))
+    if landmark.Traits is not None:
+        LANDMARK_TRAITS.replace(conn, (landmark_id,), ((landmark_id, trait) for trait in landmark.Traits))
+    return True
+
+LANDMARK_STAGING: StagingColumns = {
+    "stage_landmark": [
+        ("EntryID", "BIGINT"),
+        ("AuxiliaryID", "TEXT"),
+        ("SystemAddress", "BIGINT"),
+        ("BodyID", "INT"),
+        ("Latitude", "DOUBLE PRECISION"),
+        ("Longitude", "DOUBLE PRECISION"),
+        ("Name", "TEXT"),
+        ("Region", "TEXT"),
+        ("Category", "TEXT"),
+        ("SubCategory", "TEXT"),
+        ("NearestDestination", "TEXT"),
+        ("VoucherAmount", "INT"),
+        ("numTraits", "INT"),
+        ("hasTraits", "BOOLEAN"),
+        ("content_hash", "BIGINT"),
+    ],
+    "stage_landmark_trait": [
+        ("EntryID", "BIGINT"),
+        ("AuxiliaryID", "TEXT"),
+        ("Trait", "TEXT"),
+    ],
+}
+
+LANDMARK_COLUMNS = [name for name, _ in LANDMARK_STAGING["stage_landmark"] if name not in ("hasTraits", "content_hash")]
+
+
+def stage_landmark(rows: StagingRows, seq: int, landmark: Landmark, content_hash: int) -> None:
+    """Add a landmark and its traits to the staging rows of a bulk batch."""
+    rows["stage_landmark"].append((
+        seq,
+        *(getattr(landmark, c) for c in LANDMARK_COLUMNS),
+        landmark.Traits is not None,
+        content_hash,
+    ))
+    for trait in landmark.Traits or []:
+        rows["stage_landmark_trait"].append((seq, landmark.EntryID, landmark.AuxiliaryID, trait))
+
+
+def merge_landmark_statements() -> list[tuple[str, str]]:
+    """Set-based merge of the landmark staging tables, as (staging table, statement) pairs."""
+    # Traits reference the landmark's serial id, so they are matched through the unique key expression
+    latest_parents = """
+        SELECT EntryID, AuxiliaryID, max(seq) AS seq FROM stage_landmark WHERE hasTraits GROUP BY EntryID, AuxiliaryID
+    """
+    statements = [
+        *skip_stored(
+            "landmark", "stage_landmark", ["EntryID", "AuxiliaryID"], ["stage_landmark_trait"],
+            "COALESCE(t.EntryID, -1) = COALESCE(s.EntryID, -1) AND COALESCE(t.AuxiliaryID, '') = COALESCE(s.AuxiliaryID, '')"),
+        merge_parent(
+            "landmark", "stage_landmark", "(COALESCE(EntryID, -1), COALESCE(AuxiliaryID, ''))",
+            ["EntryID", "AuxiliaryID"], LANDMARK_COLUMNS[2:] + ["content_hash"]),
+        f"""
+        DELETE FROM landmark_trait t
+        USING landmark l, ({latest_parents}) p
+        WHERE t.landmark_id = l.id
+            AND COALESCE(l.EntryID, -1) = COALESCE(p.EntryID, -1)
+            AND COALESCE(l.AuxiliaryID, '') = COALESCE(p.AuxiliaryID, '')
+        """,
+        f"""
+        INSERT INTO landmark_trait (landmark_id, Trait)
+        SELECT l.id, t.Trait
+        FROM stage_landmark_trait t
+        JOIN ({latest_parents}) p ON t.seq = p.seq
+            AND t.EntryID IS NOT DISTINCT FROM p.EntryID
+            AND t.AuxiliaryID IS NOT DISTINCT FROM p.AuxiliaryID
+        JOIN landmark l ON COALESCE(l.EntryID, -1) = COALESCE(t.EntryID, -1)
+            AND COALESCE(l.AuxiliaryID, '') = COALESCE(t.AuxiliaryID, '')
+        ON CONFLICT (landmark_id, Trait) DO NOTHING
+        """,
+    ]
+    return [("stage_landmark", statement) for statement in statements]
 
 def get_landmark(conn: psycopg.Cursor[DictRow], entry_id: int | None, auxiliary_id: str | None) -> Landmark | None:
     """Retrieve a landmark by its entry ID and auxiliary ID."""
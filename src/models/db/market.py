@@ -1,10 +1,14 @@
 from typing import ClassVar, Literal
-from pydantic import BaseModel
+from dataclasses import dataclass
 import psycopg
-from psycopg import sql
 from psycopg.rows import DictRow
 
-class MarketCommodity(BaseModel):
+from .bulk import StagingColumns, StagingRows, merge_children, merge_parent, skip_stored
+from .content import hash_content
+from .statements import MergeChildRows, UpsertStatement, WriteStats
+
+@dataclass(slots=True, kw_only=True)
+class MarketCommodity:
     primary_keys: ClassVar[list[str]] = ["marketId", "name"]
     marketId: int # Market.marketId
     name: str # Market.commodities[]
@@ -15,8 +19,11 @@ class MarketCommodity(BaseModel):
     buyPrice: int
     sellPrice: int
 
-class Market(BaseModel):
+@dataclass(slots=True, kw_only=True)
+class Market:
     primary_keys: ClassVar[list[str]] = ["marketId"]
+    # Left out of the content hash, so a report that only repeats the stored content only updates these
+    content_exclude: ClassVar[set[str]] = {"timestamp"}
     timestamp: str # Market
     marketId: int # Market
     commodities: list[MarketCommodity] # Market
@@ -28,8 +35,10 @@ def create_market_tables() -> str:
     CREATE TABLE IF NOT EXISTS market (
         marketId BIGINT NOT NULL,
         timestamp TEXT NOT NULL,
+        content_hash BIGINT,
         PRIMARY KEY (marketId)
     );
+    ALTER TABLE market ADD COLUMN IF NOT EXISTS content_hash BIGINT;
 
     CREATE TABLE IF NOT EXISTS market_commodity (
         marketId BIGINT NOT NULL,
@@ -45,33 +54,68 @@ def create_market_tables() -> str:
     );
     """
 
-def upsert_market(conn: psycopg.Cursor[DictRow], market: Market) -> None:
-    """Upsert a market into the database, including its commodities."""
-    market_dict = market.model_dump(exclude={'commodities'})
-    columns = sql.SQL(', ').join(map(sql.SQL, market_dict.keys()))
-    placeholders = sql.SQL(', ').join([sql.Placeholder()] * len(market_dict))
-    update_columns = sql.SQL(', ').join(
-        sql.SQL("{} = EXCLUDED.{}" ).format(sql.SQL(k), sql.SQL(k)) for (k, v) in market_dict.items() if k != 'marketId' and v is not None
-    )
-    query = sql.SQL("""
-        INSERT INTO market ({columns}) VALUES ({placeholders})
-        ON CONFLICT (marketId) DO UPDATE SET {update_columns}
-    """).format(
-        columns=columns,
-        placeholders=placeholders,
-        update_columns=update_columns
-    )
-    conn.execute(query, tuple(market_dict.values()))
+UPSERT_MARKET = UpsertStatement("market", Market, "(marketId)", exclude={'commodities'}, keys=['marketId'])
+MARKET_COMMODITIES = MergeChildRows(
+    "market_commodity", ["marketId"], "name", ["marketId", "name", "category", "stock", "demand", "supply", "buyPrice", "sellPrice"])
+
+def upsert_market(conn: psycopg.Cursor[DictRow], market: Market, content_hash: int | None = None, stats: WriteStats | None = None) -> bool:
+    """Upsert a market into the database, including its commodities. Returns False if the stored content was the same."""
+    if UPSERT_MARKET.execute(conn, market, hash_content(market) if content_hash is None else content_hash, stats) is None:
+        return False
 
-    # Insert commodities
+    # Merge commodities, writing only the rows that changed
     if market.commodities is not None:
-        conn.execute("DELETE FROM market_commodity WHERE marketId = %s;", (market.marketId,))
-        for commodity in market.commodities:
-            conn.execute("""
-                INSERT INTO market_commodity (marketId, name, category, stock, demand, supply, buyPrice, sellPrice)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-                ON CONFLICT (marketId, name) DO NOTHING
-            """, (market.marketId, commodity.name, commodity.category, commodity.stock, commodity.demand, commodity.supply, commodity.buyPrice, commodity.sellPrice))
+        MARKET_COMMODITIES.merge(conn, (market.marketId,), (
+            (market.marketId, commodity.name, commodity.category, commodity.stock, commodity.demand, commodity.supply, commodity.buyPrice, commodity.sellPrice)
+            for commodity in market.commodities
+        ), stats)
+    return True
+
+MARKET_STAGING: StagingColumns = {
+    "stage_market": [
+        ("marketId", "BIGINT"),
+        ("timestamp", "TEXT"),
+        ("content_hash", "BIGINT"),
+    ],
+    "stage_market_commodity": [
+        ("marketId", "BIGINT"),
+        ("name", "TEXT"),
+        ("category", "TEXT"),
+        ("stock", "INT"),
+        ("demand", "INT"),
+        ("supply", "INT"),
+        ("buyPrice", "INT"),
+        ("sellPrice", "INT"),
+    ],
+}
+
+
+def stage_market(rows: StagingRows, seq: int, market: Market, content_hash: int) -> None:
+    """Add a market and its commodities to the staging rows of a bulk batch."""
+    rows["stage_market"].append((seq, market.marketId, market.timestamp, content_hash))
+    # The first commodity of a duplicated name wins, as in upsert_market
+    unique: dict[str, MarketCommodity] = {}
+    for commodity in market.commodities:
+        unique.setdefault(commodity.name, commodity)
+    for commodity in unique.values():
+        rows["stage_market_commodity"].append((
+            seq, market.marketId, commodity.name, commodity.category, commodity.stock,
+            commodity.demand, commodity.supply, commodity.buyPrice, commodity.sellPrice,
+        ))
+
+
+def merge_market_statements() -> list[tuple[str, str]]:
+    """Set-based merge of the market staging tables, as (staging table, statement) pairs."""
+    keys = ["marketId"]
+    statements = [
+        *skip_stored("market", "stage_market", keys, ["stage_market_commodity"]),
+        merge_parent("market", "stage_market", "(marketId)", keys, ["timestamp", "content_hash"]),
+        *merge_children(
+            "stage_market", keys,
+            "market_commodity", "stage_market_commodity", "name",
+            ["marketId", "name", "category", "stock", "demand", "supply", "buyPrice", "sellPrice"]),
+    ]
+    return [("stage_market", statement) for statement in statements]
 
 def get_market(conn: psycopg.Cursor[DictRow], market_id: int) -> Market | None:
     """Retrieve a market by its marketId."""
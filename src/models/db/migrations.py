@@ -0,0 +1,472 @@
+from typing import NamedTuple
+
+
+class Migration(NamedTuple):
+    """
+    One step of the schema. Statements run in one transaction; indexes, given as (name, definition),
+    are built afterwards with CREATE INDEX CONCURRENTLY, so building them never blocks ingestion.
+    Migrations must be idempotent (IF NOT EXISTS), as an interrupted one is run again from the start.
+    """
+    version: int
+    name: str
+    statements: list[str]
+    indexes: list[tuple[str, str]] = []
+
+
+# The schema of a new database when migrations were introduced. Written out rather than taken from the
+# create_*_tables functions of the models, which describe the current schema, so that it never changes
+# once applied
+INITIAL_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS ingestion_lock (
+        model_name TEXT NOT NULL,
+        primary_key TEXT NOT NULL,
+        event TEXT NOT NULL,
+        timestamp TIMESTAMPTZ NOT NULL,
+        PRIMARY KEY (model_name, primary_key, event)
+    );
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS ingest_job (
+        id BIGSERIAL PRIMARY KEY,
+        day DATE NOT NULL,
+        dataset TEXT NOT NULL,
+        options JSONB NOT NULL DEFAULT '{}',
+        status TEXT NOT NULL DEFAULT 'queued',
+        attempts INT NOT NULL DEFAULT 0,
+        worker TEXT,
+        created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+        started_at TIMESTAMPTZ,
+        heartbeat_at TIMESTAMPTZ,
+        finished_at TIMESTAMPTZ,
+        progress JSONB,
+        result JSONB,
+        error TEXT
+    );
+    CREATE INDEX IF NOT EXISTS ingest_job_claim_idx ON ingest_job (id) WHERE status IN ('queued', 'running');
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS ingest_checkpoint (
+        day DATE NOT NULL,
+        file TEXT NOT NULL,
+        lines BIGINT NOT NULL,
+        updated_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+        PRIMARY KEY (day, file)
+    );
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS system (
+        SystemAddress BIGINT NOT NULL,
+        StarPos vector(3) NOT NULL,
+        StarSystem TEXT NOT NULL,
+        PrimaryBodyID BIGINT,
+        PrimaryBodyType TEXT,
+        PrimaryBodyName TEXT,
+        Population BIGINT,
+        Allegiance TEXT,
+        Economy TEXT,
+        SecondEconomy TEXT,
+        FactionName TEXT,
+        FactionState TEXT,
+        Security TEXT,
+        PowerplayState TEXT,
+        Government TEXT,
+        numPowers INT,
+        numFactions INT,
+        numConflicts INT,
+        content_hash BIGINT,
+        PRIMARY KEY (SystemAddress)
+    );
+
+    -- Create HNSW index for vector search on StarPos
+    CREATE INDEX IF NOT EXISTS idx_system_star_pos
+        ON system USING hnsw
+        (StarPos vector_l2_ops);
+    -- Create B-tree index for text search on StarSystem
+    CREATE INDEX IF NOT EXISTS idx_system_star_system
+        ON system USING btree
+        (StarSystem COLLATE pg_catalog."default" ASC NULLS LAST);
+
+
+    CREATE TABLE IF NOT EXISTS system_power (
+        SystemAddress BIGINT NOT NULL,
+        Power TEXT NOT NULL,
+        PRIMARY KEY (SystemAddress, Power),
+        FOREIGN KEY (SystemAddress) REFERENCES system (SystemAddress) ON DELETE CASCADE
+    );
+
+    CREATE TABLE IF NOT EXISTS system_faction (
+        SystemAddress BIGINT NOT NULL,
+        Name TEXT NOT NULL,
+        Influence DOUBLE PRECISION NOT NULL,
+        Happiness TEXT NOT NULL,
+        Allegiance TEXT NOT NULL,
+        SquadronFaction BOOLEAN,
+        FactionState TEXT NOT NULL,
+        Government TEXT NOT NULL,
+        PRIMARY KEY (SystemAddress, Name),
+        FOREIGN KEY (SystemAddress) REFERENCES system (SystemAddress) ON DELETE CASCADE
+    );
+
+    CREATE TABLE IF NOT EXISTS system_faction_state (
+        SystemAddress BIGINT NOT NULL,
+        FactionName TEXT NOT NULL,
+        Type TEXT NOT NULL,
+        State TEXT NOT NULL,
+        Trend INT NOT NULL,
+        PRIMARY KEY (SystemAddress, FactionName, Type, State),
+        FOREIGN KEY (SystemAddress, FactionName) REFERENCES system_faction (SystemAddress, Name) ON DELETE CASCADE
+    );
+
+    CREATE TABLE IF NOT EXISTS system_conflict (
+        SystemAddress BIGINT NOT NULL,
+        Status TEXT NOT NULL,
+        WarType TEXT NOT NULL,
+        Faction1Name TEXT NOT NULL,
+        Faction1Stake TEXT NOT NULL,
+        Faction1WonDays INT NOT NULL,
+        Faction2Name TEXT NOT NULL,
+        Faction2Stake TEXT NOT NULL,
+        Faction2WonDays INT NOT NULL,
+        PRIMARY KEY (SystemAddress, Faction1Name, Faction2Name),
+        FOREIGN KEY (SystemAddress) REFERENCES system (SystemAddress) ON DELETE CASCADE
+    );
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS body (
+        SystemAddress BIGINT NOT NULL,
+        BodyID INT NOT NULL,
+        BodyType TEXT NOT NULL,
+        BodyName TEXT NOT NULL,
+        DistanceFromArrivalLS DOUBLE PRECISION,
+        MeanAnomaly DOUBLE PRECISION,
+        Eccentricity DOUBLE PRECISION,
+        AscendingNode DOUBLE PRECISION,
+        Periapsis DOUBLE PRECISION,
+        SemiMajorAxis DOUBLE PRECISION,
+        OrbitalPeriod DOUBLE PRECISION,
+        OrbitalInclination DOUBLE PRECISION,
+        TidalLock BOOLEAN,
+        RotationPeriod DOUBLE PRECISION,
+        AxialTilt DOUBLE PRECISION,
+        Radius DOUBLE PRECISION,
+        MassEM DOUBLE PRECISION,
+        StellarMass DOUBLE PRECISION,
+        Age_MY INT,
+        StarType TEXT,
+        PlanetClass TEXT,
+        Subclass INT,
+        Parent INT,
+        AtmosphereType TEXT,
+        AbsoluteMagnitude DOUBLE PRECISION,
+        Luminosity TEXT,
+        SurfaceTemperature DOUBLE PRECISION,
+        SurfaceGravity DOUBLE PRECISION,
+        SurfacePressure DOUBLE PRECISION,
+        Volcanism TEXT,
+        TerraformState TEXT,
+        Landable BOOLEAN,
+        Atmosphere TEXT,
+        ReserveLevel TEXT,
+        CompositionIce DOUBLE PRECISION,
+        CompositionMetal DOUBLE PRECISION,
+        CompositionRock DOUBLE PRECISION,
+        numMaterials INT,
+        numAtmosphereComposition INT,
+        numRings INT,
+        content_hash BIGINT,
+        PRIMARY KEY (SystemAddress, BodyID)
+    );
+
+    CREATE TABLE IF NOT EXISTS body_atmosphere_composition (
+        SystemAddress BIGINT NOT NULL,
+        BodyID INT NOT NULL,
+        Name TEXT NOT NULL,
+        Percent DOUBLE PRECISION NOT NULL,
+        PRIMARY KEY (SystemAddress, BodyID, Name),
+        FOREIGN KEY (SystemAddress, BodyID) REFERENCES body (SystemAddress, BodyID) ON DELETE CASCADE
+    );
+
+    CREATE TABLE IF NOT EXISTS body_material (
+        SystemAddress BIGINT NOT NULL,
+        BodyID INT NOT NULL,
+        Name TEXT NOT NULL,
+        Percent DOUBLE PRECISION NOT NULL,
+        PRIMARY KEY (SystemAddress, BodyID, Name),
+        FOREIGN KEY (SystemAddress, BodyID) REFERENCES body (SystemAddress, BodyID) ON DELETE CASCADE
+    );
+
+    CREATE TABLE IF NOT EXISTS body_ring (
+        SystemAddress BIGINT NOT NULL,
+        BodyID INT NOT NULL,
+        Name TEXT NOT NULL,
+        OuterRad DOUBLE PRECISION NOT NULL,
+        InnerRad DOUBLE PRECISION NOT NULL,
+        RingClass TEXT NOT NULL,
+        MassMT DOUBLE PRECISION NOT NULL,
+        PRIMARY KEY (SystemAddress, BodyID, Name),
+        FOREIGN KEY (SystemAddress, BodyID) REFERENCES body (SystemAddress, BodyID) ON DELETE CASCADE
+    );
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS station (
+        MarketID BIGINT NOT NULL,
+        SystemAddress BIGINT NOT NULL,
+        StationName TEXT NOT NULL,
+        StationType TEXT NOT NULL,
+        BodyID BIGINT,
+        Latitude DOUBLE PRECISION,
+        Longitude DOUBLE PRECISION,
+        DistFromStarLS DOUBLE PRECISION,
+        StationGovernment TEXT,
+        StationAllegiance TEXT,
+        StationFactionName TEXT,
+        StationFactionState TEXT,
+        StationEconomy TEXT,
+        StationState TEXT,
+        numStationServices INT,
+        numStationEconomies INT,
+        LandingPadsLarge INT,
+        LandingPadsMedium INT,
+        LandingPadsSmall INT,
+        content_hash BIGINT,
+        PRIMARY KEY (MarketID)
+    );
+
+    CREATE TABLE IF NOT EXISTS station_economy (
+        MarketID BIGINT NOT NULL,
+        Name TEXT NOT NULL,
+        Proportion DOUBLE PRECISION NOT NULL,
+        PRIMARY KEY (MarketID, Name),
+        FOREIGN KEY (MarketID) REFERENCES station (MarketID) ON DELETE CASCADE
+    );
+
+    CREATE TABLE IF NOT EXISTS station_service (
+        MarketID BIGINT NOT NULL,
+        Name TEXT NOT NULL,
+        PRIMARY KEY (MarketID, Name),
+        FOREIGN KEY (MarketID) REFERENCES station (MarketID) ON DELETE CASCADE
+    );
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS landmark (
+        id SERIAL PRIMARY KEY,
+        EntryID BIGINT,
+        AuxiliaryID TEXT,
+        SystemAddress BIGINT NOT NULL,
+        BodyID INT NOT NULL,
+        Latitude DOUBLE PRECISION NOT NULL,
+        Longitude DOUBLE PRECISION NOT NULL,
+        Name TEXT NOT NULL,
+        Region TEXT,
+        Category TEXT,
+        SubCategory TEXT,
+        NearestDestination TEXT,
+        VoucherAmount INT,
+        numTraits INT,
+        content_hash BIGINT
+    );
+
+    -- Create unique constraint that handles nulls properly
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_landmark_unique_entries
+    ON landmark (COALESCE(EntryID, -1), COALESCE(AuxiliaryID, ''));
+
+    CREATE TABLE IF NOT EXISTS landmark_trait (
+        id SERIAL PRIMARY KEY,
+        landmark_id INT NOT NULL,
+        Trait TEXT NOT NULL,
+        UNIQUE (landmark_id, Trait),
+        FOREIGN KEY (landmark_id) REFERENCES landmark (id) ON DELETE CASCADE
+    );
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS market (
+        marketId BIGINT NOT NULL,
+        timestamp TEXT NOT NULL,
+        content_hash BIGINT,
+        PRIMARY KEY (marketId)
+    );
+
+    CREATE TABLE IF NOT EXISTS market_commodity (
+        marketId BIGINT NOT NULL,
+        name TEXT NOT NULL,
+        category TEXT,
+        stock INT,
+        demand INT,
+        supply INT,
+        buyPrice INT,
+        sellPrice INT,
+        PRIMARY KEY (marketId, name),
+        FOREIGN KEY (marketId) REFERENCES market (marketId) ON DELETE CASCADE
+    );
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS shipyard (
+        marketId BIGINT NOT NULL,
+        timestamp TEXT NOT NULL,
+        numShips INT NOT NULL,
+        content_hash BIGINT,
+        PRIMARY KEY (marketId)
+    );
+
+    CREATE TABLE IF NOT EXISTS shipyard_ship (
+        marketId BIGINT NOT NULL,
+        name TEXT NOT NULL,
+        PRIMARY KEY (marketId, name),
+        FOREIGN KEY (marketId) REFERENCES shipyard (marketId) ON DELETE CASCADE
+    );
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS outfitting (
+        marketId BIGINT NOT NULL,
+        timestamp TEXT NOT NULL,
+        numItems INT NOT NULL,
+        content_hash BIGINT,
+        PRIMARY KEY (marketId)
+    );
+
+    CREATE TABLE IF NOT EXISTS outfitting_item (
+        marketId BIGINT NOT NULL,
+        name TEXT NOT NULL,
+        PRIMARY KEY (marketId, name),
+        FOREIGN KEY (marketId) REFERENCES outfitting (marketId) ON DELETE CASCADE
+    );
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS signal (
+        id SERIAL PRIMARY KEY,
+        SystemAddress BIGINT NOT NULL,
+        BodyID BIGINT,
+        Type TEXT NOT NULL,
+        Count INT NOT NULL,
+        SignalName TEXT,
+        content_hash BIGINT
+    );
+
+    -- Create unique constraint that handles nulls properly
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_signal_unique_entries
+    ON signal (SystemAddress, COALESCE(BodyID, -1), Type, COALESCE(SignalName, ''));
+    """,
+]
+
+# Where an initial load records the indexes and constraints it dropped, to restore them afterwards
+DEFERRED_TABLES = [
+    """
+    CREATE TABLE IF NOT EXISTS deferred_index (
+        name TEXT PRIMARY KEY,
+        table_name TEXT NOT NULL,
+        definition TEXT NOT NULL
+    );
+
+    CREATE TABLE IF NOT EXISTS deferred_constraint (
+        table_name TEXT NOT NULL,
+        name TEXT NOT NULL,
+        definition TEXT NOT NULL,
+        PRIMARY KEY (table_name, name)
+    );
+    """,
+]
+
+# Before migrations, ingestion_lock keys were JSON objects of the key values with sorted field names,
+# e.g. {"BodyID": 14, "SystemAddress": 2870514583017}. They are rewritten as the JSON arrays in
+# `primary_keys` order that ingestion_lock_key writes now, so the freshness of what is stored carries over
+ENCODE_LEGACY_LOCK_KEYS = [
+    """
+    INSERT INTO ingestion_lock (model_name, primary_key, event, timestamp)
+    SELECT model_name, CASE model_name
+        WHEN 'system' THEN jsonb_build_array(k->'SystemAddress')
+        WHEN 'station' THEN jsonb_build_array(k->'MarketID')
+        WHEN 'body' THEN jsonb_build_array(k->'SystemAddress', k->'BodyID')
+        WHEN 'landmark' THEN jsonb_build_array(k->'EntryID', k->'AuxiliaryID')
+        WHEN 'market' THEN jsonb_build_array(k->'marketId')
+        WHEN 'shipyard' THEN jsonb_build_array(k->'marketId')
+        WHEN 'outfitting' THEN jsonb_build_array(k->'marketId')
+        WHEN 'signal' THEN jsonb_build_array(k->'SystemAddress', k->'BodyID', k->'Type', k->'SignalName')
+    END::text, event, timestamp
+    FROM (
+        SELECT model_name, event, timestamp, CASE WHEN primary_key LIKE '{%' THEN primary_key::jsonb END AS k
+        FROM ingestion_lock
+        WHERE primary_key LIKE '{%'
+            AND model_name IN ('system', 'station', 'body', 'landmark', 'market', 'shipyard', 'outfitting', 'signal')
+    ) legacy
+    ON CONFLICT (model_name, primary_key, event) DO UPDATE SET timestamp = GREATEST(ingestion_lock.timestamp, EXCLUDED.timestamp)
+    """,
+    "DELETE FROM ingestion_lock WHERE primary_key LIKE '{%'",
+]
+
+# Databases created before migrations existed (by the create_*_tables functions at every start) store ingestion_lock
+# timestamps as text and keys as JSON objects, hold one "__lock__" row per key that the old per-row
+# locking used as a sentinel, and lack content_hash. Migration 1 leaves their tables as they are, since
+# it only creates what is missing; this brings them to the schema it describes, and changes nothing in
+# a database it created
+ADOPT_LEGACY_SCHEMA = [
+    "DELETE FROM ingestion_lock WHERE event = '__lock__'",
+    # A no-op, without rewriting the table, when the column already is a timestamptz
+    "ALTER TABLE ingestion_lock ALTER COLUMN timestamp TYPE timestamptz USING timestamp::timestamptz",
+    *ENCODE_LEGACY_LOCK_KEYS,
+    "ALTER TABLE system ADD COLUMN IF NOT EXISTS content_hash BIGINT",
+    "ALTER TABLE body ADD COLUMN IF NOT EXISTS content_hash BIGINT",
+    "ALTER TABLE station ADD COLUMN IF NOT EXISTS content_hash BIGINT",
+    "ALTER TABLE landmark ADD COLUMN IF NOT EXISTS content_hash BIGINT",
+    "ALTER TABLE market ADD COLUMN IF NOT EXISTS content_hash BIGINT",
+    "ALTER TABLE shipyard ADD COLUMN IF NOT EXISTS content_hash BIGINT",
+    "ALTER TABLE outfitting ADD COLUMN IF NOT EXISTS content_hash BIGINT",
+    "ALTER TABLE signal ADD COLUMN IF NOT EXISTS content_hash BIGINT",
+]
+
+
+# ingestion_lock keys written as the key values joined by "|" (None as an empty value) are rewritten as
+# the JSON arrays ingestion_lock_key writes now. Every key but the last text one is a number or empty,
+# so the last text key takes all that follows its predecessors, "|" included
+ENCODE_PIPE_LOCK_KEYS = [
+    """
+    INSERT INTO ingestion_lock (model_name, primary_key, event, timestamp)
+    SELECT model_name, key::text, event, timestamp FROM (
+        SELECT model_name, event, timestamp, CASE model_name
+            WHEN 'system' THEN jsonb_build_array(NULLIF(p[1], '')::bigint)
+            WHEN 'station' THEN jsonb_build_array(NULLIF(p[1], '')::bigint)
+            WHEN 'body' THEN jsonb_build_array(NULLIF(p[1], '')::bigint, NULLIF(p[2], '')::bigint)
+            WHEN 'landmark' THEN jsonb_build_array(NULLIF(p[1], '')::bigint, NULLIF(array_to_string(p[2:], '|'), ''))
+            WHEN 'market' THEN jsonb_build_array(NULLIF(p[1], '')::bigint)
+            WHEN 'shipyard' THEN jsonb_build_array(NULLIF(p[1], '')::bigint)
+            WHEN 'outfitting' THEN jsonb_build_array(NULLIF(p[1], '')::bigint)
+            WHEN 'signal' THEN jsonb_build_array(NULLIF(p[1], '')::bigint, NULLIF(p[2], '')::bigint, p[3], NULLIF(array_to_string(p[4:], '|'), ''))
+        END AS key
+        FROM ingestion_lock, string_to_array(primary_key, '|') AS p
+        WHERE primary_key NOT LIKE '[%' AND primary_key NOT LIKE '{%'
+            AND model_name IN ('system', 'station', 'body', 'landmark', 'market', 'shipyard', 'outfitting', 'signal')
+    ) piped
+    ON CONFLICT (model_name, primary_key, event) DO UPDATE SET timestamp = GREATEST(ingestion_lock.timestamp, EXCLUDED.timestamp)
+    """,
+    "DELETE FROM ingestion_lock WHERE primary_key NOT LIKE '[%' AND primary_key NOT LIKE '{%'",
+]
+
+# Applied in order, each once per database (see Database.migrate), and the only place the schema is
+# created. Applied migrations are never edited: schema changes are appended as new migrations, written
+# out as SQL, and also made to the create_*_tables functions of the models, which describe their current
+# tables and which bench/upsert uses to create the tables it needs.
+MIGRATIONS: list[Migration] = [
+    Migration(1, "Initial schema", INITIAL_SCHEMA),
+    # Warming the timestamp cache reads the most recent days of ingestion_lock
+    Migration(2, "Index ingestion_lock by timestamp", [], [
+        ("idx_ingestion_lock_timestamp", "ON ingestion_lock (timestamp)"),
+    ]),
+    Migration(3, "Track what an initial load deferred", DEFERRED_TABLES),
+    Migration(4, "Adopt databases created before migrations", ADOPT_LEGACY_SCHEMA),
+    # Tail runs skip archives that did not change and resume decompressing the others at their last block
+    Migration(5, "Track the archive a checkpoint was taken of", [
+        """
+    ALTER TABLE ingest_checkpoint
+        ADD COLUMN IF NOT EXISTS archive_etag TEXT,
+        ADD COLUMN IF NOT EXISTS archive_size BIGINT,
+        ADD COLUMN IF NOT EXISTS block_bit BIGINT,
+        ADD COLUMN IF NOT EXISTS block_crc BIGINT,
+        ADD COLUMN IF NOT EXISTS block_skip INT,
+        ADD COLUMN IF NOT EXISTS block_lines BIGINT;
+        """,
+    ]),
+    # Joined with "|", keys holding "|" or an empty value could stand for two different entities
+    Migration(6, "Encode ingestion_lock keys as JSON arrays", ENCODE_PIPE_LOCK_KEYS),
+    # For databases that migration 4 adopted before it rewrote their legacy keys
+    Migration(7, "Encode legacy ingestion_lock keys as JSON arrays", ENCODE_LEGACY_LOCK_KEYS),
+]
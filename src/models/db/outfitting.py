@@ -1,13 +1,21 @@
 from typing import ClassVar
-from pydantic import BaseModel
+from dataclasses import dataclass
 
-class OutfittingItem(BaseModel):
+from .bulk import StagingColumns, StagingRows, merge_parent, replace_children, skip_stored
+from .content import hash_content
+from .statements import ChildRows, UpsertStatement, WriteStats
+
+@dataclass(slots=True, kw_only=True)
+class OutfittingItem:
     primary_keys: ClassVar[list[str]] = ["marketId", "name"]
     marketId: int
     name: str
 
-class Outfitting(BaseModel):
+@dataclass(slots=True, kw_only=True)
+class Outfitting:
     primary_keys: ClassVar[list[str]] = ["marketId"]
+    # Left out of the content hash, so a report that only repeats the stored content only updates these
+    content_exclude: ClassVar[set[str]] = {"timestamp"}
     timestamp: str
     marketId: int
     numItems: int
@@ -20,8 +28,10 @@ def create_outfitting_tables() -> str:
         marketId BIGINT NOT NULL,
         timestamp TEXT NOT NULL,
         numItems INT NOT NULL,
+        content_hash BIGINT,
         PRIMARY KEY (marketId)
     );
+    ALTER TABLE outfitting ADD COLUMN IF NOT EXISTS content_hash BIGINT;
 
     CREATE TABLE IF NOT EXISTS outfitting_item (
         marketId BIGINT NOT NULL,
@@ -31,27 +41,49 @@ def create_outfitting_tables() -> str:
     );
     """
 
-def upsert_outfitting(conn, outfitting: Outfitting) -> None:
-    """Upsert an outfitting into the database, including its items."""
-    outfitting_dict = outfitting.model_dump(exclude={'items'})
-    columns = ', '.join(outfitting_dict.keys())
-    placeholders = ', '.join(['%s'] * len(outfitting_dict))
-    update_columns = ', '.join(f"{k} = EXCLUDED.{k}" for k in outfitting_dict.keys() if k != 'marketId')
-    query = f"""
-        INSERT INTO outfitting ({columns}) VALUES ({placeholders})
-        ON CONFLICT (marketId) DO UPDATE SET {update_columns}
-    """
-    conn.execute(query, tuple(outfitting_dict.values()))
+UPSERT_OUTFITTING = UpsertStatement("outfitting", Outfitting, "(marketId)", exclude={'items'}, keys=['marketId'], update_nulls=True)
+OUTFITTING_ITEMS = ChildRows("outfitting_item", ["marketId"], ["marketId", "name"])
+
+def upsert_outfitting(conn, outfitting: Outfitting, content_hash: int | None = None, stats: WriteStats | None = None) -> bool:
+    """Upsert an outfitting into the database, including its items. Returns False if the stored content was the same."""
+    if UPSERT_OUTFITTING.execute(conn, outfitting, hash_content(outfitting) if content_hash is None else content_hash, stats) is None:
+        return False
 
     # Insert items
     if outfitting.items is not None:
-        conn.execute("DELETE FROM outfitting_item WHERE marketId = %s;", (outfitting.marketId,))
-        for item in outfitting.items:
-            conn.execute("""
-                INSERT INTO outfitting_item (marketId, name)
-                VALUES (%s, %s)
-                ON CONFLICT (marketId, name) DO NOTHING
-            """, (outfitting.marketId, item.name))
+        OUTFITTING_ITEMS.replace(conn, (outfitting.marketId,), ((outfitting.marketId, item.name) for item in outfitting.items))
+    return True
+
+OUTFITTING_STAGING: StagingColumns = {
+    "stage_outfitting": [
+        ("marketId", "BIGINT"),
+        ("timestamp", "TEXT"),
+        ("numItems", "INT"),
+        ("content_hash", "BIGINT"),
+    ],
+    "stage_outfitting_item": [
+        ("marketId", "BIGINT"),
+        ("name", "TEXT"),
+    ],
+}
+
+
+def stage_outfitting(rows: StagingRows, seq: int, outfitting: Outfitting, content_hash: int) -> None:
+    """Add a outfitting and its items to the staging rows of a bulk batch."""
+    rows["stage_outfitting"].append((seq, outfitting.marketId, outfitting.timestamp, outfitting.numItems, content_hash))
+    for item in outfitting.items:
+        rows["stage_outfitting_item"].append((seq, outfitting.marketId, item.name))
+
+
+def merge_outfitting_statements() -> list[tuple[str, str]]:
+    """Set-based merge of the outfitting staging tables, as (staging table, statement) pairs."""
+    keys = ["marketId"]
+    statements = [
+        *skip_stored("outfitting", "stage_outfitting", keys, ["stage_outfitting_item"]),
+        merge_parent("outfitting", "stage_outfitting", "(marketId)", keys, ["timestamp", "numItems", "content_hash"]),
+        *replace_children("stage_outfitting", "TRUE", keys, "outfitting_item", "stage_outfitting_item", ["marketId", "name"]),
+    ]
+    return [("stage_outfitting", statement) for statement in statements]
 
 def get_outfitting(conn, market_id: int) -> Outfitting | None:
     """Retrieve an outfitting by its marketId."""
@@ -1,13 +1,21 @@
 from typing import ClassVar
-from pydantic import BaseModel
+from dataclasses import dataclass
 
-class ShipyardShip(BaseModel):
+from .bulk import StagingColumns, StagingRows, merge_parent, replace_children, skip_stored
+from .content import hash_content
+from .statements import ChildRows, UpsertStatement, WriteStats
+
+@dataclass(slots=True, kw_only=True)
+class ShipyardShip:
     primary_keys: ClassVar[list[str]] = ["marketId", "name"]
     marketId: int
     name: str
 
-class Shipyard(BaseModel):
+@dataclass(slots=True, kw_only=True)
+class Shipyard:
     primary_keys: ClassVar[list[str]] = ["marketId"]
+    # Left out of the content hash, so a report that only repeats the stored content only updates these
+    content_exclude: ClassVar[set[str]] = {"timestamp"}
     timestamp: str
     marketId: int
     numShips: int
@@ -20,8 +28,10 @@ def create_shipyard_tables() -> str:
         marketId BIGINT NOT NULL,
         timestamp TEXT NOT NULL,
         numShips INT NOT NULL,
+        content_hash BIGINT,
         PRIMARY KEY (marketId)
     );
+    ALTER TABLE shipyard ADD COLUMN IF NOT EXISTS content_hash BIGINT;
 
     CREATE TABLE IF NOT EXISTS shipyard_ship (
         marketId BIGINT NOT NULL,
@@ -31,27 +41,49 @@ def create_shipyard_tables() -> str:
     );
     """
 
-def upsert_shipyard(conn, shipyard: Shipyard) -> None:
-    """Upsert a shipyard into the database, including its ships."""
-    shipyard_dict = shipyard.model_dump(exclude={'ships'})
-    columns = ', '.join(shipyard_dict.keys())
-    placeholders = ', '.join(['%s'] * len(shipyard_dict))
-    update_columns = ', '.join(f"{k} = EXCLUDED.{k}" for k in shipyard_dict.keys() if k != 'marketId')
-    query = f"""
-        INSERT INTO shipyard ({columns}) VALUES ({placeholders})
-        ON CONFLICT (marketId) DO UPDATE SET {update_columns}
-    """
-    conn.execute(query, tuple(shipyard_dict.values()))
+UPSERT_SHIPYARD = UpsertStatement("shipyard", Shipyard, "(marketId)", exclude={'ships'}, keys=['marketId'], update_nulls=True)
+SHIPYARD_SHIPS = ChildRows("shipyard_ship", ["marketId"], ["marketId", "name"])
+
+def upsert_shipyard(conn, shipyard: Shipyard, content_hash: int | None = None, stats: WriteStats | None = None) -> bool:
+    """Upsert a shipyard into the database, including its ships. Returns False if the stored content was the same."""
+    if UPSERT_SHIPYARD.execute(conn, shipyard, hash_content(shipyard) if content_hash is None else content_hash, stats) is None:
+        return False
 
     # Insert ships
     if shipyard.ships is not None:
-        conn.execute("DELETE FROM shipyard_ship WHERE marketId = %s;", (shipyard.marketId,))
-        for ship in shipyard.ships:
-            conn.execute("""
-                INSERT INTO shipyard_ship (marketId, name)
-                VALUES (%s, %s)
-                ON CONFLICT (marketId, name) DO NOTHING
-            """, (shipyard.marketId, ship.name))
+        SHIPYARD_SHIPS.replace(conn, (shipyard.marketId,), ((shipyard.marketId, ship.name) for ship in shipyard.ships))
+    return True
+
+SHIPYARD_STAGING: StagingColumns = {
+    "stage_shipyard": [
+        ("marketId", "BIGINT"),
+        ("timestamp", "TEXT"),
+        ("numShips", "INT"),
+        ("content_hash", "BIGINT"),
+    ],
+    "stage_shipyard_ship": [
+        ("marketId", "BIGINT"),
+        ("name", "TEXT"),
+    ],
+}
+
+
+def stage_shipyard(rows: StagingRows, seq: int, shipyard: Shipyard, content_hash: int) -> None:
+    """Add a shipyard and its ships to the staging rows of a bulk batch."""
+    rows["stage_shipyard"].append((seq, shipyard.marketId, shipyard.timestamp, shipyard.numShips, content_hash))
+    for ship in shipyard.ships:
+        rows["stage_shipyard_ship"].append((seq, shipyard.marketId, ship.name))
+
+
+def merge_shipyard_statements() -> list[tuple[str, str]]:
+    """Set-based merge of the shipyard staging tables, as (staging table, statement) pairs."""
+    keys = ["marketId"]
+    statements = [
+        *skip_stored("shipyard", "stage_shipyard", keys, ["stage_shipyard_ship"]),
+        merge_parent("shipyard", "stage_shipyard", "(marketId)", keys, ["timestamp", "numShips", "content_hash"]),
+        *replace_children("stage_shipyard", "TRUE", keys, "shipyard_ship", "stage_shipyard_ship", ["marketId", "name"]),
+    ]
+    return [("stage_shipyard", statement) for statement in statements]
 
 def get_shipyard(conn, market_id: int) -> Shipyard | None:
     """Retrieve a shipyard by its marketId."""
@@ -1,11 +1,15 @@
 from typing import ClassVar
 import psycopg
-from psycopg import sql
 from psycopg.rows import DictRow
-from pydantic import BaseModel
+from dataclasses import dataclass
+
+from .bulk import StagingColumns, StagingRows, merge_parent, skip_stored
+from .content import hash_content
+from .statements import UpsertStatement, WriteStats
 
     
-class Signal(BaseModel):
+@dataclass(slots=True, kw_only=True)
+class Signal:
     sources: ClassVar[list[str]] = ["SAASignals", "FSSBodySignals", "FSSSignalDiscovered"]
     primary_keys: ClassVar[list[str]] = ["SystemAddress", "BodyID", "Type", "SignalName"]
     SystemAddress: int
@@ -23,8 +27,10 @@ def create_signal_tables() -> str:
         BodyID BIGINT,
         Type TEXT NOT NULL,
         Count INT NOT NULL,
-        SignalName TEXT
+        SignalName TEXT,
+        content_hash BIGINT
     );
+    ALTER TABLE signal ADD COLUMN IF NOT EXISTS content_hash BIGINT;
 
     -- Create unique constraint that handles nulls properly
     DROP INDEX IF EXISTS idx_signal_unique_entries;
@@ -32,35 +38,45 @@ def create_signal_tables() -> str:
     ON signal (SystemAddress, COALESCE(BodyID, -1), Type, COALESCE(SignalName, ''));
     """
 
-def upsert_signal(conn: psycopg.Cursor[DictRow], signal: Signal) -> None:
-    """Upsert a signal into the database."""
+UPSERT_SIGNAL = UpsertStatement(
+    "signal", Signal, "(SystemAddress, COALESCE(BodyID, -1), Type, COALESCE(SignalName, ''))",
+    keys=['SystemAddress', 'BodyID', 'Type', 'SignalName'])
+
+def upsert_signal(conn: psycopg.Cursor[DictRow], signal: Signal, content_hash: int | None = None, stats: WriteStats | None = None) -> bool:
+    """Upsert a signal into the database. Returns False if the stored content was the same."""
     # Upsert the signal
-    signal_dict = signal.model_dump()
+    return UPSERT_SIGNAL.execute(conn, signal, hash_content(signal) if content_hash is None else content_hash, stats) is not None
+
+SIGNAL_STAGING: StagingColumns = {
+    "stage_signal": [
+        ("SystemAddress", "BIGINT"),
+        ("BodyID", "BIGINT"),
+        ("Type", "TEXT"),
+        ("SignalName", "TEXT"),
+        ("Count", "INT"),
+        ("content_hash", "BIGINT"),
+    ],
+}
 
-    columns = list(signal_dict.keys())
-    column_names = sql.SQL(', ').join([sql.SQL(col) for col in columns])
-    placeholders = sql.SQL(', ').join([sql.Placeholder()] * len(signal_dict))
 
-    # ON CONFLICT DO UPDATE
-    update_columns = sql.SQL(', ').join(
-        sql.SQL(k) + sql.SQL(" = EXCLUDED.") + sql.SQL(k) 
-        for k, v in signal_dict.items() 
-        if k not in ['SystemAddress', 'BodyID', 'Type', 'SignalName'] and v is not None
-    )
+def stage_signal(rows: StagingRows, seq: int, signal: Signal, content_hash: int) -> None:
+    """Add a signal to the staging rows of a bulk batch."""
+    rows["stage_signal"].append((seq, signal.SystemAddress, signal.BodyID, signal.Type, signal.SignalName, signal.Count, content_hash))
 
-    query = sql.SQL("""
-        INSERT INTO signal ({columns}) VALUES ({placeholders})
-        ON CONFLICT (SystemAddress, COALESCE(BodyID, -1), Type, COALESCE(SignalName, '')) DO UPDATE SET {update_columns}
-        RETURNING id
-    """).format(
-        columns=column_names,
-        placeholders=placeholders,
-        update_columns=update_columns
-    )
 
-    conn.execute(query, tuple(signal_dict.values()))
-    result = conn.fetchone()
-    signal_id = result['id'] if result else None
+def merge_signal_statements() -> list[tuple[str, str]]:
+    """Set-based merge of the signal staging table, as (staging table, statement) pairs."""
+    keys = ["SystemAddress", "BodyID", "Type", "SignalName"]
+    return [
+        *(("stage_signal", statement) for statement in skip_stored(
+            "signal", "stage_signal", keys, [],
+            "t.SystemAddress = s.SystemAddress AND COALESCE(t.BodyID, -1) = COALESCE(s.BodyID, -1) "
+            "AND t.Type = s.Type AND COALESCE(t.SignalName, '') = COALESCE(s.SignalName, '')")),
+        ("stage_signal", merge_parent(
+            "signal", "stage_signal",
+            "(SystemAddress, COALESCE(BodyID, -1), Type, COALESCE(SignalName, ''))",
+            keys, ["Count", "content_hash"])),
+    ]
 
 def get_signal(conn: psycopg.Cursor[DictRow], system_address: int | None, body_id: int | None, type: str | None, signal_name: str | None) -> Signal | None:
     """Retrieve a signal by its system address, body ID, type, and signal name."""
@@ -0,0 +1,186 @@
+import threading
+from collections import Counter
+from dataclasses import fields
+from typing import Any, Iterable, Mapping
+import psycopg
+from psycopg.rows import DictRow
+
+# Composed queries keyed by (table, non-null column mask)
+_queries: dict[tuple[str, tuple[bool, ...]], str] = {}
+
+
+class WriteStats:
+    """
+    What the writes of one ingest run did: the upsert query shapes they used, and the child rows the delta
+    merges wrote (inserted or changed), deleted or left untouched. Every writer of the run adds to the
+    same instance, so updates and reads take its lock.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._shapes: set[tuple[str, tuple[bool, ...]]] = set()
+        self._child_rows: dict[str, Counter[str]] = {}
+
+    def add_shape(self, table: str, mask: tuple[bool, ...]) -> None:
+        if (table, mask) not in self._shapes:
+            with self._lock:
+                self._shapes.add((table, mask))
+
+    def add_child_rows(self, table: str, counts: Mapping[str, int]) -> None:
+        with self._lock:
+            self._child_rows.setdefault(table, Counter()).update(counts)
+
+    def statement_shapes(self) -> dict[str, int]:
+        """Number of distinct upsert query shapes used, per table."""
+        with self._lock:
+            return dict(Counter(table for table, _ in self._shapes))
+
+    def child_row_counts(self) -> dict[str, dict[str, int]]:
+        """Rows written, deleted and left untouched by the delta merges, per child table."""
+        with self._lock:
+            return {table: dict(counts) for table, counts in self._child_rows.items()}
+
+
+class UpsertStatement:
+    """
+    INSERT ... ON CONFLICT DO UPDATE of a model's scalar columns into one table.
+
+    Unless update_nulls is set, the SET clause only lists the columns a row reports, since None means
+    unknown and must not overwrite a known value. Each such shape is composed once per (table, non-null
+    mask) and cached, so the query text of a shape never changes and runs as a server-side prepared
+    statement.
+
+    The row's content hash is stored with it, and a conflicting row whose stored hash matches is left
+    alone: the statement then returns no row and the caller skips the child tables too. Only the model's
+    content_exclude columns (like the report timestamp) are still updated then, by touch_query, so the
+    stored row says when its content was last reported.
+    """
+
+    def __init__(
+        self,
+        table: str,
+        model: type,
+        conflict: str,
+        exclude: Iterable[str] = (),
+        keys: Iterable[str] = (),
+        update_nulls: bool = False,
+        returning: str = "true AS written",
+    ):
+        self.table = table
+        self.conflict = conflict
+        exclude, keys = set(exclude), list(keys)
+        self.columns = [f.name for f in fields(model) if f.name not in exclude]
+        # Key columns are inserted but never updated
+        self.updatable = [i for i, name in enumerate(self.columns) if name not in keys]
+        self.update_nulls = update_nulls
+        self.returning = returning
+        self.touched = [name for name in self.columns if name in getattr(model, "content_exclude", set())]
+        self.keys = keys
+        self.touch_query: str | None = None
+        if self.touched and keys:
+            self.touch_query = (
+                f"UPDATE {table} SET {', '.join(f'{c} = %s' for c in self.touched)} "
+                f"WHERE {' AND '.join(f'{k} = %s' for k in keys)} "
+                f"AND ROW({', '.join(self.touched)}) IS DISTINCT FROM ROW({', '.join(['%s'] * len(self.touched))})"
+            )
+
+    def _compose(self, mask: tuple[bool, ...]) -> str:
+        if self.update_nulls:
+            updated = [self.columns[i] for i in self.updatable]
+        else:
+            updated = [self.columns[i] for i, reported in zip(self.updatable, mask) if reported]
+        columns = self.columns + ["content_hash"]
+        update_columns = ", ".join(f"{c} = EXCLUDED.{c}" for c in updated + ["content_hash"])
+        return (
+            f"INSERT INTO {self.table} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))}) "
+            f"ON CONFLICT {self.conflict} DO UPDATE SET {update_columns} "
+            f"WHERE {self.table}.content_hash IS DISTINCT FROM EXCLUDED.content_hash "
+            f"RETURNING {self.returning}"
+        )
+
+    def query(self, values: tuple[Any, ...], stats: WriteStats | None = None) -> str:
+        """Return the cached query for a row's values, composing it on first use of its shape."""
+        mask = () if self.update_nulls else tuple(values[i] is not None for i in self.updatable)
+        query = _queries.get((self.table, mask))
+        if query is None:
+            # Threads composing the same shape at once store the same text
+            query = _queries[(self.table, mask)] = self._compose(mask)
+        if stats is not None:
+            stats.add_shape(self.table, mask)
+        return query
+
+    def execute(self, cur: psycopg.Cursor[DictRow], model: Any, content_hash: int, stats: WriteStats | None = None) -> DictRow | None:
+        """Upsert the model's row. Returns the RETURNING row, or None if the stored content was the same."""
+        values = tuple(getattr(model, name) for name in self.columns)
+        cur.execute(self.query(values, stats), (*values, content_hash), prepare=True)  # pyright: ignore[reportArgumentType]
+        row = cur.fetchone()
+        if row is None and self.touch_query is not None:
+            cur.execute(self.touch_query, self.touch_values(model), prepare=True)  # pyright: ignore[reportArgumentType]
+        return row
+
+    def touch_values(self, model: Any) -> tuple[Any, ...]:
+        """Parameters of touch_query for a model: its touched values, its key and the touched values again."""
+        touched = tuple(getattr(model, name) for name in self.touched)
+        return (*touched, *(getattr(model, k) for k in self.keys), *touched)
+
+
+class ChildRows:
+    """
+    Batched writes of a child table. replace() deletes a parent's rows and inserts the new list with
+    executemany, which psycopg sends in pipeline mode, so a parent costs the same two round trips
+    whether it has one child row or hundreds.
+    """
+
+    def __init__(self, table: str, keys: list[str], columns: list[str]):
+        self.delete = f"DELETE FROM {table} WHERE {' AND '.join(f'{k} = %s' for k in keys)}"
+        self.insert_query = (
+            f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))}) "
+            f"ON CONFLICT DO NOTHING"
+        )
+
+    def insert(self, cur: psycopg.Cursor[DictRow], rows: Iterable[tuple[Any, ...]]) -> None:
+        """Insert the rows, skipping ones that already exist."""
+        rows = list(rows)
+        if rows:
+            cur.executemany(self.insert_query, rows)  # pyright: ignore[reportArgumentType]
+
+    def replace(self, cur: psycopg.Cursor[DictRow], key: tuple[Any, ...], rows: Iterable[tuple[Any, ...]]) -> None:
+        """Replace all rows of the parent identified by the key values."""
+        cur.execute(self.delete, key, prepare=True)  # pyright: ignore[reportArgumentType]
+        self.insert(cur, rows)
+
+
+class MergeChildRows:
+    """
+    Delta writes of a child table identified by the parent key plus one name column. Instead of deleting
+    and reinserting a parent's whole list, rows whose name vanished are deleted, new names are inserted
+    and existing rows are only updated when a value changed, so unchanged rows cost no WAL or dead tuples.
+    """
+
+    def __init__(self, table: str, keys: list[str], name: str, columns: list[str]):
+        self.table = table
+        self.name_index = columns.index(name)
+        key_match = " AND ".join(f"{k} = %s" for k in keys)
+        self.delete = f"DELETE FROM {table} WHERE {key_match} AND {name} <> ALL(%s)"
+        values = [c for c in columns if c not in keys and c != name]
+        self.upsert = (
+            f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))}) "
+            f"ON CONFLICT ({', '.join(keys + [name])}) DO UPDATE SET {', '.join(f'{c} = EXCLUDED.{c}' for c in values)} "
+            f"WHERE ({', '.join(f'{table}.{c}' for c in values)}) IS DISTINCT FROM ({', '.join(f'EXCLUDED.{c}' for c in values)})"
+        )
+
+    def merge(self, cur: psycopg.Cursor[DictRow], key: tuple[Any, ...], rows: Iterable[tuple[Any, ...]], stats: WriteStats | None = None) -> None:
+        """Make the parent's stored rows equal to the given ones, touching only those that differ."""
+        # The first row of a duplicated name wins, like the INSERT ... DO NOTHING of the full rewrite
+        unique: dict[Any, tuple[Any, ...]] = {}
+        for row in rows:
+            unique.setdefault(row[self.name_index], row)
+
+        cur.execute(self.delete, (*key, list(unique)), prepare=True)  # pyright: ignore[reportArgumentType]
+        deleted = cur.rowcount
+        written = 0
+        if unique:
+            cur.executemany(self.upsert, list(unique.values()))  # pyright: ignore[reportArgumentType]
+            written = cur.rowcount
+        if stats is not None:
+            stats.add_child_rows(self.table, {"deleted": deleted, "written": written, "untouched": len(unique) - written})
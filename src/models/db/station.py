@@ -1,15 +1,20 @@
 from typing import ClassVar
 import psycopg
-from psycopg import sql
 from psycopg.rows import DictRow
-from pydantic import BaseModel
 
-class StationEconomy(BaseModel):
+from .bulk import StagingColumns, StagingRows, merge_parent, replace_children, skip_stored
+from .content import hash_content
+from .statements import ChildRows, UpsertStatement, WriteStats
+from dataclasses import dataclass
+
+@dataclass(slots=True, kw_only=True)
+class StationEconomy:
     sources: ClassVar[list[str]] = ["Docked"]
     Name: str # Docked.Economies[]
     Proportion: float # Docked.Economies[]
     
-class Station(BaseModel):
+@dataclass(slots=True, kw_only=True)
+class Station:
     sources: ClassVar[list[str]] = ["Docked", "ApproachSettlement"]
     primary_keys: ClassVar[list[str]] = ["MarketID"]
     SystemAddress: int # Docked, ApproachSettlement
@@ -56,8 +61,10 @@ def create_station_tables() -> str:
         LandingPadsLarge INT,
         LandingPadsMedium INT,
         LandingPadsSmall INT,
+        content_hash BIGINT,
         PRIMARY KEY (MarketID)
     );
+    ALTER TABLE station ADD COLUMN IF NOT EXISTS content_hash BIGINT;
 
     CREATE TABLE IF NOT EXISTS station_economy (
         MarketID BIGINT NOT NULL,
@@ -75,42 +82,93 @@ def create_station_tables() -> str:
     );
     """
 
-def upsert_station(conn: psycopg.Cursor[DictRow], station: Station) -> None:
-    """Upsert a station into the database, including its economies and services."""
-    station_dict = station.model_dump(exclude={'StationEconomies', 'StationServices'})
-    columns = sql.SQL(', ').join(map(sql.SQL, station_dict.keys()))
-    placeholders = sql.SQL(', ').join([sql.Placeholder()] * len(station_dict))
-    
-    update_columns = sql.SQL(', ').join(
-        sql.SQL("{} = EXCLUDED.{}").format(sql.SQL(k), sql.SQL(k)) for (k, v) in station_dict.items() if v is not None
-    )
-
-    query = sql.SQL("""
-        INSERT INTO station ({columns}) VALUES ({placeholders})
-        ON CONFLICT (MarketID) DO UPDATE SET {update_columns}
-    """).format(
-        columns=columns,
-        placeholders=placeholders,
-        update_columns=update_columns
-    )
-    
-    conn.execute(query, tuple(station_dict.values()))
+UPSERT_STATION = UpsertStatement("station", Station, "(MarketID)", exclude={'StationEconomies', 'StationServices'})
+STATION_ECONOMIES = ChildRows("station_economy", ["MarketID"], ["MarketID", "Name", "Proportion"])
+STATION_SERVICES = ChildRows("station_service", ["MarketID"], ["MarketID", "Name"])
+
+def upsert_station(conn: psycopg.Cursor[DictRow], station: Station, content_hash: int | None = None, stats: WriteStats | None = None) -> bool:
+    """Upsert a station into the database, including its economies and services. Returns False if the stored content was the same."""
+    if UPSERT_STATION.execute(conn, station, hash_content(station) if content_hash is None else content_hash, stats) is None:
+        return False
 
     if station.StationEconomies is not None:
-        conn.execute("DELETE FROM station_economy WHERE MarketID = %s;", (station.MarketID,))
-        for economy in station.StationEconomies:
-            conn.execute("""
-                INSERT INTO station_economy (MarketID, Name, Proportion) VALUES (%s, %s, %s)
-                ON CONFLICT (MarketID, Name) DO NOTHING;
-            """, (station.MarketID, economy.Name, economy.Proportion))
+        STATION_ECONOMIES.replace(conn, (station.MarketID,), (
+            (station.MarketID, economy.Name, economy.Proportion) for economy in station.StationEconomies
+        ))
 
     if station.StationServices is not None:
-        conn.execute("DELETE FROM station_service WHERE MarketID = %s;", (station.MarketID,))
-        for service in station.StationServices:
-            conn.execute("""
-                INSERT INTO station_service (MarketID, Name) VALUES (%s, %s)
-                ON CONFLICT (MarketID, Name) DO NOTHING;
-            """, (station.MarketID, service))
+        STATION_SERVICES.replace(conn, (station.MarketID,), ((station.MarketID, service) for service in station.StationServices))
+    return True
+
+
+STATION_STAGING: StagingColumns = {
+    "stage_station": [
+        ("MarketID", "BIGINT"),
+        ("SystemAddress", "BIGINT"),
+        ("StationName", "TEXT"),
+        ("StationType", "TEXT"),
+        ("BodyID", "BIGINT"),
+        ("Latitude", "DOUBLE PRECISION"),
+        ("Longitude", "DOUBLE PRECISION"),
+        ("DistFromStarLS", "DOUBLE PRECISION"),
+        ("StationGovernment", "TEXT"),
+        ("StationAllegiance", "TEXT"),
+        ("StationFactionName", "TEXT"),
+        ("StationFactionState", "TEXT"),
+        ("StationEconomy", "TEXT"),
+        ("StationState", "TEXT"),
+        ("numStationServices", "INT"),
+        ("numStationEconomies", "INT"),
+        ("LandingPadsLarge", "INT"),
+        ("LandingPadsMedium", "INT"),
+        ("LandingPadsSmall", "INT"),
+        ("hasStationEconomies", "BOOLEAN"),
+        ("hasStationServices", "BOOLEAN"),
+        ("content_hash", "BIGINT"),
+    ],
+    "stage_station_economy": [
+        ("MarketID", "BIGINT"),
+        ("Name", "TEXT"),
+        ("Proportion", "DOUBLE PRECISION"),
+    ],
+    "stage_station_service": [
+        ("MarketID", "BIGINT"),
+        ("Name", "TEXT"),
+    ],
+}
+
+STATION_COLUMNS = [name for name, _ in STATION_STAGING["stage_station"] if not name.startswith("has") and name != "content_hash"]
+
+
+def stage_station(rows: StagingRows, seq: int, station: Station, content_hash: int) -> None:
+    """Add a station and its child rows to the staging rows of a bulk batch."""
+    rows["stage_station"].append((
+        seq,
+        *(getattr(station, c) for c in STATION_COLUMNS),
+        station.StationEconomies is not None,
+        station.StationServices is not None,
+        content_hash,
+    ))
+    for economy in station.StationEconomies or []:
+        rows["stage_station_economy"].append((seq, station.MarketID, economy.Name, economy.Proportion))
+    for service in station.StationServices or []:
+        rows["stage_station_service"].append((seq, station.MarketID, service))
+
+
+def merge_station_statements() -> list[tuple[str, str]]:
+    """Set-based merge of the station staging tables, as (staging table, statement) pairs."""
+    keys = ["MarketID"]
+    statements = [
+        *skip_stored("station", "stage_station", keys, ["stage_station_economy", "stage_station_service"]),
+        merge_parent("station", "stage_station", "(MarketID)", keys, STATION_COLUMNS[1:] + ["content_hash"]),
+        *replace_children(
+            "stage_station", "hasStationEconomies", keys,
+            "station_economy", "stage_station_economy", ["MarketID", "Name", "Proportion"]),
+        *replace_children(
+            "stage_station", "hasStationServices", keys,
+            "station_service", "stage_station_service", ["MarketID", "Name"]),
+    ]
+    return [("stage_station", statement) for statement in statements]
 
 
 def get_station(conn: psycopg.Cursor[DictRow], market_id: int) -> Station | None:
@@ -1,10 +1,14 @@
 from typing import ClassVar, Literal
 import psycopg
-from psycopg import sql
 from psycopg.rows import DictRow
-from pydantic import BaseModel
 
-class Conflict(BaseModel):
+from .bulk import StagingColumns, StagingRows, latest, merge_parent, replace_children, skip_stored
+from .content import hash_content
+from .statements import ChildRows, UpsertStatement, WriteStats
+from dataclasses import dataclass, fields
+
+@dataclass(slots=True, kw_only=True)
+class Conflict:
     sources: ClassVar[list[str]] = ["FSDJump"]
     primary_keys: ClassVar[list[str]] = ["SystemAddress", "Faction1Name", "Faction2Name"]
     SystemAddress: int # FSDJump
@@ -18,7 +22,8 @@ class Conflict(BaseModel):
     Faction2Stake: str # FSDJump.Conflicts[]
     Faction2WonDays: int # FSDJump.Conflicts[]
     
-class FactionStateT(BaseModel):
+@dataclass(slots=True, kw_only=True)
+class FactionStateT:
     primary_keys: ClassVar[list[str]] = ["SystemAddress", "FactionName", "Type", "State"]
     SystemAddress: int # FSDJump
     FactionName: str # FSDJump.Factions[]
@@ -26,7 +31,8 @@ class FactionStateT(BaseModel):
     Type: Literal["Active", "Recovering", "Pending"]
     State: str  # FSDJump.Factions[].ActiveStates[], FSDJump.Factions[].PendingStates[], FSDJump.Factions[].RecoveringStates[]
     Trend: int = 0 # FSDJump.Factions[].PendingStates[], FSDJump.Factions[].RecoveringStates[]
-class Faction(BaseModel):
+@dataclass(slots=True, kw_only=True)
+class Faction:
     sources: ClassVar[list[str]] = ["FSDJump"]
     primary_keys: ClassVar[list[str]] = ["SystemAddress", "Name"]
     SystemAddress: int # FSDJump
@@ -42,14 +48,16 @@ class Faction(BaseModel):
     # Foreign models
     States: list[FactionStateT] # FSDJump.Factions[]
     
-class SystemPower(BaseModel):
+@dataclass(slots=True, kw_only=True)
+class SystemPower:
     sources: ClassVar[list[str]] = ["FSDJump"]
     primary_keys: ClassVar[list[str]] = ["SystemAddress", "Power"]
     SystemAddress: int  # FSDJump
     Power: str # FSDJump.Power[]
 
 # None fields should be considered "unknown", meaning that no event has reported this field yet
-class System(BaseModel): 
+@dataclass(slots=True, kw_only=True)
+class System: 
     sources: ClassVar[list[str]] = ["FSDJump"]
     primary_keys: ClassVar[list[str]] = ["SystemAddress"]
     SystemAddress: int # FSDJump
@@ -101,8 +109,10 @@ def create_system_tables() -> str:
         numPowers INT,
         numFactions INT,
         numConflicts INT,
+        content_hash BIGINT,
         PRIMARY KEY (SystemAddress)
     );
+    ALTER TABLE system ADD COLUMN IF NOT EXISTS content_hash BIGINT;
     
     -- Create HNSW index for vector search on StarPos
     CREATE INDEX IF NOT EXISTS idx_system_star_pos
@@ -159,66 +169,163 @@ def create_system_tables() -> str:
     );
     """
 
-def upsert_system(conn: psycopg.Cursor[DictRow], system: System) -> None:
-    """Upsert a system into the database, including its power."""
-    # Upsert the system
-    system_dict = system.model_dump(exclude={'Powers', 'Factions', 'Conflicts'})
-    columns = sql.SQL(', ').join(map(sql.SQL, system_dict.keys()))
-    placeholders = sql.SQL(', ').join([sql.Placeholder()] * len(system_dict))
-    
-    # ON CONFLICT DO UPDATE
-    update_columns = sql.SQL(', ').join(
-        sql.SQL("{} = EXCLUDED.{}").format(sql.SQL(k), sql.SQL(k)) for (k, v) in system_dict.items() if v is not None
-    )
+UPSERT_SYSTEM = UpsertStatement("system", System, "(SystemAddress)", exclude={'Powers', 'Factions', 'Conflicts'})
+FACTION_COLUMNS = [f.name for f in fields(Faction) if f.name != 'States']
+CONFLICT_COLUMNS = [f.name for f in fields(Conflict)]
+SYSTEM_POWERS = ChildRows("system_power", ["SystemAddress"], ["SystemAddress", "Power"])
+SYSTEM_FACTIONS = ChildRows("system_faction", ["SystemAddress"], FACTION_COLUMNS)
+SYSTEM_FACTION_STATES = ChildRows("system_faction_state", ["SystemAddress"], ["SystemAddress", "FactionName", "Type", "State", "Trend"])
+SYSTEM_CONFLICTS = ChildRows("system_conflict", ["SystemAddress"], CONFLICT_COLUMNS)
 
-    query = sql.SQL("""
-        INSERT INTO system ({columns}) VALUES ({placeholders})
-        ON CONFLICT (SystemAddress) DO UPDATE SET {update_columns}
-    """).format(
-        columns=columns,
-        placeholders=placeholders,
-        update_columns=update_columns
-    )
-    
-    conn.execute(query, tuple(system_dict.values()))
+def upsert_system(conn: psycopg.Cursor[DictRow], system: System, content_hash: int | None = None, stats: WriteStats | None = None) -> bool:
+    """Upsert a system into the database, including its power. Returns False if the stored content was the same."""
+    # Upsert the system
+    if UPSERT_SYSTEM.execute(conn, system, hash_content(system) if content_hash is None else content_hash, stats) is None:
+        return False
 
     # Insert the system's powers
     if system.Powers is not None:
-        conn.execute("DELETE FROM system_power WHERE SystemAddress = %s;", (system.SystemAddress,))
-        for power in system.Powers:
-            conn.execute("""
-                INSERT INTO system_power (SystemAddress, Power) VALUES (%s, %s)
-                ON CONFLICT (SystemAddress, Power) DO NOTHING;
-            """, (system.SystemAddress, power.Power))
+        SYSTEM_POWERS.replace(conn, (system.SystemAddress,), ((system.SystemAddress, power.Power) for power in system.Powers))
 
-    # Insert factions and their states
+    # Insert factions and their states. The states are replaced as well rather than left to the cascade
+    # from the factions, which an initial load runs without (see initial_load.defer_constraints)
     if system.Factions is not None:
-        conn.execute("DELETE FROM system_faction WHERE SystemAddress = %s;", (system.SystemAddress,))
-        for faction in system.Factions:
-            faction_dict = faction.model_dump(exclude={'States'})
-            faction_columns = sql.SQL(', ').join(map(sql.SQL, faction_dict.keys()))
-            faction_placeholders = sql.SQL(', ').join([sql.Placeholder()] * len(faction_dict))
-            faction_query = sql.SQL("INSERT INTO system_faction ({}) VALUES ({}) ON CONFLICT DO NOTHING").format(faction_columns, faction_placeholders)
-            conn.execute(faction_query, tuple(faction_dict.values()))
-
-            if faction.States:
-                for state in faction.States:
-                    state_dict = state.model_dump()
-                    state_dict['FactionName'] = faction.Name # Add FactionName for the foreign key
-                    state_columns = sql.SQL(', ').join(map(sql.SQL, state_dict.keys()))
-                    state_placeholders = sql.SQL(', ').join([sql.Placeholder()] * len(state_dict))
-                    state_query = sql.SQL("INSERT INTO system_faction_state ({}) VALUES ({}) ON CONFLICT DO NOTHING").format(state_columns, state_placeholders)
-                    conn.execute(state_query, tuple(state_dict.values()))
+        SYSTEM_FACTIONS.replace(conn, (system.SystemAddress,), (
+            tuple(getattr(faction, c) for c in FACTION_COLUMNS) for faction in system.Factions
+        ))
+        SYSTEM_FACTION_STATES.replace(conn, (system.SystemAddress,), (
+            # FactionName is set from the faction for the foreign key
+            (state.SystemAddress, faction.Name, state.Type, state.State, state.Trend)
+            for faction in system.Factions for state in faction.States or []
+        ))
 
     # Insert conflicts
     if system.Conflicts is not None:
-        conn.execute("DELETE FROM system_conflict WHERE SystemAddress = %s;", (system.SystemAddress,))
-        for conflict in system.Conflicts:
-            conflict_dict = conflict.model_dump()
-            conflict_columns = sql.SQL(', ').join(map(sql.SQL, conflict_dict.keys()))
-            conflict_placeholders = sql.SQL(', ').join([sql.Placeholder()] * len(conflict_dict))
-            conflict_query = sql.SQL("INSERT INTO system_conflict ({}) VALUES ({}) ON CONFLICT DO NOTHING").format(conflict_columns, conflict_placeholders)
-            conn.execute(conflict_query, tuple(conflict_dict.values()))
+        SYSTEM_CONFLICTS.replace(conn, (system.SystemAddress,), (
+            tuple(getattr(conflict, c) for c in CONFLICT_COLUMNS) for conflict in system.Conflicts
+        ))
+    return True
+
+
+SYSTEM_STAGING: StagingColumns = {
+    "stage_system": [
+        ("SystemAddress", "BIGINT"),
+        # StarPos is staged as three plain columns and assembled into a vector when merging
+        ("StarPosX", "DOUBLE PRECISION"),
+        ("StarPosY", "DOUBLE PRECISION"),
+        ("StarPosZ", "DOUBLE PRECISION"),
+        ("StarSystem", "TEXT"),
+        ("PrimaryBodyID", "BIGINT"),
+        ("PrimaryBodyType", "TEXT"),
+        ("PrimaryBodyName", "TEXT"),
+        ("Population", "BIGINT"),
+        ("Allegiance", "TEXT"),
+        ("Economy", "TEXT"),
+        ("SecondEconomy", "TEXT"),
+        ("FactionName", "TEXT"),
+        ("FactionState", "TEXT"),
+        ("Security", "TEXT"),
+        ("PowerplayState", "TEXT"),
+        ("Government", "TEXT"),
+        ("numPowers", "INT"),
+        ("numFactions", "INT"),
+        ("numConflicts", "INT"),
+        ("content_hash", "BIGINT"),
+    ],
+    "stage_system_power": [
+        ("SystemAddress", "BIGINT"),
+        ("Power", "TEXT"),
+    ],
+    "stage_system_faction": [
+        ("SystemAddress", "BIGINT"),
+        ("Name", "TEXT"),
+        ("Influence", "DOUBLE PRECISION"),
+        ("Happiness", "TEXT"),
+        ("Allegiance", "TEXT"),
+        ("SquadronFaction", "BOOLEAN"),
+        ("FactionState", "TEXT"),
+        ("Government", "TEXT"),
+    ],
+    "stage_system_faction_state": [
+        ("SystemAddress", "BIGINT"),
+        ("FactionName", "TEXT"),
+        ("Type", "TEXT"),
+        ("State", "TEXT"),
+        ("Trend", "INT"),
+    ],
+    "stage_system_conflict": [
+        ("SystemAddress", "BIGINT"),
+        ("Status", "TEXT"),
+        ("WarType", "TEXT"),
+        ("Faction1Name", "TEXT"),
+        ("Faction1Stake", "TEXT"),
+        ("Faction1WonDays", "INT"),
+        ("Faction2Name", "TEXT"),
+        ("Faction2Stake", "TEXT"),
+        ("Faction2WonDays", "INT"),
+    ],
+}
+
+SYSTEM_COLUMNS = [
+    "SystemAddress", "StarPos", "StarSystem", "PrimaryBodyID", "PrimaryBodyType", "PrimaryBodyName", "Population",
+    "Allegiance", "Economy", "SecondEconomy", "FactionName", "FactionState", "Security", "PowerplayState",
+    "Government", "numPowers", "numFactions", "numConflicts",
+]
+
+
+def stage_system(rows: StagingRows, seq: int, system: System, content_hash: int) -> None:
+    """Add a system and its child rows to the staging rows of a bulk batch."""
+    rows["stage_system"].append((
+        seq,
+        system.SystemAddress,
+        *system.StarPos,
+        *(getattr(system, c) for c in SYSTEM_COLUMNS[2:]),
+        content_hash,
+    ))
+    for power in system.Powers:
+        rows["stage_system_power"].append((seq, system.SystemAddress, power.Power))
+    for faction in system.Factions:
+        rows["stage_system_faction"].append((
+            seq, system.SystemAddress, faction.Name, faction.Influence, faction.Happiness, faction.Allegiance,
+            faction.SquadronFaction, faction.FactionState, faction.Government,
+        ))
+        for state in faction.States:
+            rows["stage_system_faction_state"].append((seq, system.SystemAddress, faction.Name, state.Type, state.State, state.Trend))
+    for conflict in system.Conflicts:
+        rows["stage_system_conflict"].append((
+            seq, system.SystemAddress, conflict.Status, conflict.WarType,
+            conflict.Faction1Name, conflict.Faction1Stake, conflict.Faction1WonDays,
+            conflict.Faction2Name, conflict.Faction2Stake, conflict.Faction2WonDays,
+        ))
+
+
+def merge_system_statements() -> list[tuple[str, str]]:
+    """Set-based merge of the system staging tables, as (staging table, statement) pairs."""
+    keys = ["SystemAddress"]
+    star_pos = f"ARRAY[{latest('StarPosX')}, {latest('StarPosY')}, {latest('StarPosZ')}]::vector"
+    # Every system event reports its full lists, so the staged lists always replace the stored ones
+    statements = [
+        *skip_stored(
+            "system", "stage_system", keys,
+            ["stage_system_power", "stage_system_faction", "stage_system_faction_state", "stage_system_conflict"]),
+        merge_parent("system", "stage_system", "(SystemAddress)", keys, SYSTEM_COLUMNS[1:] + ["content_hash"], {"StarPos": star_pos}),
+        *replace_children(
+            "stage_system", "TRUE", keys,
+            "system_power", "stage_system_power", ["SystemAddress", "Power"]),
+        *replace_children(
+            "stage_system", "TRUE", keys,
+            "system_faction", "stage_system_faction",
+            ["SystemAddress", "Name", "Influence", "Happiness", "Allegiance", "SquadronFaction", "FactionState", "Government"]),
+        # Not left to the cascade from the factions, which an initial load runs without
+        *replace_children(
+            "stage_system", "TRUE", keys,
+            "system_faction_state", "stage_system_faction_state", ["SystemAddress", "FactionName", "Type", "State", "Trend"]),
+        *replace_children(
+            "stage_system", "TRUE", keys,
+            "system_conflict", "stage_system_conflict",
+            ["SystemAddress", "Status", "WarType", "Faction1Name", "Faction1Stake", "Faction1WonDays", "Faction2Name", "Faction2Stake", "Faction2WonDays"]),
+    ]
+    return [("stage_system", statement) for statement in statements]
 
 
 def get_system(conn: psycopg.Cursor[DictRow], system_address: int) -> System | None:
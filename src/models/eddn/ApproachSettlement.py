@@ -1,5 +1,6 @@
 from typing import Any, Literal,ClassVar
 from pydantic import BaseModel
+from .EDDNEnvelope import EDDNEventEnvelope, EDDNMessageFlags
 
 class StationEconomy(BaseModel):
     foreign_ref: ClassVar[list[str]] = ["ApproachSettlement"]
@@ -28,3 +29,9 @@ class ApproachSettlement(BaseModel):
     StationFaction: StationFactionT = StationFactionT()
     StationServices: list[str] = []
     StationEconomy: str = 'None'
+
+class ApproachSettlementMessage(ApproachSettlement, EDDNMessageFlags):
+    pass
+
+class ApproachSettlementEnvelope(EDDNEventEnvelope[ApproachSettlementMessage]):
+    pass
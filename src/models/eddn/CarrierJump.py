@@ -1,5 +1,6 @@
 from typing import Literal,ClassVar
 from pydantic import BaseModel
+from .EDDNEnvelope import EDDNEventEnvelope, EDDNMessageFlags
 
 
 class CarrierJump(BaseModel):
@@ -12,3 +13,9 @@ class CarrierJump(BaseModel):
     MarketID: int
     StationName: str
     StationType: str
+
+class CarrierJumpMessage(CarrierJump, EDDNMessageFlags):
+    pass
+
+class CarrierJumpEnvelope(EDDNEventEnvelope[CarrierJumpMessage]):
+    pass
@@ -1,5 +1,6 @@
 from typing import Literal,ClassVar
 from pydantic import BaseModel
+from .EDDNEnvelope import EDDNEventEnvelope, EDDNMessageFlags
 
 class StationEconomy(BaseModel):
     foreign_ref: ClassVar[list[str]] = ["Docked"]
@@ -34,3 +35,9 @@ class Docked(BaseModel):
     StationEconomy: str
     StationState: str = 'None'
     LandingPads: LandingPads
+
+class DockedMessage(Docked, EDDNMessageFlags):
+    pass
+
+class DockedEnvelope(EDDNEventEnvelope[DockedMessage]):
+    pass
@@ -23,4 +23,18 @@ class EDDNMessage(BaseModel):
 class EDDNEnvelope(BaseModel):
     header: EDDNHeader
     message: EDDNMessage
-    
\ No newline at end of file
+
+
+MessageT = TypeVar("MessageT", bound=BaseModel)
+
+class EDDNMessageFlags(BaseModel):
+    horizons: bool = False
+    odyssey: bool = False
+
+class EDDNEventEnvelope(BaseModel, Generic[MessageT]):
+    """
+    Envelope whose message is parsed straight into a typed event model, so a raw line is validated
+    once instead of going through EDDNEnvelope, model_dump and a second validation.
+    """
+    header: EDDNHeader
+    message: MessageT
@@ -1,5 +1,6 @@
 from typing import Literal,ClassVar
 from pydantic import BaseModel
+from .EDDNEnvelope import EDDNEventEnvelope, EDDNMessageFlags
 
 class FactionPendingstate(BaseModel):
     foreign_ref: ClassVar[list[str]] = ["Faction"]
@@ -70,3 +71,9 @@ class FSDJump(BaseModel):
     ThargoidWar: Thargoidwar | None = None
     Conflicts: list[Conflict] | None = None
     SystemGovernment: str
+
+class FSDJumpMessage(FSDJump, EDDNMessageFlags):
+    pass
+
+class FSDJumpEnvelope(EDDNEventEnvelope[FSDJumpMessage]):
+    pass
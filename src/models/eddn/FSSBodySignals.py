@@ -1,5 +1,6 @@
 from typing import Literal,ClassVar
 from pydantic import BaseModel
+from .EDDNEnvelope import EDDNEventEnvelope, EDDNMessageFlags
 
 class FSSBodySignal(BaseModel):
     foreign_ref: ClassVar[list[str]] = ["FSSBodySignals"]
@@ -14,3 +15,9 @@ class FSSBodySignals(BaseModel):
     BodyID: int
     BodyName: str
     Signals: list[FSSBodySignal]
+
+class FSSBodySignalsMessage(FSSBodySignals, EDDNMessageFlags):
+    pass
+
+class FSSBodySignalsEnvelope(EDDNEventEnvelope[FSSBodySignalsMessage]):
+    pass
@@ -1,5 +1,6 @@
 from typing import Literal,ClassVar
 from pydantic import BaseModel
+from .EDDNEnvelope import EDDNEventEnvelope, EDDNMessageFlags
 
 
     
@@ -18,3 +19,9 @@ class FSSSignalDiscovered(BaseModel):
     timestamp: str
     SystemAddress: int
     signals: list[FSSSignal]
+
+class FSSSignalDiscoveredMessage(FSSSignalDiscovered, EDDNMessageFlags):
+    pass
+
+class FSSSignalDiscoveredEnvelope(EDDNEventEnvelope[FSSSignalDiscoveredMessage]):
+    pass
@@ -1,5 +1,6 @@
 from typing import Literal,ClassVar
 from pydantic import BaseModel
+from .EDDNEnvelope import EDDNEventEnvelope, EDDNMessageFlags
 
 class MarketCommodity(BaseModel):
     name: str
@@ -18,4 +19,10 @@ class Market(BaseModel):
     #stationName: str
     #starSystem: str
     commodities: list[MarketCommodity]
-    prohibited: list[str] = [] # TODO does left out mean empty or not known?
\ No newline at end of file
+    prohibited: list[str] = [] # TODO does left out mean empty or not known?
+
+class MarketMessage(Market, EDDNMessageFlags):
+    pass
+
+class MarketEnvelope(EDDNEventEnvelope[MarketMessage]):
+    pass
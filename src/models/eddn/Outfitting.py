@@ -1,9 +1,16 @@
 from typing import Literal,ClassVar
 from pydantic import BaseModel
+from .EDDNEnvelope import EDDNEventEnvelope, EDDNMessageFlags
 
 class Outfitting(BaseModel):
     primary_keys: ClassVar[list[str]] = ["marketId"]
     event: Literal["Outfitting"] = "Outfitting"
     timestamp: str
     marketId: int
-    modules: list[str]
\ No newline at end of file
+    modules: list[str]
+
+class OutfittingMessage(Outfitting, EDDNMessageFlags):
+    pass
+
+class OutfittingEnvelope(EDDNEventEnvelope[OutfittingMessage]):
+    pass
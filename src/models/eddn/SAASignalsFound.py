@@ -1,5 +1,6 @@
 from typing import Literal,ClassVar
 from pydantic import BaseModel
+from .EDDNEnvelope import EDDNEventEnvelope, EDDNMessageFlags
 
 class SAASignalsFoundSignalsItem(BaseModel):
     foreign_ref: ClassVar[list[str]] = ["SAASignalsFound"]
@@ -16,4 +17,10 @@ class SAASignalsFound(BaseModel):
     Genuses: list[SAASignalsFoundGenusesItem] = []
     SystemAddress: int
     timestamp: str
-    BodyName: str
\ No newline at end of file
+    BodyName: str
+
+class SAASignalsFoundMessage(SAASignalsFound, EDDNMessageFlags):
+    pass
+
+class SAASignalsFoundEnvelope(EDDNEventEnvelope[SAASignalsFoundMessage]):
+    pass
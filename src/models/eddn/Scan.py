@@ -1,5 +1,6 @@
 from typing import Literal,ClassVar
 from pydantic import BaseModel
+from .EDDNEnvelope import EDDNEventEnvelope, EDDNMessageFlags
     
 
 class Atmospherecomposition(BaseModel):
@@ -76,4 +77,10 @@ class Scan(BaseModel):
     Composition: ScanComposition | None = None
     Materials: list[ScanMaterial] | None = None
     AtmosphereComposition: list[Atmospherecomposition] | None = None
-    Rings: list[ScanRing] | None = None
\ No newline at end of file
+    Rings: list[ScanRing] | None = None
+
+class ScanMessage(Scan, EDDNMessageFlags):
+    pass
+
+class ScanEnvelope(EDDNEventEnvelope[ScanMessage]):
+    pass
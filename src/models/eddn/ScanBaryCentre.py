@@ -1,5 +1,6 @@
 from typing import Literal,ClassVar
 from pydantic import BaseModel
+from .EDDNEnvelope import EDDNEventEnvelope, EDDNMessageFlags
 
 class ScanBaryCentre(BaseModel):
     primary_keys: ClassVar[list[str]] = ["SystemAddress", "BodyID"]
@@ -15,4 +16,10 @@ class ScanBaryCentre(BaseModel):
     Periapsis: float
     SemiMajorAxis: float
     OrbitalPeriod: float
-    OrbitalInclination: float
\ No newline at end of file
+    OrbitalInclination: float
+
+class ScanBaryCentreMessage(ScanBaryCentre, EDDNMessageFlags):
+    pass
+
+class ScanBaryCentreEnvelope(EDDNEventEnvelope[ScanBaryCentreMessage]):
+    pass
@@ -1,5 +1,6 @@
 from typing import Literal,ClassVar
 from pydantic import BaseModel
+from .EDDNEnvelope import EDDNEventEnvelope, EDDNMessageFlags
 
 class Shipyard(BaseModel):
     # TODO incomplete
@@ -8,4 +9,9 @@ class Shipyard(BaseModel):
     timestamp: str
     marketId: int
     ships: list[str]
-    
\ No newline at end of file
+
+class ShipyardMessage(Shipyard, EDDNMessageFlags):
+    pass
+
+class ShipyardEnvelope(EDDNEventEnvelope[ShipyardMessage]):
+    pass
@@ -0,0 +1,111 @@
+"""
+Tests that need Postgres run against the database in TEST_DATABASE_URL, which they empty and migrate
+first, and are skipped without it. Run from the repository root:
+
+    TEST_DATABASE_URL="dbname=edsearch_test user=postgres password=password host=localhost" python -m pytest tests
+"""
+import bz2
+import json
+import os
+from datetime import date
+from typing import Any, Callable, Iterator
+
+import psycopg
+import pytest
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+if TEST_DATABASE_URL:
+    # Read by src.Database when it is first imported
+    os.environ["DATABASE_URL"] = TEST_DATABASE_URL
+# Parse in the test process, without starting a worker pool
+os.environ.setdefault("INGEST_PARSE_WORKERS", "0")
+
+# Day the tests ingest archives of
+DAY = date(2025, 1, 15)
+
+
+def market_line(timestamp: str, prices: dict[str, int]) -> str:
+    """A Commodity market of station 1 selling the given commodities at the given prices."""
+    return json.dumps({
+        "$schemaRef": "https://eddn.edcd.io/schemas/commodity/3",
+        "header": {
+            "uploaderID": "test", "gameversion": "4.0.0.1904", "gamebuild": "r308767/r0 ",
+            "softwareName": "E:D Market Connector [Windows]", "softwareVersion": "5.12.1", "gatewayTimestamp": timestamp,
+        },
+        "message": {
+            "timestamp": timestamp, "systemName": "Sol", "stationName": "Abraham Lincoln", "marketId": 1,
+            "horizons": True, "odyssey": True,
+            "commodities": [
+                {
+                    "name": name, "meanPrice": price, "buyPrice": price, "stock": 100, "stockBracket": 2,
+                    "sellPrice": price, "demand": 100, "demandBracket": 2,
+                }
+                for name, price in prices.items()
+            ],
+        },
+    })
+
+
+def reset_schema() -> None:
+    """Drop everything in the test database and clear what the process cached about it."""
+    from src.models.db.ingestion import get_content_hash_cache, get_timestamp_cache
+
+    with psycopg.connect(TEST_DATABASE_URL or "", autocommit=True) as conn:
+        conn.execute("DROP SCHEMA public CASCADE")
+        conn.execute("CREATE SCHEMA public")
+    get_timestamp_cache().clear()
+    content_hash_cache = get_content_hash_cache()
+    if content_hash_cache is not None:
+        content_hash_cache.clear()
+
+
+@pytest.fixture
+def empty_database() -> Iterator[str]:
+    """An empty test database, for tests that build the schema themselves; yields its conninfo."""
+    if not TEST_DATABASE_URL:
+        pytest.skip("TEST_DATABASE_URL is not set")
+    reset_schema()
+    yield TEST_DATABASE_URL
+
+
+@pytest.fixture
+def database(empty_database: str) -> Iterator[str]:
+    """The test database with every migration applied; yields its conninfo."""
+    from src.Database import migrate
+    from src.models.db.migrations import MIGRATIONS
+
+    migrate(MIGRATIONS)
+    yield empty_database
+
+
+@pytest.fixture
+def write_archive(tmp_path: Any) -> Callable[[str, list[str]], str]:
+    """Write raw EDDN lines as the archive of a dataset for DAY; returns the directory to read it from."""
+    from src.ingest.archive import archive_name
+    from src.Ingest import datasets
+
+    def write_archive(name: str, lines: list[str]) -> str:
+        path = tmp_path / os.path.basename(archive_name(datasets[name]["file"], DAY))
+        path.write_bytes(bz2.compress("".join(line + "\n" for line in lines).encode()))
+        return str(tmp_path)
+
+    return write_archive
+
+
+@pytest.fixture
+def ingest_lines(empty_database: str, write_archive: Callable[[str, list[str]], str]) -> Callable[..., dict[str, Any]]:
+    """
+    Ingest raw EDDN lines as the archive of one dataset for DAY, read from a local directory; further
+    keyword arguments go to ingest(). Returns the ingest report. Tests migrate the database themselves,
+    most by also taking the database fixture.
+    """
+    from src.Ingest import datasets, ingest
+
+    def ingest_lines(name: str, lines: list[str], **kwargs: Any) -> dict[str, Any]:
+        dataset = datasets[name]
+        return ingest(
+            DAY, dataset["file"], dataset["envelope"], dataset["convert"], dataset["batch_size"],
+            freshness_key=dataset["freshness_key"], source_dir=write_archive(name, lines), **kwargs,
+        )
+
+    return ingest_lines
@@ -0,0 +1,28 @@
+import psycopg
+import pytest
+
+import src.Ingest
+from src.models.db.ingestion import ContentHashCache
+
+from .conftest import market_line
+
+PRICES = {"gold": 10, "silver": 20}
+
+
+@pytest.mark.parametrize("cache", [False, True])
+@pytest.mark.parametrize("bulk", [False, True])
+def test_unchanged_report_updates_timestamp(database: str, ingest_lines, monkeypatch: pytest.MonkeyPatch, bulk: bool, cache: bool):
+    if cache:
+        content_cache = ContentHashCache()
+        monkeypatch.setattr(src.Ingest, "get_content_hash_cache", lambda: content_cache)
+
+    # The second report of the first run repeats the first one within a batch
+    first = ingest_lines("Market", [market_line("2025-01-15T12:00:00Z", PRICES), market_line("2025-01-15T12:30:00Z", PRICES)], bulk=bulk)
+    second = ingest_lines("Market", [market_line("2025-01-15T13:00:00Z", PRICES)], bulk=bulk)
+
+    assert (first["success"], first["unchanged"]) == (1, 1)
+    assert (second["success"], second["unchanged"]) == (0, 1)
+    # The commodities are left alone
+    assert not any(count for counts in second["child_rows"].values() for count in counts.values())
+    with psycopg.connect(database) as conn:
+        assert conn.execute("SELECT timestamp FROM market WHERE marketId = 1").fetchall() == [("2025-01-15T13:00:00Z",)]
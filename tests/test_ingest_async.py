@@ -0,0 +1,23 @@
+import asyncio
+
+import pytest
+from psycopg_pool import PoolTimeout
+
+import src.Ingest
+from bench.samples import scan_line
+from src.Ingest import datasets, ingest_async
+
+from .conftest import DAY
+
+
+def test_failing_lane_ends_the_run(monkeypatch: pytest.MonkeyPatch, write_archive):
+    async def flush_batch_async(batch, stats=None):
+        raise PoolTimeout("couldn't get a connection after 30.00 sec")
+
+    monkeypatch.setattr(src.Ingest, "flush_batch_async", flush_batch_async)
+    dataset = datasets["Scan"]
+    # Far more batches than the lane queue holds, so the producer would wait on the dead lane for good
+    source_dir = write_archive("Scan", [scan_line(i) for i in range(200)])
+    run = ingest_async(DAY, dataset["file"], dataset["envelope"], dataset["convert"], 1, freshness_key=dataset["freshness_key"], source_dir=source_dir, lanes=2)
+    with pytest.raises(PoolTimeout):
+        asyncio.run(asyncio.wait_for(run, timeout=30))
@@ -0,0 +1,74 @@
+import psycopg
+
+from bench.samples import scan_line
+from src.Database import migrate
+from src.models.db.ingestion import ingestion_lock_key
+from src.models.db.migrations import MIGRATIONS
+
+
+def test_lock_keys_keep_values_apart():
+    keys = {
+        ingestion_lock_key("signal", [1, 2, "Biology", None]),
+        ingestion_lock_key("signal", [1, 2, "Biology", ""]),
+        ingestion_lock_key("signal", [1, 2, "Biology|x", "y"]),
+        ingestion_lock_key("signal", [1, 2, "Biology", "x|y"]),
+        ingestion_lock_key("signal", [1, None, "Biology", "x"]),
+    }
+    assert len(keys) == 5
+    assert ingestion_lock_key("body", [2870514583017, 14]) == ("body", "[2870514583017, 14]")
+
+
+def test_pipe_keys_are_migrated_to_json(empty_database: str):
+    migrate([migration for migration in MIGRATIONS if migration.version < 6])
+    with psycopg.connect(empty_database) as conn:
+        conn.execute(
+            """
+            INSERT INTO ingestion_lock (model_name, primary_key, event, timestamp) VALUES
+                ('body', '2870514583017|14', 'Scan', '2024-01-01T00:00:00Z'),
+                ('signal', '5|||Station|Alpha|Beta', 'FSSSignalDiscovered', '2024-01-01T00:00:00Z'),
+                ('landmark', '|Über', 'CodexEntry', '2024-01-01T00:00:00Z')
+            """
+        )
+    migrate(MIGRATIONS)
+    with psycopg.connect(empty_database) as conn:
+        keys = set(conn.execute("SELECT model_name, primary_key FROM ingestion_lock").fetchall())
+    assert keys == {
+        ingestion_lock_key("body", [2870514583017, 14]),
+        ingestion_lock_key("signal", [5, None, "", "Station|Alpha|Beta"]),
+        ingestion_lock_key("landmark", [None, "Über"]),
+    }
+
+
+def test_legacy_lock_keys_are_adopted(empty_database: str, ingest_lines):
+    # ingestion_lock as create_tables made it before migrations, with the sentinel row of the old locking
+    with psycopg.connect(empty_database) as conn:
+        conn.execute(
+            """
+            CREATE TABLE ingestion_lock (
+                model_name TEXT NOT NULL,
+                primary_key TEXT NOT NULL,
+                event TEXT NOT NULL,
+                timestamp TEXT NOT NULL,
+                PRIMARY KEY (model_name, primary_key, event)
+            )
+            """
+        )
+        conn.execute(
+            """
+            INSERT INTO ingestion_lock (model_name, primary_key, event, timestamp) VALUES
+                ('body', '{"BodyID": 14, "SystemAddress": 2870514583017}', 'Scan', '2025-01-15T13:00:00Z'),
+                ('body', '{"BodyID": 14, "SystemAddress": 2870514583017}', '__lock__', '1970-01-01T00:00:00Z')
+            """
+        )
+    migrate(MIGRATIONS)
+    with psycopg.connect(empty_database) as conn:
+        keys = conn.execute("SELECT model_name, primary_key, event FROM ingestion_lock").fetchall()
+    assert keys == [(*ingestion_lock_key("body", [2870514583017, 14]), "Scan")]
+
+    # Older than what the legacy row recorded
+    report = ingest_lines("Scan", [scan_line(0)])
+    assert (report["success"], report["skipped"]) == (0, 1)
+    report = ingest_lines("Scan", [scan_line(0).replace("12:00:00Z", "14:00:00Z")])
+    assert report["success"] == 1
+    with psycopg.connect(empty_database) as conn:
+        assert conn.execute("SELECT count(*) FROM body").fetchone() == (1,)
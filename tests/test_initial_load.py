@@ -0,0 +1,43 @@
+import json
+
+import psycopg
+import pytest
+
+from src.InitialLoad import finish, prepare
+
+
+def fsd_jump_line(timestamp: str, active_states: list[str]) -> str:
+    """A Journal.FSDJump into system 1 whose one faction is in the given states."""
+    return json.dumps({
+        "$schemaRef": "https://eddn.edcd.io/schemas/journal/1",
+        "header": {
+            "uploaderID": "test", "gameversion": "4.0.0.1904", "gamebuild": "r308767/r0 ",
+            "softwareName": "E:D Market Connector [Windows]", "softwareVersion": "5.12.1", "gatewayTimestamp": timestamp,
+        },
+        "message": {
+            "event": "FSDJump", "timestamp": timestamp, "SystemAddress": 1, "StarSystem": "Sol",
+            "StarPos": [0.0, 0.0, 0.0], "BodyID": 0, "Body": "Sol", "BodyType": "Star",
+            "SystemAllegiance": "Federation", "SystemEconomy": "$economy_Industrial;",
+            "SystemSecondEconomy": "$economy_None;", "SystemGovernment": "$government_Democracy;",
+            "SystemSecurity": "$SYSTEM_SECURITY_high;", "Population": 1000, "odyssey": True, "horizons": True,
+            "Factions": [{
+                "Name": "Mother Gaia", "Influence": 1.0, "Happiness": "$Faction_HappinessBand2;",
+                "Allegiance": "Federation", "FactionState": active_states[0], "Government": "Democracy",
+                "ActiveStates": [{"State": state} for state in active_states],
+            }],
+        },
+    })
+
+
+@pytest.mark.parametrize("bulk", [False, True])
+def test_reload_replaces_faction_states_without_foreign_keys(database: str, ingest_lines, bulk: bool):
+    prepare()
+    assert ingest_lines("FSDJump", [fsd_jump_line("2025-01-15T12:00:00Z", ["Boom", "Election"])], bulk=bulk)["success"] == 1
+    assert ingest_lines("FSDJump", [fsd_jump_line("2025-01-15T13:00:00Z", ["War"])], bulk=bulk)["success"] == 1
+    with psycopg.connect(database) as conn:
+        states = conn.execute("SELECT FactionName, State FROM system_faction_state").fetchall()
+    assert states == [("Mother Gaia", "War")]
+
+    report = finish({})
+    assert report["errors"] == {}
+    assert report["constraints"] > 0
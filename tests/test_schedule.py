@@ -0,0 +1,36 @@
+import threading
+
+from src.ingest.schedule import ScheduledDataset, run_scheduled
+
+
+def test_writers_of_a_finished_dataset_are_reused():
+    # Two write slots: the large dataset writes with one, the small one with the other, and the second
+    # writer of the large dataset can only write once the small dataset is done with its slot
+    datasets = [ScheduledDataset("large", 100, 0, 2), ScheduledDataset("small", 1, 0, 2)]
+    large_writing = threading.Event()
+    small_writing = threading.Event()
+    both_writing = threading.Barrier(2, timeout=10)
+
+    def run(dataset: ScheduledDataset, writers: int, write_slots: threading.Semaphore) -> int:
+        if dataset.name == "small":
+            assert large_writing.wait(timeout=10)
+            with write_slots:
+                small_writing.set()
+                assert not write_slots.acquire(timeout=0.1)
+            return writers
+
+        def writer() -> None:
+            with write_slots:
+                large_writing.set()
+                both_writing.wait()
+
+        threads = [threading.Thread(target=writer) for _ in range(writers)]
+        threads[0].start()
+        assert small_writing.wait(timeout=10)
+        threads[1].start()
+        for thread in threads:
+            thread.join()
+        return writers
+
+    assert run_scheduled(datasets, workers=2, writer_budget=2, run=run) == {"large": 2, "small": 2}
+    assert not both_writing.broken
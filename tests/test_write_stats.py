@@ -0,0 +1,15 @@
+import pytest
+
+from .conftest import market_line
+
+
+@pytest.mark.parametrize("bulk", [False, True])
+def test_reports_count_only_their_own_run(database: str, ingest_lines, bulk: bool):
+    first = ingest_lines("Market", [market_line("2025-01-15T12:00:00Z", {"gold": 10, "silver": 20, "tea": 30})], bulk=bulk)
+    second = ingest_lines("Market", [market_line("2025-01-15T13:00:00Z", {"gold": 10, "silver": 25})], bulk=bulk)
+
+    assert first["child_rows"] == {"market_commodity": {"deleted": 0, "written": 3, "untouched": 0}}
+    assert second["child_rows"] == {"market_commodity": {"deleted": 1, "written": 1, "untouched": 1}}
+    shapes = {} if bulk else {"market": 1}
+    assert first["statement_shapes"] == shapes
+    assert second["statement_shapes"] == shapes